@@ -1,18 +1,33 @@
 import os
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from exo_monitoring_gui.utils.hdf5_utils import load_hdf5_data, load_metadata, inject_metadata_to_hdf, delet_experimental
+# Mêmes modules (utils.*) que plots/ : les verrous de fichiers de hdf5_utils sont partagés
+from utils.hdf5_utils import (
+    load_hdf5_data, load_metadata, inject_metadata_to_hdf, delet_experimental,
+    is_trial_container, list_trials, load_trial_data, DERIVED_GROUP, RESAMPLED_GROUP, SAMPLE_PERIOD_S,
+    CALIBRATION_GROUP, open_locked
+)
+from utils.derived_signals import load_or_compute_derived
+from utils.trial_export import iter_hdf5_batches, write_csv, write_columnar
 
 import numpy as np
 import h5py
 import pyqtgraph as pg
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QPushButton, QLabel, QTreeWidget, QTreeWidgetItem, QScrollArea, QGraphicsItem, QTextEdit, QGraphicsView, QGraphicsScene, QGraphicsRectItem, QColorDialog
+    QPushButton, QLabel, QTreeWidget, QTreeWidgetItem, QScrollArea, QGraphicsItem, QTextEdit, QGraphicsView, QGraphicsScene, QGraphicsRectItem, QColorDialog,
+    QComboBox, QFileDialog, QProgressDialog, QMessageBox, QInputDialog
 )
-from PyQt5.QtCore import Qt, QRectF, QPointF, QTimer
+from PyQt5.QtCore import Qt, QRectF, QPointF, QTimer, QThread, pyqtSignal
 from PyQt5.QtGui import QColor, QBrush, QPen, QPainter, QWheelEvent, QTextCharFormat, QFont
 
+from plots.model_3d_viewer import Model3DWidget
+from plots.trial_playback import TrialPlayback
+from plots.video_export import export_trial_video
+from plots.render_settings import antialiasing_samples
+
+PLAYBACK_SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0)
+
 
 class ZoomBar(QGraphicsView):
     def __init__(self, update_zoom_callback):
@@ -151,6 +166,107 @@ class ZoomBar(QGraphicsView):
         self.update_zoom_rect()
         self.update_graphs()
 
+class DerivedSignalsThread(QThread):
+    """Loads or computes the derived signals of one trial away from the GUI thread."""
+    derived_ready = pyqtSignal(int, object, object)  # (requête, data_structure, résultats)
+
+    def __init__(self, request_id, file_path, scope, data_structure, loaded_data):
+        super().__init__()
+        self.request_id = request_id
+        self.file_path = file_path
+        self.scope = scope
+        self.data_structure = data_structure
+        self.loaded_data = loaded_data
+        self.cancelled = False
+
+    def run(self):
+        try:
+            derived = load_or_compute_derived(self.file_path, self.scope, self.data_structure, self.loaded_data,
+                                              cancelled=lambda: self.cancelled)
+        except Exception as e:
+            print(f"[ERROR] Derived signals unavailable: {e}")
+            return
+        if not self.cancelled:
+            self.derived_ready.emit(self.request_id, self.data_structure, derived)
+
+
+class TrialExportThread(QThread):
+    """Streams the channels of one trial to CSV, Parquet or Feather away from the GUI thread."""
+    progress = pyqtSignal(int, int)       # (lignes écrites, lignes du trial)
+    export_done = pyqtSignal(object)      # fichiers écrits
+    export_failed = pyqtSignal(str)
+
+    def __init__(self, file_path, trial_id, out_path, max_part_bytes=None):
+        super().__init__()
+        self.file_path = file_path
+        self.trial_id = trial_id
+        self.out_path = out_path
+        self.max_part_bytes = max_part_bytes
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _batches(self):
+        for batch in iter_hdf5_batches(self.file_path, self.trial_id, progress_callback=self.progress.emit):
+            if self.cancelled:
+                return
+            yield batch
+
+    def run(self):
+        written = []
+        try:
+            if self.out_path.lower().endswith(".csv"):
+                written = write_csv(self._batches(), self.out_path, max_part_bytes=self.max_part_bytes)
+            else:
+                write_columnar(self._batches(), self.out_path)
+                written = [self.out_path]
+        except Exception as e:
+            print(f"[ERROR] Trial data export failed: {e}")
+            self.export_failed.emit(str(e))
+            return
+        if self.cancelled:
+            # Export interrompu : pas de fichier tronqué laissé derrière
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+            print("[INFO] Trial data export cancelled")
+            return
+        self.export_done.emit(written)
+
+
+class VideoExportThread(QThread):
+    """Renders the 3D reconstruction of one trial away from the GUI thread."""
+    progress = pyqtSignal(int, int)       # (images rendues, images du trial)
+    export_done = pyqtSignal(str)
+    export_failed = pyqtSignal(str)
+
+    def __init__(self, file_path, out_path, trial_id, samples):
+        super().__init__()
+        self.file_path = file_path
+        self.out_path = out_path
+        self.trial_id = trial_id
+        self.samples = samples
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        try:
+            export_trial_video(self.file_path, self.out_path,
+                               trial_id=self.trial_id,
+                               samples=self.samples,
+                               progress_callback=self.progress.emit,
+                               cancelled=lambda: self.cancelled)
+        except Exception as e:
+            print(f"[ERROR] 3D video export failed: {e}")
+            self.export_failed.emit(str(e))
+            return
+        if not self.cancelled:
+            self.export_done.emit(self.out_path)
+
+
 class Review(QMainWindow):
     def __init__(self, parent=None, file_path=None, existing_load=False, trials=None):
         super().__init__()
@@ -185,7 +301,21 @@ class Review(QMainWindow):
         self.time_axis = None
         self.plot_widgets = {}  # Track plot widgets with proper reference
         self.displayed_plots = set()  # Track which plots are currently displayed
-        if file_path:
+
+        # Conteneur multi-trials : l'index est lu une seule fois, les trials sont mis en cache
+        self.is_container = bool(file_path) and is_trial_container(file_path)
+        self.trial_list = list_trials(file_path) if self.is_container else []
+        self._trial_cache = {}
+        self.derived_names = {}  # Dataset source -> noms des signaux dérivés affichés sous lui
+        self._derived_request = 0  # Seul le résultat de la dernière requête est affiché
+        self._derived_workers = set()
+        self._export_worker = None
+        self._video_worker = None
+        self.current_trial = self.trial_list[-1]["trial"] if self.trial_list else None
+
+        if self.is_container and self.current_trial is not None:
+            self.data = self._get_trial_data(self.current_trial)
+        elif file_path:
             self.data = load_hdf5_data(file_path)
         else:
             self.data = {"loaded_data": {}}  # Initialize empty data structure
@@ -193,6 +323,7 @@ class Review(QMainWindow):
         self.init_ui()
         if self.file_path:
             self.load_hdf5_and_populate_tree(self.file_path)
+            self._open_playback()
 
         self._cleanup_timer = QTimer(self)
         self._cleanup_timer.setSingleShot(True)
@@ -406,10 +537,10 @@ class Review(QMainWindow):
         plot_widget.plot_title = plot_title  # Store title as attribute
         plot_widget.plot_curves = []  # Store references to plot curves
 
-        # Check if data is a 2D array (e.g., IMU data with 4 components)
-        if isinstance(data, np.ndarray) and data.ndim == 2 and data.shape[1] == 4:
+        # Check if data is a 2D array (e.g., IMU data with 4 components, Euler angles with 3)
+        if isinstance(data, np.ndarray) and data.ndim == 2 and data.shape[1] in (3, 4):
             colors = ['b', 'y', 'g', 'r']  # Blue, Yellow, Green, Red
-            for i, color in enumerate(colors):
+            for i, color in enumerate(colors[:data.shape[1]]):
                 curve = plot_widget.plot(data[:, i], pen=pg.mkPen(color=color, width=2))
                 plot_widget.plot_curves.append(curve)
         else:
@@ -420,6 +551,12 @@ class Review(QMainWindow):
         plot_widget.setLabel('bottom', 'Index')
         plot_widget.setTitle(plot_title)
 
+        # Curseur de lecture 3D (en index d'échantillon, comme l'axe des x)
+        plot_widget.playback_cursor = pg.InfiniteLine(
+            pos=self.playback.position / SAMPLE_PERIOD_S, angle=90, movable=False,
+            pen=pg.mkPen(color='r', width=1))
+        plot_widget.addItem(plot_widget.playback_cursor)
+
         # Store reference to the plot widget
         self.plot_widgets[plot_title] = plot_widget
         self.middle_layout.addWidget(plot_widget)
@@ -476,6 +613,11 @@ class Review(QMainWindow):
 
     def update_zoom(self, start_index, end_index):
         """Update the view of the graphs with the new indices"""
+        # Le début de la fenêtre visible sert de curseur pour la lecture 3D
+        if not self._zoom_from_playback and self.playback.loaded:
+            self.playback.seek(start_index * SAMPLE_PERIOD_S)
+            self._on_playback_position(self.playback.position)
+
         for plot_title, widget in list(self.plot_widgets.items()):
             if widget is None or not widget.isVisible():
                 continue
@@ -512,19 +654,191 @@ class Review(QMainWindow):
         label.setStyleSheet("font-size: 14px; font-weight: bold;")
         layout.addWidget(label)
 
-        self.model_3d_widget = QLabel("3D Model Placeholder")
-        self.model_3d_widget.setAlignment(Qt.AlignCenter)
-        self.model_3d_widget.setStyleSheet("background-color: #e0e0e0; border: 1px solid #ccc;")
+        self.model_3d_widget = Model3DWidget()
         layout.addWidget(self.model_3d_widget, stretch=3)
 
-        self.animate_button = QPushButton("Start Animation")
-        layout.addWidget(self.animate_button)
+        # Relecture des quaternions IMU du trial, synchronisée avec la zoom bar
+        self.playback = TrialPlayback(self.model_3d_widget.model_viewer, self)
+        self.playback.position_changed.connect(self._on_playback_position)
+        self.playback.playing_changed.connect(self._on_playback_state)
+        self._zoom_from_playback = False
+
+        self.playback_time_label = QLabel("0.00 s / 0.00 s")
+        self.playback_time_label.setAlignment(Qt.AlignCenter)
+        layout.addWidget(self.playback_time_label)
+
+        controls = QHBoxLayout()
+        self.animate_button = QPushButton("Play")
+        self.animate_button.setEnabled(False)
+        self.animate_button.clicked.connect(self.playback.toggle)
+        controls.addWidget(self.animate_button, stretch=2)
+
+        self.speed_combo = QComboBox()
+        for speed in PLAYBACK_SPEEDS:
+            self.speed_combo.addItem(f"{speed:g}x", speed)
+        self.speed_combo.setCurrentIndex(PLAYBACK_SPEEDS.index(1.0))
+        self.speed_combo.currentIndexChanged.connect(
+            lambda i: self.playback.set_speed(self.speed_combo.itemData(i)))
+        controls.addWidget(self.speed_combo, stretch=1)
+        layout.addLayout(controls)
 
         self.reset_view_button = QPushButton("Reset View")
+        self.reset_view_button.clicked.connect(self.model_3d_widget.reset_view)
         layout.addWidget(self.reset_view_button)
 
+        self.export_video_button = QPushButton("Export Video")
+        self.export_video_button.setEnabled(False)
+        self.export_video_button.clicked.connect(self.export_3d_video)
+        layout.addWidget(self.export_video_button)
+
+        self.export_data_button = QPushButton("Export Data")
+        self.export_data_button.setEnabled(False)
+        self.export_data_button.clicked.connect(self.export_trial_data)
+        layout.addWidget(self.export_data_button)
+
         return layout
 
+    def _open_playback(self):
+        """(Re)open the 3D playback on the current trial."""
+        trial_id = self.current_trial if self.is_container else None
+        ready = bool(self.file_path) and self.playback.open(self.file_path, trial_id)
+        self.animate_button.setEnabled(ready)
+        self.export_video_button.setEnabled(ready)
+        self.export_data_button.setEnabled(bool(self.file_path))
+        self._on_playback_position(self.playback.position)
+
+    def export_3d_video(self):
+        """Render the 3D reconstruction of the current trial offscreen to an MP4 or PNG frames."""
+        if not self.playback.loaded:
+            return
+        self.playback.pause()
+        base = os.path.splitext(os.path.basename(self.file_path))[0]
+        if self.is_container and self.current_trial is not None:
+            base += f"_trial{self.current_trial}"
+        out_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Export 3D reconstruction",
+            base + ".mp4",
+            "MP4 Video (*.mp4);;PNG frame sequence (folder) (*)"
+        )
+        if not out_path:
+            return
+        if selected_filter.startswith("MP4") and not out_path.lower().endswith(".mp4"):
+            out_path += ".mp4"
+
+        viewer = self.model_3d_widget.model_viewer
+        worker = VideoExportThread(self.file_path, out_path,
+                                   self.current_trial if self.is_container else None,
+                                   antialiasing_samples(viewer.performance_mode))
+        progress = QProgressDialog("Rendering the 3D reconstruction...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoReset(False)
+        progress.setAutoClose(False)
+        progress.canceled.connect(worker.cancel)
+        worker.progress.connect(lambda done, total: progress.setValue(int(100 * done / max(total, 1))))
+        worker.export_done.connect(lambda path: QMessageBox.information(
+            self, "Export Done", f"3D reconstruction exported to:\n{path}"))
+        worker.export_failed.connect(lambda message: QMessageBox.critical(
+            self, "Export Error", f"Could not export the 3D reconstruction:\n{message}"))
+        worker.finished.connect(progress.close)
+        worker.finished.connect(lambda: self.export_video_button.setEnabled(self.playback.loaded))
+        worker.finished.connect(self._on_video_export_finished)
+
+        self.export_video_button.setEnabled(False)
+        self._video_worker = worker
+        progress.show()
+        worker.start()
+
+    def _on_video_export_finished(self):
+        self._video_worker = None
+
+    def export_trial_data(self):
+        """Export the sensor channels of the current trial to CSV, Parquet or Feather, chunk by chunk."""
+        if not self.file_path:
+            return
+        base = os.path.splitext(os.path.basename(self.file_path))[0]
+        if self.is_container and self.current_trial is not None:
+            base += f"_trial{self.current_trial}"
+        out_path, selected_filter = QFileDialog.getSaveFileName(
+            self,
+            "Export trial data",
+            base + ".csv",
+            "CSV (*.csv);;Parquet (*.parquet);;Feather (*.feather)"
+        )
+        if not out_path:
+            return
+        ext = {"CSV": ".csv", "Parquet": ".parquet", "Feather": ".feather"}[selected_filter.split()[0]]
+        if not out_path.lower().endswith(ext):
+            out_path += ext
+
+        max_part_bytes = None
+        if ext == ".csv":
+            # Découpage optionnel du CSV pour les tableurs qui limitent la taille des fichiers
+            part_mb, ok = QInputDialog.getInt(
+                self,
+                "CSV part size",
+                "Maximum size of each CSV part in MB (0 = single file):",
+                0, 0, 100000, 1
+            )
+            if not ok:
+                return
+            if part_mb > 0:
+                max_part_bytes = part_mb * 1024 * 1024
+
+        worker = TrialExportThread(self.file_path, self.current_trial if self.is_container else None, out_path,
+                                   max_part_bytes=max_part_bytes)
+        progress = QProgressDialog("Exporting the trial data...", "Cancel", 0, 100, self)
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+        progress.setAutoReset(False)
+        progress.setAutoClose(False)
+        progress.canceled.connect(worker.cancel)
+        worker.progress.connect(lambda done, total: progress.setValue(int(100 * done / max(total, 1))))
+        worker.export_done.connect(lambda files: QMessageBox.information(
+            self, "Export Done", "Trial data exported to:\n" + "\n".join(files)))
+        worker.export_failed.connect(lambda message: QMessageBox.critical(
+            self, "Export Error", f"Could not export the trial data:\n{message}"))
+        worker.finished.connect(progress.close)
+        worker.finished.connect(lambda: self.export_data_button.setEnabled(bool(self.file_path)))
+        worker.finished.connect(self._on_export_finished)
+
+        self.export_data_button.setEnabled(False)
+        self._export_worker = worker
+        progress.show()
+        worker.start()
+
+    def _on_export_finished(self):
+        self._export_worker = None
+
+    def _on_playback_state(self, playing):
+        self.animate_button.setText("Pause" if playing else "Play")
+
+    def _on_playback_position(self, time_s):
+        """Follow the playback in the time label, the plot cursors and the zoom bar."""
+        self.playback_time_label.setText(f"{time_s:.2f} s / {self.playback.duration:.2f} s")
+        sample = time_s / SAMPLE_PERIOD_S
+        for widget in self.plot_widgets.values():
+            cursor = getattr(widget, 'playback_cursor', None)
+            if cursor is not None:
+                cursor.setValue(sample)
+
+        # Quand le curseur sort de la fenêtre zoomée, la fenêtre passe à la page suivante
+        zoom_bar = self.zoom_bar
+        if zoom_bar.zoom_level <= 1.0 or zoom_bar.data_length <= 0:
+            return
+        visible_width = 1.0 / zoom_bar.zoom_level
+        ratio = sample / zoom_bar.data_length
+        if zoom_bar.position_ratio <= ratio < zoom_bar.position_ratio + visible_width:
+            return
+        zoom_bar.position_ratio = max(0.0, min(ratio, 1.0 - visible_width))
+        zoom_bar.update_zoom_rect()
+        self._zoom_from_playback = True
+        try:
+            zoom_bar.update_graphs()
+        finally:
+            self._zoom_from_playback = False
+
     def build_footer(self, layout):
         footer = QHBoxLayout()
 
@@ -551,7 +865,17 @@ class Review(QMainWindow):
         received_data_layout.setSpacing(2)
         box_layout.addWidget(received_data_widget)
 
-        if self.trials and isinstance(self.trials, list) and len(self.trials) > 0:
+        if self.trial_list:
+            for trial in self.trial_list:
+                label = QLabel(
+                    f"Trial {trial['trial']} - {trial['duration']:.1f} s - "
+                    f"{len(trial['channels'])} channels"
+                )
+                label.setStyleSheet("color: blue; text-decoration: underline; background-color: #f0f0f0; font-size: 15px; border: 1px solid #ccc; padding: 2px;")
+                label.setCursor(Qt.PointingHandCursor)
+                label.mousePressEvent = lambda event, t=trial['trial']: self._on_trial_click(t)
+                received_data_layout.addWidget(label)
+        elif self.trials and isinstance(self.trials, list) and len(self.trials) > 0:
             for path in self.trials:
                 label = QLabel(str(path))
                 label.setStyleSheet("color: blue; text-decoration: underline; background-color: #f0f0f0; font-size: 15px; border: 1px solid #ccc; padding: 2px;")
@@ -596,15 +920,31 @@ class Review(QMainWindow):
 
         layout.addLayout(box_layout)
 
+    def _get_trial_data(self, trial_id):
+        """Return the data of a trial of the container, loading it only once."""
+        if trial_id not in self._trial_cache:
+            self._trial_cache[trial_id] = load_trial_data(self.file_path, trial_id)
+        return self._trial_cache[trial_id]
+
+    def _on_trial_click(self, trial_id):
+        """Switch to another trial of the container without rescanning the file."""
+        if trial_id == self.current_trial:
+            return
+        self.current_trial = trial_id
+        self.data = self._get_trial_data(trial_id)
+        self.populate_tree_from_data(self.data)
+        self._open_playback()
+
     def _on_trial_path_click(self, path):
         self.file_path = path
         self.metadata = load_metadata(path)
         self.data = load_hdf5_data(path)
         self.load_hdf5_and_populate_tree(path)
+        self._open_playback()
         # Mettre à jour la zone de texte du protocole expérimental selon la métadonnée
         protocol_text = ""
         try:
-            with h5py.File(path, 'r') as f:
+            with open_locked(path) as f:
                 if 'experiment_protocol' in f.attrs:
                     protocol_text = f.attrs['experiment_protocol']
                     if isinstance(protocol_text, bytes):
@@ -681,7 +1021,7 @@ class Review(QMainWindow):
                     emgL_data[name] = emg_group[name][:]
         return emgL_data
             
-    def load_hdf5_and_populate_tree(self, file_path):
+    def _clear_tree_and_plots(self):
         self.connected_systems.clear()
 
         # Clean up existing plots
@@ -691,14 +1031,32 @@ class Review(QMainWindow):
         self.displayed_plots.clear()
 
         self.loaded_data.clear()
+
+    def populate_tree_from_data(self, data):
+        """Fill the sensor tree from an already loaded trial (see load_trial_data)."""
+        self._clear_tree_and_plots()
+        self.loaded_data.update(data["loaded_data"])
+        self.time_axis = data["time_axis"]
+        self._attach_derived_signals(data["data_structure"])
+        self._populate_tree(data["data_structure"])
+
+    def load_hdf5_and_populate_tree(self, file_path):
+        if self.is_container and self.current_trial is not None:
+            self.populate_tree_from_data(self.data)
+            self.main_bar.load_experiment_protocol(self)
+            return
+
+        self._clear_tree_and_plots()
         data_structure = {}
         time_length = None
 
-        with h5py.File(file_path, "r") as f:
+        with open_locked(file_path) as f:
             def visitor(name, obj):
                 nonlocal time_length
                 if isinstance(obj, h5py.Dataset):
                     parts = name.strip("/").split("/")
+                    if parts[0] in (DERIVED_GROUP, RESAMPLED_GROUP, CALIBRATION_GROUP):
+                        return
                     if len(parts) >= 2:
                         group_name, dataset_name = parts[-2], parts[-1]
                         group_upper = group_name.upper()
@@ -730,6 +1088,43 @@ class Review(QMainWindow):
             else:
                 self.time_axis = []
 
+        self._attach_derived_signals(data_structure)
+        self._populate_tree(data_structure)
+        self.main_bar.load_experiment_protocol(self)
+
+    def _attach_derived_signals(self, data_structure):
+        """Load (or compute once and cache in the file) the derived signals of the current trial.
+
+        The work runs in a DerivedSignalsThread; the signals appear in the tree when it is done.
+        """
+        self.derived_names = {}
+        self._derived_request += 1
+        for worker in self._derived_workers:
+            worker.cancelled = True  # Trial précédent : résultat inutile
+        if not self.file_path:
+            return
+        scope = f"trial_{self.current_trial}" if self.is_container and self.current_trial is not None else "root"
+        worker = DerivedSignalsThread(self._derived_request, self.file_path, scope, data_structure,
+                                      dict(self.loaded_data))
+        worker.derived_ready.connect(self._on_derived_ready)
+        worker.finished.connect(lambda w=worker: self._derived_workers.discard(w))
+        self._derived_workers.add(worker)
+        worker.start()
+
+    def _on_derived_ready(self, request_id, data_structure, derived):
+        """Add the derived signals of the current trial to the data and the sensor tree."""
+        if request_id != self._derived_request:
+            return
+        for key, signals in derived.items():
+            for derived_name, array in signals:
+                self.loaded_data[derived_name] = array
+                self.data["loaded_data"][derived_name] = array
+            self.derived_names[key] = [derived_name for derived_name, _ in signals]
+        if derived:
+            self.connected_systems.clear()
+            self._populate_tree(data_structure)
+
+    def _populate_tree(self, data_structure):
         for group_name, dataset_list in data_structure.items():
             group_item = QTreeWidgetItem([f"{group_name} Data"])
             self.connected_systems.addTopLevelItem(group_item)
@@ -745,17 +1140,30 @@ class Review(QMainWindow):
                     sensor_item.setFlags(sensor_item.flags() & ~Qt.ItemIsSelectable)
                     sensor_item.setData(0, Qt.UserRole, "disabled")
 
+                for derived_name in self.derived_names.get(dataset_name.split()[0], []):
+                    derived_item = QTreeWidgetItem([derived_name])
+                    derived_item.setForeground(0, QBrush(QColor("darkGreen")))
+                    sensor_item.addChild(derived_item)
+
                 group_item.addChild(sensor_item)
 
             group_item.setExpanded(True)
 
-        self.main_bar.load_experiment_protocol(self)
-
     def closeEvent(self, event):
         """Clean up resources when closing the application"""
         # Stop all timers
         self._cleanup_timer.stop()
         self._zoom_timer.stop()
+        self.playback.close()
+        for worker in list(self._derived_workers):
+            worker.cancelled = True
+            worker.wait()
+        if self._export_worker is not None:
+            self._export_worker.cancel()
+            self._export_worker.wait()
+        if self._video_worker is not None:
+            self._video_worker.cancel()
+            self._video_worker.wait()
 
         # Clear all queues
         self._cleanup_queue.clear()
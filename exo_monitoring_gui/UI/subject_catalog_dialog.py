@@ -0,0 +1,195 @@
+import os
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
+                             QTableWidget, QTableWidgetItem, QHeaderView, QFileDialog, QProgressBar,
+                             QAbstractItemView)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal
+
+from utils.subject_catalog import build_catalog, search_catalog, default_catalog_path
+
+
+class CatalogIndexThread(QThread):
+    """Runs build_catalog away from the GUI thread and reports its progress."""
+    progress = pyqtSignal(int, int)        # (fichiers indexés, fichiers à indexer)
+    indexing_done = pyqtSignal(object)     # statistiques de build_catalog
+    indexing_failed = pyqtSignal(str)
+
+    def __init__(self, data_dir):
+        super().__init__()
+        self.data_dir = data_dir
+
+    def run(self):
+        try:
+            stats = build_catalog(self.data_dir, progress_callback=self.progress.emit)
+        except Exception as e:
+            print(f"[ERROR] Catalog indexing failed: {e}")
+            self.indexing_failed.emit(str(e))
+            return
+        self.indexing_done.emit(stats)
+
+
+class SubjectCatalogDialog(QDialog):
+    """
+    Dialog to search all subject files of a data folder through the SQLite catalog.
+    """
+
+    COLUMNS = ["Name", "Last name", "Created", "Trials", "Duration (s)", "File"]
+
+    # Indexations encore en cours après la fermeture du dialogue (un QThread détruit en
+    # cours d'exécution fait planter l'application)
+    _detached_workers = set()
+
+    def __init__(self, parent=None, data_dir=None):
+        super().__init__(parent)
+        self.setWindowTitle("Search subjects")
+        self.setModal(True)
+        self.resize(900, 500)
+        self.data_dir = data_dir
+        self.selected_path = None
+        self.index_worker = None
+
+        main_layout = QVBoxLayout(self)
+
+        # Data folder
+        folder_layout = QHBoxLayout()
+        self.folder_label = QLabel()
+        folder_layout.addWidget(self.folder_label, 1)
+        self.choose_button = QPushButton("Choose folder...")
+        self.choose_button.clicked.connect(self.choose_folder)
+        folder_layout.addWidget(self.choose_button)
+        self.rescan_button = QPushButton("Rescan")
+        self.rescan_button.clicked.connect(self.refresh_catalog)
+        folder_layout.addWidget(self.rescan_button)
+        main_layout.addLayout(folder_layout)
+
+        # Filters
+        filter_layout = QHBoxLayout()
+        self.text_filter = QLineEdit()
+        self.text_filter.setPlaceholderText("Filter by participant, attribute or file name")
+        self.text_filter.textChanged.connect(self.apply_filter)
+        filter_layout.addWidget(self.text_filter, 2)
+        self.channel_filter = QLineEdit()
+        self.channel_filter.setPlaceholderText("Channel (e.g. IMU, emgL1)")
+        self.channel_filter.textChanged.connect(self.apply_filter)
+        filter_layout.addWidget(self.channel_filter, 1)
+        main_layout.addLayout(filter_layout)
+
+        # Results
+        self.table = QTableWidget(0, len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.cellDoubleClicked.connect(lambda row, _col: self.accept_row(row))
+        main_layout.addWidget(self.table)
+
+        # Status + buttons
+        bottom_layout = QHBoxLayout()
+        self.status_label = QLabel()
+        bottom_layout.addWidget(self.status_label, 1)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        bottom_layout.addWidget(self.progress_bar, 1)
+        open_button = QPushButton("Open")
+        open_button.clicked.connect(lambda: self.accept_row(self.table.currentRow()))
+        bottom_layout.addWidget(open_button)
+        cancel_button = QPushButton("Cancel")
+        cancel_button.clicked.connect(self.reject)
+        bottom_layout.addWidget(cancel_button)
+        main_layout.addLayout(bottom_layout)
+
+        if self.data_dir:
+            self.refresh_catalog()
+        else:
+            self.folder_label.setText("No folder selected")
+
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select data folder", self.data_dir or "")
+        if folder:
+            self.data_dir = folder
+            self.refresh_catalog()
+
+    def refresh_catalog(self):
+        """Incrementally re-index the data folder in a CatalogIndexThread, then refresh the results."""
+        if not self.data_dir or self.index_worker is not None:
+            return
+        self.folder_label.setText(self.data_dir)
+        self.status_label.setText("Indexing...")
+        self.progress_bar.setRange(0, 0)  # Indéterminée jusqu'au premier fichier indexé
+        self.progress_bar.setVisible(True)
+        self.choose_button.setEnabled(False)
+        self.rescan_button.setEnabled(False)
+
+        self.index_worker = CatalogIndexThread(self.data_dir)
+        self.index_worker.progress.connect(self.on_index_progress)
+        self.index_worker.indexing_done.connect(self.on_index_done)
+        self.index_worker.indexing_failed.connect(self.on_index_failed)
+        self.index_worker.finished.connect(self.on_index_finished)
+        self.index_worker.start()
+        self.apply_filter()  # Catalogue précédent affiché pendant l'indexation
+
+    def on_index_progress(self, done, total):
+        self.progress_bar.setRange(0, total)
+        self.progress_bar.setValue(done)
+        self.status_label.setText(f"Indexing {done}/{total} file(s)")
+
+    def on_index_done(self, stats):
+        self.status_label.setText(
+            f"{stats['scanned']} file(s) - {stats['updated']} updated, {stats['removed']} removed"
+        )
+
+    def on_index_failed(self, message):
+        self.status_label.setText(f"Indexing failed: {message}")
+
+    def on_index_finished(self):
+        self.index_worker = None
+        self.progress_bar.setVisible(False)
+        self.choose_button.setEnabled(True)
+        self.rescan_button.setEnabled(True)
+        self.apply_filter()
+
+    def done(self, result):
+        # L'indexation continue en arrière-plan : le catalogue sera à jour à la prochaine ouverture
+        worker = self.index_worker
+        if worker is not None and worker.isRunning():
+            for signal in (worker.progress, worker.indexing_done, worker.indexing_failed, worker.finished):
+                signal.disconnect()
+            self._detached_workers.add(worker)
+            worker.finished.connect(lambda: self._detached_workers.discard(worker))
+            self.index_worker = None
+        super().done(result)
+
+    def apply_filter(self):
+        if not self.data_dir:
+            return
+        rows = search_catalog(
+            default_catalog_path(os.path.abspath(self.data_dir)),
+            text=self.text_filter.text(),
+            channel=self.channel_filter.text().strip() or None,
+        )
+        self.table.setRowCount(len(rows))
+        for i, row in enumerate(rows):
+            values = [
+                row["participant_name"] or "",
+                row["participant_last_name"] or "",
+                row["creation_date"] or "",
+                str(row["n_trials"] or 0),
+                f"{row['total_duration'] or 0.0:.1f}",
+                os.path.relpath(row["path"], self.data_dir),
+            ]
+            for j, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                item.setData(Qt.UserRole, row["path"])
+                if row["error"]:
+                    item.setToolTip(row["error"])
+                self.table.setItem(i, j, item)
+
+    def accept_row(self, row):
+        if row < 0:
+            return
+        item = self.table.item(row, 0)
+        if item is None:
+            return
+        self.selected_path = item.data(Qt.UserRole)
+        self.accept()
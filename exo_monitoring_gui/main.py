@@ -53,13 +53,15 @@ def main():
         
         # Ajouter une configuration OpenGL pour améliorer la performance
         from PyQt5.QtGui import QSurfaceFormat
+        from exo_monitoring_gui.plots.render_settings import load_render_settings, antialiasing_samples
+        performance_mode = bool(load_render_settings().get("performance_mode", False))
         
         # Configuration globale OpenGL
         surface_format = QSurfaceFormat()
         surface_format.setRenderableType(QSurfaceFormat.OpenGL)
         surface_format.setDepthBufferSize(24)
         surface_format.setStencilBufferSize(8)
-        surface_format.setSamples(4)  # Antialiasing (peut être réduit pour plus de performance)
+        surface_format.setSamples(antialiasing_samples(performance_mode))  # Antialiasing, désactivé en mode performance
         surface_format.setSwapBehavior(QSurfaceFormat.DoubleBuffer)
         QSurfaceFormat.setDefaultFormat(surface_format)
         
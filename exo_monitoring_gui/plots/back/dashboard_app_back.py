@@ -9,11 +9,14 @@ import pyqtgraph as pg
 import socket
 import struct
 import threading
-import pandas as pd
 from utils.json_request import reset_json_file
 # Ajouter le chemin du répertoire parent de data_generator au PYTHONPATH
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
 from utils.ethernet_receiver import recv_all, decode_packet
+from utils.trial_export import iter_recording_batches, write_columnar, write_csv
+from utils.imu_pipeline import ProcessingPipeline, IMUFilterStage
+from utils.calibration_profiles import (make_profile, save_calibration_profile, load_calibration_profile,
+                                        CALIBRATION_DRIFT_DEG, DRIFT_CHECK_TIMEOUT_S)
 
 # Constante pour le trial end marker
 TRIAL_END_MARKER = b'\x4E'
@@ -198,18 +201,22 @@ class DashboardAppBack:
         self.is_server_running = False
         self.recording = False
         self.recording_stopped = False
-        self.recorded_data = {
-            "EMG": [[] for _ in range(8)],
-            "IMU": [[] for _ in range(1)],
-            "pMMG": [[] for _ in range(8)]
-        }
+        self.recorded_data = self._empty_recorded_data(1)
         self.emg_mappings = {}
         self.pmmg_mappings = {}
         self.plot_data = {} # Pour les données en temps réel des graphiques individuels
         self.group_plot_data = {} # Pour les données en temps réel des graphiques groupés
+        self._drift_check_pending = False  # Profil de calibration rechargé, dérive pas encore vérifiée
+        self._drift_check_since = None  # T-pose confirmée par l'utilisateur à cet instant
 
         self.timer = QTimer() # Pas de self.ui ici, QTimer n'a pas besoin d'un parent direct pour fonctionner
         self.timer.timeout.connect(self.update_data)
+
+        # Étage de filtrage IMU entre le décodage et l'affichage/l'enregistrement (thread dédié)
+        self.imu_filter_stage = IMUFilterStage()
+        self.imu_pipeline = ProcessingPipeline([self.imu_filter_stage])
+        self.imu_pipeline.frame_ready.connect(self.on_pipeline_frame)
+        self.imu_pipeline.start()
         reset_json_file()
         # Ne pas créer un deuxième MainBar, utiliser celui de l'UI
         # try:
@@ -219,6 +226,17 @@ class DashboardAppBack:
         #     print(f"Error initializing MainBar: {e}")
         #     self.main_bar_re = None
 
+    @staticmethod
+    def _empty_recorded_data(num_imus):
+        """Recording buffers; IMU_filtered and IMU_quality hold the pipeline output next to the raw IMU stream."""
+        return {
+            "EMG": [[] for _ in range(8)],
+            "IMU": [[] for _ in range(num_imus)],
+            "IMU_filtered": [[] for _ in range(num_imus)],
+            "IMU_quality": [[] for _ in range(num_imus)],
+            "pMMG": [[] for _ in range(8)]
+        }
+
     def connect_sensors(self):
         if not self.is_server_running:
             try:
@@ -302,9 +320,14 @@ class DashboardAppBack:
         # Mettre à jour l'interface avec les capteurs disponibles
         # Cela déclenchera aussi l'ouverture de la boîte de dialogue
         self.ui.update_sensor_tree_from_config(self.sensor_config)
+
+        # Calibration T-pose de la session précédente de ce sujet, si le mapping n'a pas changé
+        self.restore_calibration_profile()
         
         num_imus = self.sensor_config.get('num_imus', 0)
         self.recorded_data["IMU"] = [[] for _ in range(max(1, num_imus))]
+        self.recorded_data["IMU_filtered"] = [[] for _ in range(max(1, num_imus))]
+        self.recorded_data["IMU_quality"] = [[] for _ in range(max(1, num_imus))]
         
         self.ui.connect_button.setText("Disconnect")
         self.ui.connect_button.setEnabled(True)
@@ -443,28 +466,22 @@ class DashboardAppBack:
                 
                 if 'imu' in packet:
                     for i, quaternion in enumerate(packet['imu']):
-                        if self._is_valid_quaternion(quaternion):
-                            if i < len(self.recorded_data["IMU"]):
-                                self.recorded_data["IMU"][i].append(quaternion)
-                
-                # Apply to 3D model BEAUCOUP moins fréquemment pour éviter le lag
+                        # Les paquets avec un quaternion invalide sont rejetés en entier plus haut :
+                        # IMU<i> et IMU_filtered<i> reçoivent donc une ligne par paquet soumis
+                        if i < len(self.recorded_data["IMU"]):
+                            self.recorded_data["IMU"][i].append(quaternion)
+
+                # Les quaternions passent par l'étage de filtrage ; le 3D et le flux filtré
+                # enregistré sont mis à jour dans on_pipeline_frame
                 if 'imu' in packet and packet['imu']:
-                    if not hasattr(self, '_last_3d_update_time'):
-                        self._last_3d_update_time = time.time()
-                        
-                    current_time = time.time()
-                    if current_time - self._last_3d_update_time >= 0.033:  # Max 30 FPS pour le 3D
-                        try:
-                            self.ui.apply_imu_data_to_3d_model(packet['imu'])
-                            self._last_3d_update_time = current_time
-                        except Exception as e:
-                            if hasattr(self, '_last_3d_error_time'):
-                                if current_time - self._last_3d_error_time > 5.0:
-                                    print(f"[ERROR] Error applying IMU data to 3D model: {e}")
-                                    self._last_3d_error_time = current_time
-                            else:
-                                print(f"[ERROR] Error applying IMU data to 3D model: {e}")
-                                self._last_3d_error_time = current_time
+                    imu_ids = list(self.sensor_config.get('imu_ids', []))
+                    self.imu_pipeline.submit({
+                        "timestamp": time.time(),
+                        "imu": packet['imu'],
+                        "imu_ids": imu_ids if len(imu_ids) == len(packet['imu']) else None,
+                        "filtered_sink": self.recorded_data["IMU_filtered"],
+                        "quality_sink": self.recorded_data["IMU_quality"],
+                    })
                 
                 # Update live plots (également moins fréquent)
                 if not hasattr(self, '_last_plot_update_time'):
@@ -498,6 +515,63 @@ class DashboardAppBack:
                     traceback.print_exc()
                     self._last_general_error_time = time.time()
 
+    def on_pipeline_frame(self, frame):
+        """Processed frame back on the GUI thread: record the filtered stream and drive the 3D model."""
+        quaternions = frame.get("imu_filtered")
+        if quaternions is None:
+            quaternions = frame["imu"]  # Étage en erreur : flux brut
+
+        # Buffer du trial au moment du décodage, même si l'enregistrement s'est arrêté entre-temps
+        sink = frame["filtered_sink"]
+        for i, quaternion in enumerate(quaternions):
+            if i < len(sink):
+                sink[i].append([float(c) for c in quaternion])
+        # Code qualité par échantillon (index dans QUALITY_LEVELS) ; NaN quand le filtre est désactivé
+        codes = frame.get("imu_quality")
+        quality_sink = frame["quality_sink"]
+        for i in range(min(len(quaternions), len(quality_sink))):
+            quality_sink[i].append(int(codes[i]) if codes is not None else np.nan)
+
+        # Chaque échantillon (pas seulement ceux affichés) alimente le buffer de calibration T-pose
+        imu_ids = list((self.sensor_config or {}).get('imu_ids', []))[:len(quaternions)]
+        model_3d = getattr(self.ui, 'model_3d_widget', None)
+        if model_3d is not None and imu_ids:
+            try:
+                model_3d.push_imu_samples(imu_ids, np.asarray(quaternions, dtype=np.float64)[:len(imu_ids)],
+                                          frame["timestamp"])
+            except Exception as e:
+                print(f"[ERROR] Error buffering IMU samples for calibration: {e}")
+            if self._drift_check_since is not None:
+                self.check_calibration_drift()
+
+        # Apply to 3D model BEAUCOUP moins fréquemment pour éviter le lag
+        if not hasattr(self, '_last_3d_update_time'):
+            self._last_3d_update_time = 0.0
+        current_time = time.time()
+        if current_time - self._last_3d_update_time >= 0.033:  # Max 30 FPS pour le 3D
+            try:
+                self.ui.apply_imu_data_to_3d_model(quaternions)
+                self._last_3d_update_time = current_time
+            except Exception as e:
+                if current_time - getattr(self, '_last_3d_error_time', 0.0) > 5.0:
+                    print(f"[ERROR] Error applying IMU data to 3D model: {e}")
+                    self._last_3d_error_time = current_time
+
+    def set_imu_filter_preset(self, preset):
+        """Switch the live IMU filter preset (applied on the pipeline thread, between two frames)."""
+        stage = self.imu_filter_stage
+        self.imu_pipeline.call_in_thread(lambda: stage.set_preset(preset))
+        self.imu_pipeline.reset_stats()
+        print(f"[INFO] IMU filter preset: {preset}")
+
+    def imu_pipeline_status(self):
+        """Short latency summary of the IMU filter stage for the UI."""
+        stats = self.imu_pipeline.latency_stats()
+        if stats is None:
+            return "Latency: -"
+        return (f"Latency: {stats['mean_ms']:.1f} ms (p95 {stats['p95_ms']:.1f}, "
+                f"max {stats['max_ms']:.1f})")
+
     def _contains_invalid_data(self, packet):
         for value in packet.get('emg', []):
             if not isinstance(value, (int, float)) or abs(value) > 10.0: return True
@@ -577,11 +651,8 @@ class DashboardAppBack:
             print("[WARNING] Aucun IMU détecté, initialisation avec 1 IMU par défaut")
             num_imus = 1
             
-        self.recorded_data = {
-            "EMG": [[] for _ in range(8)],
-            "IMU": [[] for _ in range(num_imus)],
-            "pMMG": [[] for _ in range(8)]
-        }
+        self.recorded_data = self._empty_recorded_data(num_imus)
+        self.imu_pipeline.reset_stats()
         
         print(f"[INFO] Début de l'enregistrement avec {num_imus} IMUs")
         print(f"[INFO] Timer starting with 40ms interval")
@@ -598,9 +669,14 @@ class DashboardAppBack:
         self.timer.start(40) # Démarrer le timer ici
         print(f"[INFO] Timer started, is active: {self.timer.isActive()}")
 
+        # Le buffer de calibration ne se remplit qu'en enregistrement : vérifier le profil maintenant
+        if self._drift_check_pending:
+            self.confirm_calibration_drift_check()
+
     def stop_recording(self):
         self.recording = False
         self.recording_stopped = True
+        self._drift_check_since = None  # Confirmation de T-pose valable pour cet enregistrement seulement
         self.timer.stop() # Arrêter le timer ici
         self.ui.record_button.setText("Record Start")
         self.ui.record_button.setStyleSheet("""
@@ -610,6 +686,10 @@ class DashboardAppBack:
         /* ... autres styles ... */
         """) # Le style complet est dans l'UI
         self.ui.record_button.setEnabled(False)
+        stats = self.imu_pipeline.latency_stats()
+        if stats is not None:
+            print(f"[INFO] IMU pipeline ({self.imu_filter_stage.preset}) latency: mean {stats['mean_ms']:.2f} ms, "
+                  f"p95 {stats['p95_ms']:.2f} ms, max {stats['max_ms']:.2f} ms")
         self.ui.show_recorded_data_on_plots(self.recorded_data) # L'UI gère l'affichage
         #Activer "Clear Plot" et "Request H5 File" après l'arrêt de l'enregistrement
         if hasattr(self.ui, 'main_bar_re') and self.ui.main_bar_re is not None:
@@ -631,11 +711,7 @@ class DashboardAppBack:
         
         # Vider les données enregistrées
         num_imus = self.sensor_config.get('num_imus', 0) if self.sensor_config else 1
-        self.recorded_data = {
-            "EMG": [[] for _ in range(8)],
-            "IMU": [[] for _ in range(max(1, num_imus))],
-            "pMMG": [[] for _ in range(8)]
-        }
+        self.recorded_data = self._empty_recorded_data(max(1, num_imus))
         
         # Vider les données de plot en temps réel
         self.plot_data.clear()
@@ -727,6 +803,102 @@ class DashboardAppBack:
                 print(f"Error loading mappings: {e}")
         return False
 
+    def _connected_imu_mapping(self):
+        """IMU id -> body part for the connected, mapped IMUs."""
+        connected = set((self.sensor_config or {}).get('imu_ids', []))
+        mappings = self.ui.model_3d_widget.get_current_mappings()
+        return {imu_id: part for imu_id, part in mappings.items() if imu_id in connected and part}
+
+    def save_calibration_profile(self):
+        """Persist the T-pose calibration just completed (subject file + local cache)."""
+        # Nouvelle calibration : plus rien à vérifier
+        self._drift_check_pending = False
+        self._drift_check_since = None
+        subject_file = getattr(self.ui, 'subject_file', None)
+        if not subject_file:
+            print("[INFO] No subject file: calibration profile not saved")
+            return False
+        offsets, spread = self.ui.model_3d_widget.get_calibration()
+        profile = make_profile(self._connected_imu_mapping(), offsets, spread)
+        if not profile["entries"]:
+            return False
+        saved = save_calibration_profile(subject_file, profile)
+        if saved:
+            print(f"[INFO] Calibration profile saved for {len(profile['entries'])} IMU(s)")
+        return saved
+
+    def restore_calibration_profile(self):
+        """Reload this subject's calibration for the current mapping; its drift check waits for the user."""
+        if not hasattr(self.ui, 'model_3d_widget') or not self.ui.model_3d_widget:
+            return False
+        mapping = self._connected_imu_mapping()
+        try:
+            profile = load_calibration_profile(getattr(self.ui, 'subject_file', None), mapping)
+        except Exception as e:
+            print(f"[ERROR] Error loading calibration profile: {e}")
+            return False
+        if profile is None:
+            print("[INFO] No calibration profile for this subject and mapping - T-pose calibration required")
+            return False
+        offsets, spread = profile
+        self.ui.model_3d_widget.load_calibration(offsets, spread)
+        print(f"[INFO] Calibration profile loaded for {len(offsets)} body part(s) - "
+              f"drift checked once the subject is confirmed in T-pose")
+        # Une fenêtre immobile ne suffit pas (bras le long du corps) : l'utilisateur confirme
+        # la T-pose au début de l'enregistrement, voir confirm_calibration_drift_check
+        self._drift_check_pending = True
+        self._drift_check_since = None
+        return True
+
+    def confirm_calibration_drift_check(self):
+        """Ask whether the subject holds a T-pose now; only then is the restored profile checked."""
+        self._drift_check_pending = False
+        answer = QMessageBox.question(
+            self.ui, "Calibration check",
+            "A T-pose calibration was restored for this subject.\n"
+            "Ask the subject to hold a T-pose, then click Yes to check it for drift.\n"
+            "Click No to keep the restored calibration without checking it.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if answer != QMessageBox.Yes:
+            print("[INFO] Calibration drift check skipped - restored profile kept")
+            return False
+        # Vérifié dans on_pipeline_frame sur la première fenêtre T-pose stable après la confirmation
+        self._drift_check_since = time.time()
+        return True
+
+    def check_calibration_drift(self):
+        """Offer a recalibration when the reloaded offsets no longer match the subject's T-pose.
+
+        Returns None (check still pending) until a stable T-pose window has been buffered
+        since the user confirmed the T-pose. The check is dropped when no such window comes
+        within DRIFT_CHECK_TIMEOUT_S, so a later still pose is never taken for a T-pose.
+        """
+        if not hasattr(self.ui, 'model_3d_widget') or not self.ui.model_3d_widget:
+            return None
+        drift = self.ui.model_3d_widget.check_calibration_drift(self._drift_check_since)
+        if drift is None:
+            if time.time() - self._drift_check_since > DRIFT_CHECK_TIMEOUT_S:
+                print("[INFO] No stable T-pose for the drift check - restored profile kept")
+                self._drift_check_since = None
+            return None
+        self._drift_check_since = None
+        body_part, worst = max(drift.items(), key=lambda item: item[1])
+        if worst <= CALIBRATION_DRIFT_DEG:
+            print(f"[INFO] Calibration profile still valid (max drift {worst:.1f} deg on {body_part})")
+            return False
+        print(f"[INFO] Calibration drift {worst:.1f} deg on {body_part}")
+        answer = QMessageBox.question(
+            self.ui, "Calibration drift",
+            f"The restored calibration is off by {worst:.1f}° on {body_part}.\n"
+            "Recalibrate now? The subject must hold a T-pose until the calibration completes.",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+        if answer != QMessageBox.Yes:
+            print("[INFO] Recalibration declined - restored profile kept")
+            return True
+        # Même chemin que le bouton : la calibration n'est sauvegardée que si elle a été demandée
+        self.ui.start_tpose_calibration()
+        return True
+
     def update_sensor_mappings(self, emg_mappings, imu_mappings, pmmg_mappings):
         try:
             # Stocker les mappings dans le backend
@@ -781,6 +953,7 @@ class DashboardAppBack:
     def cleanup_on_close(self):
         self.save_mappings()
         self.stop_ethernet_server()
+        self.imu_pipeline.stop()
 
     def handle_connection_error(self, reason="Unknown error"):
         """Gère les erreurs de connexion et la déconnexion."""
@@ -809,20 +982,31 @@ class DashboardAppBack:
         QMessageBox.warning(self.ui, "Connection Problem", f"Disconnected from device: {reason}")
 
 
-    def export_recorded_data_to_csv(self, filename="recorded_data.csv"):
-        """Export all recorded sensor data to a CSV file."""
-        data = self.recorded_data
-        # Exemple simple pour EMG, IMU, pMMG (à adapter selon la structure réelle)
-        rows = []
-        max_len = max(len(lst) for sensor_type in data for lst in data[sensor_type])
-        for i in range(max_len):
-            row = {}
-            for sensor_type in data:
-                for idx, sensor_data in enumerate(data[sensor_type]):
-                    key = f"{sensor_type}{idx+1}"
-                    value = sensor_data[i] if i < len(sensor_data) else None
-                    row[key] = value
-            rows.append(row)
-        df = pd.DataFrame(rows)
-        df.to_csv(filename, index=False)
-        print(f"Data exported to {filename}")
\ No newline at end of file
+    def recorded_sensor_groups(self):
+        """
+        Streams computed during the last recording, to store with its trial:
+        {"IMU_filtered": {"imu<id>": (n, 4)}, "IMU_quality": {"imu<id>": (n,) int8}}.
+
+        Quality codes are indices in QUALITY_LEVELS, -1 where the filter was disabled.
+        Empty when nothing was recorded.
+        """
+        imu_ids = list((self.sensor_config or {}).get('imu_ids', []))
+        filtered, quality = {}, {}
+        for i, imu_id in enumerate(imu_ids):
+            if i >= len(self.recorded_data["IMU_filtered"]) or not self.recorded_data["IMU_filtered"][i]:
+                continue
+            name = f"imu{imu_id}"
+            filtered[name] = np.asarray(self.recorded_data["IMU_filtered"][i], dtype=np.float32)
+            codes = np.asarray(self.recorded_data["IMU_quality"][i], dtype=np.float64)
+            quality[name] = np.where(np.isnan(codes), -1, codes).astype(np.int8)
+        if not filtered:
+            return {}
+        return {"IMU_filtered": filtered, "IMU_quality": quality}
+
+    def export_recorded_data_to_csv(self, filename="recorded_data.csv", max_part_bytes=None):
+        """Export all recorded sensor data to CSV, block by block (optionally split into size-capped parts)."""
+        return write_csv(iter_recording_batches(self.recorded_data), filename, max_part_bytes=max_part_bytes)
+
+    def export_recorded_data_to_columnar(self, filename="recorded_data.parquet"):
+        """Export the recorded data to Parquet or Feather (format taken from the extension)."""
+        return write_columnar(iter_recording_batches(self.recorded_data), filename)
@@ -25,6 +25,8 @@ from plots.model_3d_viewer import Model3DWidget
 from plots.sensor_dialogue import SensorMappingDialog
 # Import logic from the backend file
 from plots.back.dashboard_app_back import DashboardAppBack  # Utiliser un chemin absolu
+from utils.hdf5_utils import load_metadata
+from utils.imu_pipeline import IMU_FILTER_PRESETS
 
 
 class DashboardApp(QMainWindow):
@@ -216,6 +218,11 @@ class DashboardApp(QMainWindow):
 
         self.model_3d_widget = Model3DWidget()
         print(f"Created 3D model widget: {self.model_3d_widget}")
+        self.model_3d_widget.calibration_completed.connect(self.backend.save_calibration_profile)
+        if self.subject_file:
+            # Longueurs des segments du squelette depuis l'anthropométrie du sujet
+            metadata, _ = load_metadata(self.subject_file)
+            self.model_3d_widget.set_anthropometrics(metadata)
 
         # Forcer des dimensions visibles pour le widget 3D
         self.model_3d_widget.setMinimumSize(300, 300)
@@ -277,8 +284,36 @@ class DashboardApp(QMainWindow):
             }
         """)
         
+        # Mode performance : moins de détails 3D pour les portables du labo
+        self.performance_mode_button = QPushButton("Performance Mode")
+        self.performance_mode_button.setCheckable(True)
+        self.performance_mode_button.setChecked(self.model_3d_widget.is_performance_mode())
+        self.performance_mode_button.setToolTip("No antialiasing, lighter floor grid and joint spheres "
+                                                "(multisample buffers are released at next start)")
+        self.performance_mode_button.toggled.connect(self.model_3d_widget.set_performance_mode)
+        self.performance_mode_button.setStyleSheet("""
+            QPushButton {
+                background-color: #9e9e9e;
+                border: none;
+                border-radius: 6px;
+                padding: 8px 16px;
+                color: white;
+                font-size: 14px;
+                font-weight: 500;
+                text-align: center;
+                min-width: 120px;
+            }
+            QPushButton:hover {
+                background-color: #8e8e8e;
+            }
+            QPushButton:checked {
+                background-color: #4caf50;
+            }
+        """)
+
         view_controls_layout.addWidget(self.animate_button)
         view_controls_layout.addWidget(self.reset_view_button)
+        view_controls_layout.addWidget(self.performance_mode_button)
         view_controls_group.setLayout(view_controls_layout)
         right_panel.addWidget(view_controls_group)
         
@@ -381,6 +416,20 @@ class DashboardApp(QMainWindow):
         
         advanced_features_layout.addWidget(self.motion_prediction_button)
         advanced_features_layout.addWidget(self.motion_state_label)
+
+        # Filtrage IMU en direct (étage de traitement du backend)
+        imu_filter_layout = QHBoxLayout()
+        imu_filter_layout.addWidget(QLabel("IMU filter:"))
+        self.imu_filter_combo = QComboBox()
+        self.imu_filter_combo.addItems(list(IMU_FILTER_PRESETS))
+        self.imu_filter_combo.setCurrentText(self.backend.imu_filter_stage.preset)
+        self.imu_filter_combo.currentTextChanged.connect(self.backend.set_imu_filter_preset)
+        imu_filter_layout.addWidget(self.imu_filter_combo, stretch=1)
+        self.imu_filter_latency_label = QLabel("Latency: -")
+        self.imu_filter_latency_label.setStyleSheet("color: #666; font-style: italic;")
+        self.imu_filter_latency_label.setAlignment(Qt.AlignCenter)
+        advanced_features_layout.addLayout(imu_filter_layout)
+        advanced_features_layout.addWidget(self.imu_filter_latency_label)
         advanced_features_group.setLayout(advanced_features_layout)
         right_panel.addWidget(advanced_features_group)
         
@@ -487,6 +536,8 @@ class DashboardApp(QMainWindow):
         # Timer pour mettre à jour le statut de calibration
         self.calibration_status_timer = QTimer(self)
         self.calibration_status_timer.timeout.connect(self.update_calibration_status_ui)
+        self.calibration_status_timer.timeout.connect(
+            lambda: self.imu_filter_latency_label.setText(self.backend.imu_pipeline_status()))
         self.calibration_status_timer.start(500)  # Mise à jour toutes les 500ms
         
         content_layout.addLayout(left_panel, stretch=1)
@@ -0,0 +1,88 @@
+from PyQt5.QtCore import QObject, QTimer, QElapsedTimer
+
+
+class FrameScheduler(QObject):
+    """
+    Single source of repaints for a GL widget.
+
+    State changes call request_frame() (dirty flag); any number of requests between two
+    frames give a single update(). Animators are callables run once per frame with the
+    elapsed time in seconds; the scheduler keeps ticking while one of them returns True.
+    When nothing is dirty, no animator is active or the widget is hidden, no timer runs.
+    """
+
+    def __init__(self, widget, interval_ms=16):
+        super().__init__(widget)
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.dirty = False
+        self._animators = {}
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._on_frame)
+        self._clock = QElapsedTimer()
+        self._clock.start()
+        self._last_tick_ms = -interval_ms
+
+    @property
+    def idle(self):
+        return not self._timer.isActive()
+
+    def request_frame(self):
+        """Mark the scene as changed; it is repainted on the next frame slot."""
+        self.dirty = True
+        self._schedule()
+
+    def add_animator(self, name, callback):
+        """Run callback(dt) every frame until it returns False or is removed."""
+        self._animators[name] = callback
+        self._schedule()
+
+    def remove_animator(self, name):
+        self._animators.pop(name, None)
+
+    def resume(self):
+        """Restart ticking after the widget was hidden, if there is anything to do."""
+        self._schedule()
+
+    def stop(self):
+        self._timer.stop()
+        self._animators.clear()
+        self.dirty = False
+
+    def _visible(self):
+        widget = self.widget
+        return widget.isVisible() and not widget.window().isMinimized()
+
+    def _schedule(self):
+        if self._timer.isActive() or not (self.dirty or self._animators):
+            return
+        if not self._visible():
+            # Rien à dessiner pour l'instant : resume() relance depuis showEvent/paintGL
+            return
+        since_last = self._clock.elapsed() - self._last_tick_ms
+        self._timer.start(max(0, self.interval_ms - since_last))
+
+    def _on_frame(self):
+        now = self._clock.elapsed()
+        # Pas de rattrapage après une pause : dt est borné à quelques frames
+        dt = min(now - self._last_tick_ms, 4 * self.interval_ms) / 1000.0
+        self._last_tick_ms = now
+        if not self._visible():
+            return
+
+        for name, callback in list(self._animators.items()):
+            try:
+                keep_running = callback(dt)
+            except Exception as e:
+                print(f"[ERROR] Animator '{name}' failed: {e}")
+                keep_running = False
+            if not keep_running:
+                self._animators.pop(name, None)
+            self.dirty = True
+
+        if self.dirty:
+            self.dirty = False
+            self.widget.update()
+        self._schedule()
@@ -0,0 +1,105 @@
+import numpy as np
+
+from utils import quaternion_math as qmath
+
+# Le squelette par défaut du viewer mesure 1.70 m (tête à y = 1.7)
+REFERENCE_HEIGHT_CM = 170.0
+
+# Métadonnée anthropométrique -> (longueur du segment en fraction de la taille, os concernés).
+# Un os est nommé par sa partie enfant : 'biceps_l' est l'os deltoid_l -> biceps_l.
+# Fractions de Winter (Biomechanics and Motor Control of Human Movement).
+ANTHROPOMETRIC_SEGMENTS = {
+    'participant_upperarm_length_cm': (0.186, ('biceps_l', 'biceps_r', 'forearm_l', 'forearm_r')),
+    'participant_forearm_length_cm': (0.146, ('left_hand', 'right_hand')),
+    'participant_thigh_length_cm': (0.245, ('quadriceps_l', 'quadriceps_r',
+                                            'ishcio_hamstrings_l', 'ishcio_hamstrings_r')),
+    'participant_shank_length_cm': (0.246, ('calves_l', 'calves_r', 'left_foot', 'right_foot')),
+}
+
+
+def _positive_float(value):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+class KinematicChain:
+    """
+    Forward kinematics of the skeleton tree.
+
+    Each non-root part hangs from its parent by a rest offset (T-pose bone vector).
+    The offset is rotated by the parent's orientation, so an IMU on the upper arm moves
+    the forearm and the hand. Positions of the whole tree are obtained in one pass:
+    positions = root_position + ancestry @ rotated_bones, where ancestry[i, j] = 1 when
+    bone j lies on the path from the root to part i.
+    """
+
+    def __init__(self, names, parents, rest_positions):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.parents = np.asarray(parents, dtype=np.intp)
+        self.rest_positions = np.array(rest_positions, dtype=np.float64)
+        n = len(self.names)
+
+        self._children = np.flatnonzero(self.parents >= 0)
+        self._bone_parents = self.parents[self._children]
+        self.offsets = np.zeros((n, 3))
+        self.offsets[self._children] = (self.rest_positions[self._children]
+                                        - self.rest_positions[self._bone_parents])
+        self.scales = np.ones(n)
+
+        self.ancestry = np.zeros((n, n))
+        self.root_of = np.arange(n)
+        for i in range(n):
+            j = i
+            for _ in range(n + 1):
+                if self.parents[j] < 0:
+                    break
+                self.ancestry[i, j] = 1.0
+                j = self.parents[j]
+            else:
+                raise ValueError(f"Cycle in the skeleton hierarchy at '{self.names[i]}'")
+            self.root_of[i] = j
+        self._bones = np.zeros((n, 3))
+
+    def set_anthropometrics(self, metadata):
+        """Scale bone lengths from participant_*_cm metadata. Returns the number of segments used."""
+        metadata = metadata or {}
+        self.scales[:] = 1.0
+        height = _positive_float(metadata.get('participant_height_cm'))
+        if height:
+            self.scales[:] = height / REFERENCE_HEIGHT_CM
+
+        used = 0
+        for field, (ratio, parts) in ANTHROPOMETRIC_SEGMENTS.items():
+            length = _positive_float(metadata.get(field))
+            if length is None:
+                continue
+            idx = [self.index[p] for p in parts if p in self.index]
+            self.scales[idx] = length / (ratio * REFERENCE_HEIGHT_CM)
+            used += 1
+        return used
+
+    def solve(self, positions, rotations, out=None):
+        """World positions from root positions and (N, 4) world orientations.
+
+        Only the root rows of positions are read. out may be positions itself.
+        """
+        root_positions = np.asarray(positions, dtype=np.float64)[self.root_of]
+        matrices = qmath.to_matrix(np.asarray(rotations)[self._bone_parents])
+        scaled = self.offsets[self._children] * self.scales[self._children, None]
+        self._bones[self._children] = np.einsum('nij,nj->ni', matrices, scaled)
+        if out is None:
+            out = np.empty_like(root_positions)
+        np.add(root_positions, self.ancestry @ self._bones, out=out)
+        return out
+
+    def rest_pose(self, floor_height=None):
+        """Scaled T-pose positions; if floor_height is given, the lowest part is placed on it."""
+        identity = np.tile([1.0, 0.0, 0.0, 0.0], (len(self.names), 1))
+        positions = self.solve(self.rest_positions, identity)
+        if floor_height is not None:
+            positions[:, 1] += floor_height - positions[:, 1].min()
+        return positions
@@ -1,22 +1,33 @@
 import sys
 import os
 import numpy as np
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout
-from PyQt5.QtCore import Qt, QTimer, QElapsedTimer
-from PyQt5.QtOpenGL import QGLWidget, QGLFormat
-from PyQt5.QtGui import QFont, QPainter, QColor  # Added QColor import
+from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QOpenGLWidget
+from PyQt5.QtCore import Qt, QElapsedTimer, pyqtSignal
+from PyQt5.QtGui import QFont, QPainter, QColor, QSurfaceFormat
 from OpenGL.GL import *
 from OpenGL.GLU import *
-import math
 import time  # Import time module for optimized updates
 
 # Add parent directory to path for proper module imports
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from utils.body_motion_predictor import MotionPredictorFactory
+from utils.body_motion_predictor import MotionPredictorFactory, BODY_RELATIONS
+from utils import quaternion_math as qmath
+from utils.imu_calibration import IMURingBuffer, tpose_offsets, calibration_drift
+from plots.pose_state import PoseState
+from plots.kinematics import KinematicChain
+from plots.frame_scheduler import FrameScheduler
+from plots.overlay import OverlayTexture
+from plots.walking_animation import walking_tracks
+from plots.skeleton_renderer import (SkeletonRenderer, SENSOR_COLORS, JOINT_LODS, perspective_matrix,
+                                    look_at_matrix, rotation_matrix, project_points)
+from plots.render_settings import (load_render_settings, save_render_settings,
+                                   antialiasing_samples, floor_grid_size)
 
 # Définir la classe Model3DWidget au début pour qu'elle soit disponible lors des imports
 class Model3DWidget(QWidget):
     """Widget wrapper for the 3D model viewer."""
+
+    calibration_completed = pyqtSignal()  # Nouvelle calibration T-pose terminée (offsets à sauvegarder)
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -31,6 +42,7 @@ class Model3DWidget(QWidget):
         
         # Create the OpenGL viewer
         self.model_viewer = Model3DViewer(self)
+        self.model_viewer.calibration_completed.connect(self.calibration_completed)
         # Forcer la transparence du viewer OpenGL
         self.model_viewer.setAttribute(Qt.WA_TranslucentBackground)
         layout.addWidget(self.model_viewer)
@@ -45,6 +57,10 @@ class Model3DWidget(QWidget):
         """Forward IMU data to the internal viewer."""
         return self.model_viewer.apply_imu_data(imu_id, quaternion_data)
     
+    def push_imu_samples(self, imu_ids, quaternions, timestamp=None):
+        """Forward one acquisition sample of all IMUs to the viewer's calibration buffer."""
+        self.model_viewer.push_imu_samples(imu_ids, quaternions, timestamp)
+
     def map_imu_to_body_part(self, imu_id, body_part):
         """Forward IMU mapping to the internal viewer."""
         return self.model_viewer.map_imu_to_body_part(imu_id, body_part)
@@ -83,64 +99,47 @@ class Model3DWidget(QWidget):
         """Get calibration status."""
         return self.model_viewer.get_calibration_status()
 
-# --- Quaternion Utility Functions ---
-def normalize_quaternion(q):
-    norm = np.linalg.norm(q)
-    if norm < 1e-9:  # Avoid division by zero
-        return np.array([1.0, 0.0, 0.0, 0.0])  # Identity quaternion
-    return np.array(q) / norm
-
-def quaternion_multiply(q1, q2):
-    w1, x1, y1, z1 = q1
-    w2, x2, y2, z2 = q2
-    w = w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2
-    x = w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2
-    y = w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2
-    z = w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2
-    return normalize_quaternion(np.array([w, x, y, z]))
-
-def quaternion_from_axis_angle(axis, angle_rad):
-    axis = np.array(axis)
-    axis = axis / np.linalg.norm(axis)
-    half_angle = angle_rad / 2.0
-    w = math.cos(half_angle)
-    x, y, z = axis * math.sin(half_angle)
-    return normalize_quaternion(np.array([w, x, y, z]))
-
-def quaternion_to_matrix(q):
-    """Converts a quaternion to a 4x4 rotation matrix (OpenGL format)"""
-    w, x, y, z = q
-    x2, y2, z2, w2 = x*x, y*y, z*z, w*w
-    xy, xz, yz = x*y, x*z, y*z
-    wx, wy, wz = w*x, w*y, w*z
-
-    # Format compatible with OpenGL - column-major order
-    m = np.array([
-        [1-2*(y2+z2),   2*(xy-wz),    2*(xz+wy),  0],
-        [2*(xy+wz),   1-2*(x2+z2),    2*(yz-wx),  0],
-        [2*(xz-wy),     2*(yz+wx),  1-2*(x2+y2),  0],
-        [0,             0,            0,          1]
-    ], dtype=np.float32).flatten(order='F')  # 'F' corresponds to column-major order for OpenGL
-    
-    return m
+    def get_calibration(self):
+        """Get calibration offsets and spreads per body part."""
+        return self.model_viewer.get_calibration()
+
+    def load_calibration(self, offsets, spread_deg=None):
+        """Restore saved calibration offsets."""
+        return self.model_viewer.load_calibration(offsets, spread_deg)
+
+    def check_calibration_drift(self, since=None):
+        """Drift of the current calibration in the last T-pose window."""
+        return self.model_viewer.check_calibration_drift(since)
+
+    def set_anthropometrics(self, metadata):
+        """Scale the skeleton from the participant's metadata."""
+        return self.model_viewer.set_anthropometrics(metadata)
+
+    def set_performance_mode(self, enabled):
+        """Toggle the low-detail rendering mode."""
+        return self.model_viewer.set_performance_mode(enabled)
+
+    def is_performance_mode(self):
+        return self.model_viewer.performance_mode
 
-class Model3DViewer(QGLWidget):
+class Model3DViewer(QOpenGLWidget):
+    calibration_completed = pyqtSignal()
     def __init__(self, parent=None):
-        fmt = QGLFormat()
-        fmt.setDoubleBuffer(True)
-        fmt.setSampleBuffers(True)
+        super().__init__(parent)
+
+        # Mode performance (sans antialiasing, grille allégée) conservé entre les lancements
+        self.render_settings = load_render_settings()
+        self.performance_mode = bool(self.render_settings.get("performance_mode", False))
+
+        fmt = QSurfaceFormat()
+        fmt.setVersion(2, 1)  # OpenGL 2.1 est largement supporté
+        fmt.setProfile(QSurfaceFormat.CompatibilityProfile)
+        fmt.setDepthBufferSize(24)
+        fmt.setSamples(antialiasing_samples(self.performance_mode))
         fmt.setSwapInterval(1)
         # Très important: activer la transparence du format OpenGL
-        fmt.setAlpha(True)
-        
-        # Try to set a standard OpenGL version
-        try:
-            fmt.setVersion(2, 1)  # OpenGL 2.1 est largement supporté
-            fmt.setProfile(QGLFormat.CompatibilityProfile)
-        except:
-            pass  # Ignorer si la version n'est pas supportée
-        
-        super().__init__(fmt, parent)
+        fmt.setAlphaBufferSize(8)
+        self.setFormat(fmt)
         
         # Add flag to track widget destruction state
         self.is_being_destroyed = False
@@ -165,41 +164,42 @@ class Model3DViewer(QGLWidget):
         self.fps = 0
         self.show_fps = True
 
-        identity_quaternion = np.array([1.0, 0.0, 0.0, 0.0])
-        
-        self.body_parts = {
-            'head': {'pos': np.array([0, 1.7, 0]), 'rot': identity_quaternion.copy()},
-            'neck': {'pos': np.array([0, 1.5, 0]), 'rot': identity_quaternion.copy()},
-            'torso': {'pos': np.array([0, 0.9, 0]), 'rot': identity_quaternion.copy()},
-            'deltoid_l': {'pos': np.array([-0.15, 1.4, 0]), 'rot': identity_quaternion.copy()},
-            'biceps_l': {'pos': np.array([-0.3, 1.3, 0]), 'rot': identity_quaternion.copy()},
-            'forearm_l': {'pos': np.array([-0.4, 1.1, 0]), 'rot': identity_quaternion.copy()},
-            'dorsalis_major_l': {'pos': np.array([-0.1, 1.2, 0]), 'rot': identity_quaternion.copy()},
-            'pectorals_l': {'pos': np.array([-0.1, 1.3, 0]), 'rot': identity_quaternion.copy()},
-            'left_hand': {'pos': np.array([-0.5, 0.8, 0]), 'rot': identity_quaternion.copy()},
-            'deltoid_r': {'pos': np.array([0.15, 1.4, 0]), 'rot': identity_quaternion.copy()},
-            'biceps_r': {'pos': np.array([0.3, 1.3, 0]), 'rot': identity_quaternion.copy()},
-            'forearm_r': {'pos': np.array([0.4, 1.1, 0]), 'rot': identity_quaternion.copy()},
-            'dorsalis_major_r': {'pos': np.array([0.1, 1.2, 0]), 'rot': identity_quaternion.copy()},
-            'pectorals_r': {'pos': np.array([0.1, 1.3, 0]), 'rot': identity_quaternion.copy()},
-            'right_hand': {'pos': np.array([0.5, 0.8, 0]), 'rot': identity_quaternion.copy()},
-            'hip': {'pos': np.array([0, 0.9, 0]), 'rot': identity_quaternion.copy()},
-            'quadriceps_l': {'pos': np.array([-0.15, 0.7, 0]), 'rot': identity_quaternion.copy()},
-            'quadriceps_r': {'pos': np.array([0.15, 0.7, 0]), 'rot': identity_quaternion.copy()},
-            'ishcio_hamstrings_l': {'pos': np.array([-0.15, 0.6, 0]), 'rot': identity_quaternion.copy()},
-            'ishcio_hamstrings_r': {'pos': np.array([0.15, 0.6, 0]), 'rot': identity_quaternion.copy()},
-            'calves_l': {'pos': np.array([-0.2, 0.3, 0]), 'rot': identity_quaternion.copy()},
-            'calves_r': {'pos': np.array([0.2, 0.3, 0]), 'rot': identity_quaternion.copy()},
-            'glutes_l': {'pos': np.array([-0.15, 0.8, 0]), 'rot': identity_quaternion.copy()},
-            'glutes_r': {'pos': np.array([0.15, 0.8, 0]), 'rot': identity_quaternion.copy()},
-            'left_foot': {'pos': np.array([-0.2, 0.0, 0]), 'rot': identity_quaternion.copy()},
-            'right_foot': {'pos': np.array([0.2, 0.0, 0]), 'rot': identity_quaternion.copy()}
-        }
-        
-        self.initial_body_parts_state = {
-            name: {'pos': data['pos'].copy(), 'rot': data['rot'].copy()}
-            for name, data in self.body_parts.items()
+        # Positions T-pose par défaut ; la pose est stockée en tableaux (N,3)/(N,4), voir PoseState
+        default_positions = {
+            'head': [0, 1.7, 0],
+            'neck': [0, 1.5, 0],
+            'torso': [0, 0.9, 0],
+            'deltoid_l': [-0.15, 1.4, 0],
+            'biceps_l': [-0.3, 1.3, 0],
+            'forearm_l': [-0.4, 1.1, 0],
+            'dorsalis_major_l': [-0.1, 1.2, 0],
+            'pectorals_l': [-0.1, 1.3, 0],
+            'left_hand': [-0.5, 0.8, 0],
+            'deltoid_r': [0.15, 1.4, 0],
+            'biceps_r': [0.3, 1.3, 0],
+            'forearm_r': [0.4, 1.1, 0],
+            'dorsalis_major_r': [0.1, 1.2, 0],
+            'pectorals_r': [0.1, 1.3, 0],
+            'right_hand': [0.5, 0.8, 0],
+            'hip': [0, 0.9, 0],
+            'quadriceps_l': [-0.15, 0.7, 0],
+            'quadriceps_r': [0.15, 0.7, 0],
+            'ishcio_hamstrings_l': [-0.15, 0.6, 0],
+            'ishcio_hamstrings_r': [0.15, 0.6, 0],
+            'calves_l': [-0.2, 0.3, 0],
+            'calves_r': [0.2, 0.3, 0],
+            'glutes_l': [-0.15, 0.8, 0],
+            'glutes_r': [0.15, 0.8, 0],
+            'left_foot': [-0.2, 0.0, 0],
+            'right_foot': [0.2, 0.0, 0]
         }
+        self.body_parts = PoseState(default_positions.keys(), list(default_positions.values()),
+                                    relations=BODY_RELATIONS)
+        self.initial_body_parts_state = self.body_parts.copy()
+
+        # Chaîne cinématique : les rotations (IMU, animation) déplacent les segments enfants
+        self.kinematics = KinematicChain(self.body_parts.names, self.body_parts.parents, self.body_parts.positions)
+        self.use_forward_kinematics = True
 
         self.imu_mapping = {}
         self.emg_mapping = {}  # Initialize EMG mapping dictionary
@@ -212,20 +212,35 @@ class Model3DViewer(QGLWidget):
             'right_knee': 'calves_r'
         }
         
+        # Pistes de marche (frames, parties, 3/4) calculées au premier lancement, partagées entre viewers
         self.num_precalc_frames = 120
-        self.precalculated_animation_frames = self._precalculate_animation(self.num_precalc_frames)
+        self.walking_tracks = None
         self.precalc_frame = 0
         
-        self.display_list = 0
         self.quadric = None
-        
-        self.animation_main_timer = QTimer(self)
-        self.animation_main_timer.timeout.connect(self.update_animation_frame)
-        self.animation_main_timer.setInterval(16)
+        # Légende + FPS : texture recalculée seulement quand son contenu change
+        self.overlay = OverlayTexture()
+        self._overlay_fps_text = None
+        self.renderer = SkeletonRenderer(self.body_parts.keys())
+        self._apply_detail_settings()
+        # Sol du rendu immédiat (sans VBO) mis en cache dans une display list
+        self._floor_list = 0
+        self._floor_list_grid = None
 
-        self.fps_update_timer = QTimer(self)
-        self.fps_update_timer.timeout.connect(self.update_fps)
-        self.fps_update_timer.start(1000)
+        # Étiquettes des capteurs : liste et tampon d'écran réutilisés à chaque frame,
+        # positions projetées sur CPU (pas de glGet*/gluProject)
+        self.labels = []
+        self._label_screen = np.empty((len(self.body_parts), 2))
+        self._joint_screen = np.empty((len(self.body_parts), 2))
+        self._joint_lods = self.renderer.select_lods()
+        self._joints_in_view = np.ones(len(self.body_parts), dtype=bool)
+        self._viewport_size = (max(1, self.width()), max(1, self.height()))
+        self._projection = perspective_matrix(45.0, self._viewport_size[0] / float(self._viewport_size[1]), 0.1, 100.0)
+        
+        # Ordonnanceur unique : toutes les modifications (IMU, animation, calibration, souris)
+        # demandent une frame, au plus un repaint toutes les 16 ms, aucun timer au repos
+        self._fps_frames = 0
+        self.frame_scheduler = FrameScheduler(self, interval_ms=16)
         
         # Initialize the motion predictor - CORRIGER LE CHEMIN DU MODÈLE
         base_dir = os.path.dirname(os.path.dirname(__file__))
@@ -253,250 +268,80 @@ class Model3DViewer(QGLWidget):
         self.calibration_mode = False
         self.calibration_complete = False
         self.calibration_reference = {}
-        self.calibration_timer = QTimer(self)
-        self.calibration_timer.timeout.connect(self.update_calibration_status)
+        self._calibration_elapsed = 0.0
+        self._calibration_started = 0.0  # Début de la fenêtre stable en cours (horloge des échantillons)
         self.calibration_duration = 0
-        self.calibration_required_time = 3000  # 3 secondes en T-pose
-        self.calibration_stability_threshold = 0.1  # Seuil de stabilité des quaternions
-        self.calibration_samples = []
+        self.calibration_window_s = 1.0  # Durée de T-pose stable exigée, à pleine cadence
+        self.calibration_max_spread_deg = 2.0  # Dispersion angulaire RMS max de chaque IMU
+        self.calibration_progress = 0
+        self.calibration_spread = {}  # Partie du corps -> dispersion (deg) de la dernière fenêtre
         self.calibration_status_text = "🔴 Calibration requise - Placez-vous en T-pose"
         
         # Offset de calibration pour chaque partie du corps
         self.calibration_offsets = {}
-                
-    def _precalculate_animation(self, num_frames):
-        """Precalculate animation frames with quaternion rotations and positions."""
-        print(f"Precalculating {num_frames} animation frames in quaternions...")
-        animation_frames = []
-        identity_quat = np.array([1.0, 0.0, 0.0, 0.0])
-
-        for i in range(num_frames):
-            phase = (i / float(num_frames)) * 2 * math.pi
-            
-            # Calculate key angles for animation
-            arm_swing_angle_rad = math.radians(45.0 * math.sin(phase))
-            leg_swing_angle_left_rad = math.radians(40.0 * math.sin(phase))
-            leg_swing_angle_right_rad = math.radians(40.0 * math.sin(phase + math.pi))
-            
-            torso_sway_offset = 0.05 * math.sin(phase)
-            vertical_bounce_offset = 0.03 * math.sin(phase * 2.0)
-            torso_rotation_angle_y_rad = math.radians(10.0 * math.sin(phase))
-            
-            head_rotation_angle_x_rad = math.radians(5.0 * math.sin(phase + 0.2))
-            head_rotation_angle_y_rad = torso_rotation_angle_y_rad * 0.5
-            head_rotation_angle_z_rad = math.radians(3.0 * math.sin(phase))
-
-            # Initialize frame data for all body parts
-            frame_data = {}
-            for part_name in self.body_parts.keys():
-                frame_data[part_name] = {
-                    'pos_offset': np.array([0.0, 0.0, 0.0]), 
-                    'rot_quat': identity_quat.copy()
-                }
-
-            # --- Positions ---
-            # Torso and head - lateral sway and vertical bounce
-            frame_data['torso']['pos_offset'][0] = torso_sway_offset
-            frame_data['head']['pos_offset'][0] = torso_sway_offset * 1.1
-            frame_data['neck']['pos_offset'][0] = torso_sway_offset * 1.05
-            
-            frame_data['torso']['pos_offset'][1] = vertical_bounce_offset
-            frame_data['head']['pos_offset'][1] = vertical_bounce_offset * 1.2
-            frame_data['neck']['pos_offset'][1] = vertical_bounce_offset * 1.1
-            frame_data['hip']['pos_offset'][0] = torso_sway_offset * 0.5
-            frame_data['hip']['pos_offset'][1] = vertical_bounce_offset
-
-            # --- Arm movement positions ---
-            # Forward/backward arm movement
-            frame_data['left_hand']['pos_offset'][2] = -0.3 * math.sin(phase)
-            frame_data['forearm_l']['pos_offset'][2] = -0.2 * math.sin(phase)
-            frame_data['biceps_l']['pos_offset'][2] = -0.1 * math.sin(phase)
-            
-            frame_data['right_hand']['pos_offset'][2] = 0.3 * math.sin(phase)
-            frame_data['forearm_r']['pos_offset'][2] = 0.2 * math.sin(phase)
-            frame_data['biceps_r']['pos_offset'][2] = 0.1 * math.sin(phase)
-            
-            # --- Leg movement positions ---
-            frame_data['left_foot']['pos_offset'][2] = 0.3 * math.sin(phase)
-            frame_data['calves_l']['pos_offset'][2] = 0.2 * math.sin(phase)
-            frame_data['quadriceps_l']['pos_offset'][2] = 0.1 * math.sin(phase)
-            
-            frame_data['right_foot']['pos_offset'][2] = -0.3 * math.sin(phase)
-            frame_data['calves_r']['pos_offset'][2] = -0.2 * math.sin(phase)
-            frame_data['quadriceps_r']['pos_offset'][2] = -0.1 * math.sin(phase)
-
-            # --- Quaternion rotations ---
-            # Torso rotation around Y-axis (yaw)
-            if abs(torso_rotation_angle_y_rad) > 1e-6:
-                frame_data['torso']['rot_quat'] = quaternion_from_axis_angle([0, 1, 0], torso_rotation_angle_y_rad)
-
-            # Combined head rotation (pitch, yaw, roll)
-            q_head_x = quaternion_from_axis_angle([1, 0, 0], head_rotation_angle_x_rad)
-            q_head_y = quaternion_from_axis_angle([0, 1, 0], head_rotation_angle_y_rad)
-            q_head_z = quaternion_from_axis_angle([0, 0, 1], head_rotation_angle_z_rad)
-            combined_head_rot = quaternion_multiply(q_head_y, q_head_x)
-            combined_head_rot = quaternion_multiply(combined_head_rot, q_head_z)
-            frame_data['head']['rot_quat'] = combined_head_rot
-
-            # Arm rotations (pitch - rotation around X)
-            if abs(arm_swing_angle_rad) > 1e-6:
-                left_arm_swing_q = quaternion_from_axis_angle([1, 0, 0], arm_swing_angle_rad)
-                right_arm_swing_q = quaternion_from_axis_angle([1, 0, 0], -arm_swing_angle_rad)
-
-                # Left arm
-                for part in ['deltoid_l', 'biceps_l', 'forearm_l', 'left_hand']:
-                    if part in frame_data:
-                        frame_data[part]['rot_quat'] = left_arm_swing_q
-                
-                # Right arm
-                for part in ['deltoid_r', 'biceps_r', 'forearm_r', 'right_hand']:
-                    if part in frame_data:
-                        frame_data[part]['rot_quat'] = right_arm_swing_q
-            
-            # Leg rotations (pitch - rotation around X)
-            # Left leg
-            if abs(leg_swing_angle_left_rad) > 1e-6:
-                q_leg_l = quaternion_from_axis_angle([1, 0, 0], leg_swing_angle_left_rad)
-                q_knee_l = quaternion_from_axis_angle([1, 0, 0], leg_swing_angle_left_rad * 0.5)
-                q_foot_l = quaternion_from_axis_angle([1, 0, 0], leg_swing_angle_left_rad * 0.2)
-
-                frame_data['quadriceps_l']['rot_quat'] = q_leg_l
-                frame_data['ishcio_hamstrings_l']['rot_quat'] = q_leg_l
-                frame_data['calves_l']['rot_quat'] = q_knee_l
-                frame_data['left_foot']['rot_quat'] = q_foot_l
-            
-            # Right leg
-            if abs(leg_swing_angle_right_rad) > 1e-6:
-                q_leg_r = quaternion_from_axis_angle([1, 0, 0], leg_swing_angle_right_rad)
-                q_knee_r = quaternion_from_axis_angle([1, 0, 0], leg_swing_angle_right_rad * 0.5)
-                q_foot_r = quaternion_from_axis_angle([1, 0, 0], leg_swing_angle_right_rad * 0.2)
-
-                frame_data['quadriceps_r']['rot_quat'] = q_leg_r
-                frame_data['ishcio_hamstrings_r']['rot_quat'] = q_leg_r
-                frame_data['calves_r']['rot_quat'] = q_knee_r
-                frame_data['right_foot']['rot_quat'] = q_foot_r
-            
-            animation_frames.append(frame_data)
-        
-        print(f"Animation precalculation completed: {len(animation_frames)} frames.")
-        return animation_frames
 
+        # Derniers échantillons de tous les IMUs, poussés par l'acquisition (push_imu_samples)
+        self.imu_buffer = IMURingBuffer()
+                
     def get_default_state(self, part_name):
         if part_name in self.initial_body_parts_state:
             return self.initial_body_parts_state[part_name]['pos'], self.initial_body_parts_state[part_name]['rot']
         return np.array([0, 0, 0]), np.array([1.0, 0, 0, 0])
 
     def update_animation_frame(self):
-        """Updates the walking animation using pre-calculated frames."""
+        """Advance the walking animation by one keyframe (masked copy of the tracks)."""
         if not self.walking:
             return
 
         try:
-            # Check the availability of animation frames
-            if not self.precalculated_animation_frames:
-                print("Error: No precalculated animation frames available.")
-                return
-            
-            # Increment frame index and limit it to available frames
-            self.precalc_frame = (self.precalc_frame + 1) % self.num_precalc_frames
-            
-            # Check the index is valid
-            if self.precalc_frame >= len(self.precalculated_animation_frames):
-                print(f"Error: Frame index {self.precalc_frame} out of bounds (max: {len(self.precalculated_animation_frames)-1})")
-                self.precalc_frame = 0  # Reset to 0 to avoid error
-            
-            # Retrieve current frame data
-            current_frame_data = self.precalculated_animation_frames[self.precalc_frame]
+            if self.walking_tracks is None:
+                self.walking_tracks = walking_tracks(self.body_parts.names, self.num_precalc_frames)
+            tracks = self.walking_tracks
+            self.precalc_frame = (self.precalc_frame + 1) % tracks.num_frames
+            frame = self.precalc_frame
 
-            # Store currently mapped IMU body parts to preserve their rotations and positions
+            # Parts driven by IMUs keep their current rotations and positions
             imu_controlled_parts = set(self.imu_mapping.values())
-            imu_rotations = {}
-            imu_positions = {}
-            for part_name in imu_controlled_parts:
-                if part_name in self.body_parts:
-                    imu_rotations[part_name] = self.body_parts[part_name]['rot'].copy()
-                    imu_positions[part_name] = self.body_parts[part_name]['pos'].copy()
-
-            # Apply data to each body part
-            for part_name, data in self.body_parts.items():
-                # Skip IMU-controlled parts to preserve their rotations and positions
-                if part_name in imu_controlled_parts:
-                    continue
-
-                # Check that this part exists in the frame data
-                if part_name in current_frame_data:
-                    # Retrieve base position and rotation (without animation)
-                    base_pos, _ = self.get_default_state(part_name)
-                    
-                    # Retrieve animation offsets and rotations
-                    anim_data = current_frame_data[part_name]
-                    pos_offset = anim_data.get('pos_offset', np.array([0.0, 0.0, 0.0]))
-                    rot_quat = anim_data.get('rot_quat', np.array([1.0, 0.0, 0.0, 0.0]))
-                    
-                    # Apply position offsets to base position
-                    data['pos'] = base_pos + pos_offset
-                    
-                    # Apply rotation quaternion directly
-                    data['rot'] = rot_quat.copy()  # Important copy to avoid shared references
-            
-            # Restore IMU-controlled part rotations and positions
-            for part_name in imu_controlled_parts:
-                if part_name in self.body_parts:
-                    self.body_parts[part_name]['rot'] = imu_rotations[part_name]
-                    self.body_parts[part_name]['pos'] = imu_positions[part_name]
+            imu_mask = self.body_parts.mask(imu_controlled_parts)
+            free = ~imu_mask
+            rotations = self.body_parts.rotations
+            self.body_parts.positions[free] = self.initial_body_parts_state.positions[free] + tracks.offsets[frame, free]
+            rotations[free] = tracks.rotations[frame, free]
 
             # If walking animation is active and using motion prediction, apply prediction
             # only to non-IMU parts
             if self.use_motion_prediction:
                 try:
-                    updated_body_parts = self.motion_predictor.predict_joint_movement(
+                    updated_pose = self.motion_predictor.predict_joint_movement(
                         self.body_parts, imu_controlled_parts, self.walking)
-                    # Apply predictions only to parts not controlled by IMUs
-                    for part_name, data in updated_body_parts.items():
-                        if part_name not in imu_controlled_parts and part_name in self.body_parts:
-                            self.body_parts[part_name]['rot'] = data['rot']
+                    rotations[free] = updated_pose.rotations[free]
                 except Exception as e:
                     print(f"Error in motion prediction: {e}")
 
-            # Mise à jour contrôlée pour éviter les conflits avec les données IMU
-            if not hasattr(self, '_animation_update_pending'):
-                self._animation_update_pending = True
-                QTimer.singleShot(16, self._animation_batch_update)  # 60 FPS max
-                
         except Exception as e:
             print(f"Error in update_animation_frame: {e}")
             import traceback
             traceback.print_exc()
 
-    def _animation_batch_update(self):
-        """Mise à jour groupée pour l'animation."""
-        if hasattr(self, '_animation_update_pending'):
-            self._animation_update_pending = False
-            try:
-                if not self.is_being_destroyed and self.isValid():
-                    self.update()
-            except Exception as e:
-                print(f"[3D_DEBUG] Error during animation batch update: {e}")
+    def _walking_animator(self, dt):
+        """Frame scheduler callback: one keyframe per tick while walking."""
+        self.update_animation_frame()
+        return self.walking
 
     def toggle_walking(self):
         self.walking = not self.walking
         if self.walking:
             self.precalc_frame = 0
-            self.animation_main_timer.start()
+            self.frame_scheduler.add_animator('walking', self._walking_animator)
         else:
-            self.animation_main_timer.stop()
+            self.frame_scheduler.remove_animator('walking')
             # Do NOT reset body parts when stopping animation
             # This preserves IMU-controlled positions
-            self.update()
+            self.frame_scheduler.request_frame()
         return self.walking
     
     def reset_body_parts_to_initial_state(self):
-        for part_name, initial_state in self.initial_body_parts_state.items():
-            if part_name in self.body_parts:
-                self.body_parts[part_name]['pos'] = initial_state['pos'].copy()
-                self.body_parts[part_name]['rot'] = initial_state['rot'].copy()
-        if not self.walking:
-            self.safely_update_display_list()
+        self.body_parts.copy_from(self.initial_body_parts_state)
 
     def reset_view(self):
         self.rotation_x = 0
@@ -510,203 +355,159 @@ class Model3DViewer(QGLWidget):
         self.reset_body_parts_to_initial_state()
             
         # Force a redraw
-        self.update()
+        self.frame_scheduler.request_frame()
         print("3D view reset complete")
 
     def initializeGL(self):
+        """Called by QOpenGLWidget with its context current."""
+        print("Initialize GL started - setting up OpenGL context")
+        self.initialize_scene()
+        # Les ressources GL sont libérées avec le contexte (fermeture, changement de fenêtre)
+        self.context().aboutToBeDestroyed.connect(self._release_gl)
+        print("Initialize GL completed")
+
+    def initialize_scene(self):
+        """Set up GL state and buffers in the current context (widget or offscreen)."""
         try:
-            # First check if we can safely initialize
-            if not self.isValid():
-                print("Warning: Widget not valid during initializeGL")
-                return
-                
-            # Set the initial background color to clearly indicate initialization progress
-            try:
-                self.makeCurrent()
-                glClearColor(0.1, 0.1, 0.2, 1.0)  # Dark blue background
-                self.doneCurrent()
-            except Exception as e:
-                print(f"Warning: Pre-initialization color setting failed: {e}")
-            
-            print("Initialize GL started - setting up OpenGL context")
-            
-            # Capture the context before proceeding with initialization
-            if not self.context() or not self.context().isValid():
-                print("ERROR: OpenGL context is not valid during initialization")
-                return
-                
-            self.makeCurrent()
-            
-            # Initialize OpenGL components with careful error checking
-            try:
-                glClearColor(0.2, 0.2, 0.2, 1.0)  # Standard dark gray background
-                glEnable(GL_DEPTH_TEST)
-                glEnable(GL_CULL_FACE)
-                
-                glShadeModel(GL_SMOOTH)
-                glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)
-                glHint(GL_POLYGON_SMOOTH_HINT, GL_FASTEST)
-                glDisable(GL_LIGHTING)
-                glDisable(GL_DITHER)
-                
-                self.quadric = gluNewQuadric()
-                if not self.quadric:
-                    print("ERROR: Failed to create quadric object")
-                else:
-                    print("Quadric object created successfully")
-                    gluQuadricDrawStyle(self.quadric, GLU_FILL)
-                    gluQuadricNormals(self.quadric, GLU_SMOOTH)
-            except OpenGL.error.GLError as e:
-                print(f"ERROR during OpenGL state setup: {e}")
-                
-            # Make sure display list is initialized to 0
-            self.display_list = 0
-            
-            # Defer resize and display list creation to the event queue
-            # to ensure it happens after the context is fully established
-            QTimer.singleShot(50, self.initialize_viewport_and_display_list)
-            
-            self.doneCurrent()
-            print("Initialize GL completed - deferred viewport setup scheduled")
-        
+            glClearColor(0.2, 0.2, 0.2, 1.0)  # Standard dark gray background
+            glEnable(GL_DEPTH_TEST)
+            glEnable(GL_CULL_FACE)
+
+            glShadeModel(GL_SMOOTH)
+            glHint(GL_PERSPECTIVE_CORRECTION_HINT, GL_FASTEST)
+            glHint(GL_POLYGON_SMOOTH_HINT, GL_FASTEST)
+            glDisable(GL_LIGHTING)
+            glDisable(GL_DITHER)
+
+            self.quadric = gluNewQuadric()
+            if not self.quadric:
+                print("ERROR: Failed to create quadric object")
+            else:
+                gluQuadricDrawStyle(self.quadric, GLU_FILL)
+                gluQuadricNormals(self.quadric, GLU_SMOOTH)
+
+            # Géométrie statique en VBO ; sinon rendu immédiat (glBegin/glEnd) comme avant
+            self.renderer.initialize()
+            self._floor_list = 0
+            self._apply_multisampling()
+            self.overlay.invalidate()
         except OpenGL.error.GLError as e:
-            print(f"OpenGL initialization error: {e}")
-            import traceback
-            traceback.print_exc()
-        except Exception as e:
-            print(f"General error in initializeGL: {e}")
-            import traceback
-            traceback.print_exc()
+            print(f"ERROR during OpenGL state setup: {e}")
 
-    def initialize_viewport_and_display_list(self):
-        """Deferred initialization for viewport and display list to ensure context is ready."""
+    def _release_gl(self):
+        """Free GL objects while the context is still current."""
+        self.makeCurrent()
         try:
-            if not self.isValid() or not self.context() or not self.context().isValid():
-                print("ERROR: Context not valid during deferred initialization")
-                # Schedule another attempt if we're still in startup phase
-                QTimer.singleShot(100, self.initialize_viewport_and_display_list)
-                return
-                
-            self.makeCurrent()
-            
-            # Now setup the viewport with dimensions
-            width, height = self.width(), self.height()
-            print(f"Setting up viewport with dimensions: {width}x{height}")
-            
-            try:
-                glViewport(0, 0, width, height)
-                glMatrixMode(GL_PROJECTION)
-                glLoadIdentity()
-                
-                aspect = width / float(max(1, height))  # Prevent division by zero
-                gluPerspective(45.0, aspect, 0.1, 100.0)
-                
-                glMatrixMode(GL_MODELVIEW)
-                glLoadIdentity()
-                
-                print("Viewport setup complete")
-            except OpenGL.error.GLError as e:
-                print(f"ERROR during viewport setup: {e}")
-            
-            # Now create the display list
-            try:
-                print("Creating initial display list")
-                if self.safely_update_display_list(force=True):
-                    print(f"Display list created successfully, ID: {self.display_list}")
-                else:
-                    print("WARNING: Failed to create initial display list")
-            except Exception as e:
-                print(f"ERROR creating display list: {e}")
-            
+            self.renderer.release()
+            self.overlay.release()
+            if self._floor_list:
+                glDeleteLists(self._floor_list, 1)
+                self._floor_list = 0
+        finally:
             self.doneCurrent()
-            
-            # Force a redraw
-            self.update()
-        except Exception as e:
-            print(f"Error in initialize_viewport_and_display_list: {e}")
-            import traceback
-            traceback.print_exc()
+
+    def resizeGL(self, width, height):
+        # QOpenGLWidget règle déjà glViewport (en pixels physiques) avant paintGL
+        self._setup_projection(width, height)
+
+    def _setup_projection(self, width, height, set_viewport=False):
+        width, height = max(1, width), max(1, height)
+        if set_viewport:
+            glViewport(0, 0, width, height)
+        aspect = width / float(height)
+        self._viewport_size = (width, height)
+        self._projection = perspective_matrix(45.0, aspect, 0.1, 100.0)
+        glMatrixMode(GL_PROJECTION)
+        glLoadIdentity()
+        gluPerspective(45.0, aspect, 0.1, 100.0)
+        glMatrixMode(GL_MODELVIEW)
+        glLoadIdentity()
 
     def paintGL(self):
-        """Render the OpenGL scene."""
-        # Skip rendering if conditions aren't right
+        """Render the OpenGL scene (the widget's context is already current)."""
         if self.is_being_destroyed:
             return
-            
-        if not self.isValid():
-            return
-        
+        self.update_fps()
+        self.render_scene(self.width(), self.height(), pixel_ratio=self.devicePixelRatioF())
+        # Fenêtre restaurée après minimisation : les animations reprennent
+        self.frame_scheduler.resume()
+
+    def render_scene(self, width, height, pixel_ratio=1.0, offscreen=False):
+        """Draw one frame into the current framebuffer (widget or offscreen FBO)."""
+        self.frame_count += 1
+
+        # Log IMU data application occasionally
+        if self.frame_count % 300 == 0:
+            imu_parts = [part for part in self.imu_mapping.values() if part in self.body_parts]
+            if imu_parts:
+                print(f"[3D_DEBUG] Rendering frame {self.frame_count} with IMU parts: {imu_parts}")
+                for part in imu_parts[:2]:  # Log first 2 parts to avoid spam
+                    rot = self.body_parts[part]['rot']
+                    print(f"[3D_DEBUG] {part} rotation: {rot}")
+
         try:
-            # Make sure we have a valid context before proceeding
-            if not self.context() or not self.context().isValid():
-                if self.frame_count % 100 == 0:  # Limit log spam
-                    print("Warning: Invalid OpenGL context during paint")
-                return
-                
-            self.makeCurrent()
-            self.frame_count += 1
-            
-            # Log IMU data application occasionally
-            if self.frame_count % 300 == 0:
-                imu_parts = [part for part in self.imu_mapping.values() if part in self.body_parts]
-                if imu_parts:
-                    print(f"[3D_DEBUG] Rendering frame {self.frame_count} with IMU parts: {imu_parts}")
-                    for part in imu_parts[:2]:  # Log first 2 parts to avoid spam
-                        rot = self.body_parts[part]['rot']
-                        print(f"[3D_DEBUG] {part} rotation: {rot}")
-            
-            try:
-                glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
-                glLoadIdentity()
-                
-                # Position the camera using the camera_distance parameter
-                gluLookAt(0, 1.0, self.camera_distance, 0, 1.0, 0.0, 0, 1.0, 0.0)
-                
-                # Apply global rotations
-                glRotatef(self.rotation_x, 1, 0, 0)
-                glRotatef(self.rotation_y, 0, 1, 0)
-                glRotatef(self.rotation_z, 0, 0, 1)
-                
-                # Draw the floor with transparency handling
-                try:
-                    glDepthMask(GL_FALSE)  # Disable depth writing for transparent floor
-                    self.create_floor()
-                    glDepthMask(GL_TRUE)   # Re-enable depth writing
-                except Exception as e:
-                    if self.frame_count % 100 == 0:  # Limit log spam
-                        print(f"Error drawing floor: {e}")
-                
-                # Force direct drawing to ensure the model is visible
+            if offscreen:
+                self._setup_projection(width, height, set_viewport=True)
+
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glLoadIdentity()
+
+            # Position the camera using the camera_distance parameter
+            gluLookAt(0, 1.0, self.camera_distance, 0, 1.0, 0.0, 0, 1.0, 0.0)
+
+            # Apply global rotations
+            glRotatef(self.rotation_x, 1, 0, 0)
+            glRotatef(self.rotation_y, 0, 1, 0)
+            glRotatef(self.rotation_z, 0, 0, 1)
+
+            # Draw the floor with transparency handling
+            glDepthMask(GL_FALSE)  # Disable depth writing for transparent floor
+            if self.renderer.available:
+                self.renderer.draw_floor()
+            else:
+                self.create_floor()
+            glDepthMask(GL_TRUE)   # Re-enable depth writing
+
+            positions, rotations, sensor_types = self._gather_pose()
+            mvp = self._view_projection_matrix()
+            pixels_per_unit = self._update_joint_visibility(mvp, positions)
+            if self.renderer.available:
+                colors = np.array([SENSOR_COLORS[t] for t in sensor_types], dtype=np.float32)
+                self.renderer.update_pose(positions, rotations, colors,
+                                          pixels_per_unit=pixels_per_unit, in_view=self._joints_in_view)
+                self.renderer.draw_skeleton()
+            else:
+                # Fallback: immediate-mode drawing
                 self.draw_limbs_internal()
                 self.draw_joints_internal()
-                
-                # Draw the legend UI elements
-                try:
-                    self._draw_legend()
-                except Exception as e:
-                    if self.frame_count % 100 == 0:  # Limit log spam
-                        print(f"Error drawing legend: {e}")
-                        
-            except OpenGL.error.GLError as e:
-                if self.frame_count % 30 == 0:  # Limit log spam
-                    print(f"OpenGL error during rendering: {e}")
+            self._update_joint_labels(positions, sensor_types, mvp)
+
+            # Legend and FPS from the cached overlay texture
+            self._overlay_fps_text = f"FPS: {self.fps}" if self.show_fps and not offscreen else None
+            self.overlay.draw(self._overlay_fps_text, width, height, self._paint_legend, pixel_ratio)
+        except OpenGL.error.GLError as e:
+            if self.frame_count % 30 == 0:  # Limit log spam
+                print(f"OpenGL error during rendering: {e}")
         except Exception as e:
             if self.frame_count % 30 == 0:  # Limit log spam
-                print(f"General error in paintGL: {e}")
-        finally:
-            try:
-                if not self.is_being_destroyed and self.isValid():
-                    self.doneCurrent()
-            except Exception:
-                pass  # Suppress errors in cleanup
+                print(f"General error in render_scene: {e}")
 
     def create_floor(self):
-        """Draw a floor grid for reference."""
+        """Draw a floor grid for reference (compiled once into a display list)."""
+        grid_size = floor_grid_size(self.performance_mode)
+        if self._floor_list and self._floor_list_grid == grid_size:
+            glCallList(self._floor_list)
+            return
+        if self._floor_list:
+            glDeleteLists(self._floor_list, 1)
+        self._floor_list = glGenLists(1)
+        self._floor_list_grid = grid_size
+        glNewList(self._floor_list, GL_COMPILE_AND_EXECUTE)
+
         # Use a lighter color with transparency for the floor
         glColor4f(0.3, 0.3, 0.1, 0.8)  # Alpha at 0.8 for slight transparency
         
         floor_size = 10.0
-        grid_size = 0.5
         
         # Enable blending for transparency
         glEnable(GL_BLEND)
@@ -741,53 +542,46 @@ class Model3DViewer(QGLWidget):
         self.draw_direction_marker(floor_size - 0.5, 0.02, -floor_size + 0.5, 0.5)
         self.draw_direction_marker(-floor_size + 0.5, 0.02, floor_size - 0.5, 0.5)
         self.draw_direction_marker(floor_size - 0.5, 0.02, floor_size - 0.5, 0.5)
+        glEndList()
 
-    def _draw_legend(self):
-        """Draws a legend showing the different sensor types."""
-        try:
-            # Use QPainter for drawing text overlays
-            painter = QPainter(self)
-            painter.setRenderHint(QPainter.Antialiasing)
-            painter.setRenderHint(QPainter.TextAntialiasing)
-            
-            # Set up the font
-            font = QFont("Arial", 10, QFont.Bold)
-            painter.setFont(font)
-            
-            # Draw legend title
-            painter.setPen(Qt.white)
-            painter.drawText(10, 20, "Legend:")
-            
-            # Draw sensor types with colors
-            font.setBold(False)
-            painter.setFont(font)
-            
-            # IMU sensors - green
-            painter.setPen(Qt.white)
-            painter.drawText(60, 45, "IMU Sensors")
-            painter.fillRect(30, self.height() - 45, 20, 10, QColor(0, 204, 51))  # Green
-            
-            # EMG sensors - red
-            painter.drawText(60, 65, "EMG Sensors")
-            painter.fillRect(30, self.height() - 65, 20, 10, QColor(204, 51, 0))  # Red
-            
-            # pMMG sensors - blue
-            painter.drawText(60, 85, "pMMG Sensors")
-            painter.fillRect(30, self.height() - 85, 20, 10, QColor(0, 51, 204))  # Blue
-            
-            # Show FPS counter if enabled
-            if self.show_fps:
-                fps_text = f"FPS: {self.fps}"
-                text_width = 80
-                painter.drawText(self.width() - text_width - 10, 20, fps_text)
-            
-            # Draw a border around the legend
-            painter.setPen(QColor(180, 180, 180))
-            painter.drawRect(5, self.height() - 95, 175, 90)
-            
-            painter.end()
-        except Exception as e:
-            print(f"Error drawing legend: {e}")
+    def _paint_legend(self, painter, width, height):
+        """Paint the legend showing the different sensor types (overlay texture contents)."""
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+
+        # Set up the font
+        font = QFont("Arial", 10, QFont.Bold)
+        painter.setFont(font)
+
+        # Draw legend title
+        painter.setPen(Qt.white)
+        painter.drawText(10, 20, "Legend:")
+
+        # Draw sensor types with colors
+        font.setBold(False)
+        painter.setFont(font)
+
+        # IMU sensors - green
+        painter.setPen(Qt.white)
+        painter.drawText(60, 45, "IMU Sensors")
+        painter.fillRect(30, height - 45, 20, 10, QColor(0, 204, 51))  # Green
+
+        # EMG sensors - red
+        painter.drawText(60, 65, "EMG Sensors")
+        painter.fillRect(30, height - 65, 20, 10, QColor(204, 51, 0))  # Red
+
+        # pMMG sensors - blue
+        painter.drawText(60, 85, "pMMG Sensors")
+        painter.fillRect(30, height - 85, 20, 10, QColor(0, 51, 204))  # Blue
+
+        # Show FPS counter if enabled
+        if self._overlay_fps_text:
+            text_width = 80
+            painter.drawText(width - text_width - 10, 20, self._overlay_fps_text)
+
+        # Draw a border around the legend
+        painter.setPen(QColor(180, 180, 180))
+        painter.drawRect(5, height - 95, 175, 90)
 
     def set_color(self, r, g, b):
         """Set the color for the following vertices."""
@@ -801,50 +595,26 @@ class Model3DViewer(QGLWidget):
         """Define a vertex for the following primitive."""
         glVertex3f(x, y, z)
 
-    def draw_fps_counter(self):
-        """Draw the FPS counter on the screen."""
-        try:
-            self.makeCurrent()
-            painter = QPainter(self)
-            painter.setPen(Qt.white)
-            painter.setFont(QFont("Arial", 10))
-            
-            # Afficher le texte avec un fond semi-transparent
-            painter.setOpacity(0.7)
-            painter.fillRect(10, 10, 100, 40, Qt.black)
-            painter.setOpacity(1.0)
-            
-            # Calculer et afficher le FPS
-            self.frame_count += 1
-            if self.fps_timer.elapsed() > 1000:
-                self.fps = self.frame_count
-                self.frame_count = 0
-                self.fps_timer.restart()
-            
-            painter.drawText(15, 25, f"FPS: {self.fps}")
-            
-            painter.end()
-        except Exception as e:
-            print(f"Error in draw_fps_counter: {e}")
-
     def update_fps(self):
-        """Update the FPS counter."""
-        self.frame_count += 1
-        if self.fps_timer.elapsed() > 1000:
-            self.fps = self.frame_count
-            self.frame_count = 0
+        """Update the FPS counter; called once per painted frame."""
+        self._fps_frames += 1
+        elapsed = self.fps_timer.elapsed()
+        if elapsed > 1000:
+            self.fps = round(self._fps_frames * 1000.0 / elapsed)
+            self._fps_frames = 0
             self.fps_timer.restart()
 
+    def showEvent(self, event):
+        """Resume the frame scheduler when the view becomes visible again (tab switch)."""
+        super().showEvent(event)
+        self.frame_scheduler.resume()
+
     def closeEvent(self, event):
         """Handle the widget close event."""
         self.is_being_destroyed = True
         try:
-            # Stop any ongoing timers
-            self.animation_main_timer.stop()
-            self.fps_update_timer.stop()
-            
-            # Perform any necessary cleanup here
-            # For example, freeing OpenGL resources or stopping threads
+            # Stop any ongoing timers (GL resources are freed in _release_gl)
+            self.frame_scheduler.stop()
             
             print("Cleanup before close")
         except Exception as e:
@@ -857,7 +627,7 @@ class Model3DViewer(QGLWidget):
     def check_opengl_state(self):
         """Check and print the current OpenGL state for debugging."""
         try:
-            if not self.isValid() or not self.context() or not self.context().isValid():
+            if not self.isValid():
                 print("ERROR: OpenGL context is not valid")
                 return
             
@@ -885,149 +655,69 @@ class Model3DViewer(QGLWidget):
 
     def get_calibration_status(self):
         """Returns current calibration status."""
-        progress = 0
-        if self.calibration_mode and len(self.calibration_samples) > 0:
-            progress = min(100, (len(self.calibration_samples) * 100) // 30)
-        elif self.calibration_complete:
-            progress = 100
+        progress = 100 if self.calibration_complete else self.calibration_progress
         
         return {
             'mode': self.calibration_mode,
             'complete': self.calibration_complete,
             'progress': progress,
-            'status_text': self.calibration_status_text
+            'status_text': self.calibration_status_text,
+            'spread_deg': dict(self.calibration_spread)
         }
 
+    def push_imu_samples(self, imu_ids, quaternions, timestamp=None):
+        """Buffer one sample of all IMUs ((imus, 4), before calibration offsets) for the T-pose calibration."""
+        self.imu_buffer.push(imu_ids, qmath.normalize(quaternions), time.time() if timestamp is None else timestamp)
+
+    def _calibration_window(self):
+        """Buffered T-pose samples of all mapped IMUs since the current stable window started."""
+        imu_ids = [imu_id for imu_id, part in self.imu_mapping.items() if part in self.body_parts]
+        return self.imu_buffer.window(self.calibration_window_s, imu_ids, since=self._calibration_started)
+
     def update_calibration_status(self):
         """Updates calibration status in real-time."""
         if not self.calibration_mode:
             return
         
         self.calibration_duration += 100
-        
-        # Collect current data from mapped IMUs
-        current_sample = {}
-        stability_check = True
-        
-        for imu_id, body_part in self.imu_mapping.items():
-            if body_part in self.body_parts:
-                current_quat = self.body_parts[body_part]['rot'].copy()
-                current_sample[body_part] = current_quat
-                
-                # Check stability
-                if len(self.calibration_samples) > 5:
-                    last_sample = self.calibration_samples[-1].get(body_part)
-                    if last_sample is not None:
-                        # Calculate angular difference
-                        diff = np.linalg.norm(current_quat - last_sample)
-                        if diff > self.calibration_stability_threshold:
-                            stability_check = False
-        
-        # Add sample if stable
-        if stability_check and current_sample:
-            self.calibration_samples.append(current_sample)
-            
-            # Update status text
-            progress = min(100, (len(self.calibration_samples) * 100) // 30)  # 30 samples = 3 seconds
-            self.calibration_status_text = f"🟡 Calibration: {progress}% - Maintain T-pose"
+        now = time.time()
+
+        # Sans flux d'acquisition (données appliquées directement), on échantillonne la pose affichée
+        mapped = [imu_id for imu_id, part in self.imu_mapping.items() if part in self.body_parts]
+        latest = self.imu_buffer.latest_time
+        if mapped and (latest is None or now - latest > 0.5):
+            rows = self.body_parts.indices([self.imu_mapping[imu_id] for imu_id in mapped])
+            self.imu_buffer.push(mapped, self.body_parts.rotations[rows], now)
+
+        imu_ids, times, window = self._calibration_window()
+        if not mapped or len(imu_ids) < len(mapped) or len(times) < 3:
+            self.calibration_progress = 0
+            self.calibration_status_text = "🟡 Calibration: waiting for IMU data - Maintain T-pose"
         else:
-            # If not stable, slightly reduce samples
-            if len(self.calibration_samples) > 2:
-                self.calibration_samples = self.calibration_samples[:-1]
-            self.calibration_status_text = "🟠 Move less - Keep T-pose stable"
-        
-        # Check if calibration is complete
-        if len(self.calibration_samples) >= 30:  # 3 seconds of stable data
-            self.stop_tpose_calibration()
+            # Stabilité : dispersion angulaire RMS de chaque IMU autour de sa moyenne
+            _, spread = tpose_offsets(window)
+            spread_deg = np.degrees(spread)
+            self.calibration_spread = {self.imu_mapping[i]: float(d) for i, d in zip(imu_ids, spread_deg)}
+            if np.all(spread_deg <= self.calibration_max_spread_deg):
+                stable_for = times[-1] - self._calibration_started
+                self.calibration_progress = min(100, int(stable_for * 100 / self.calibration_window_s))
+                self.calibration_status_text = f"🟡 Calibration: {self.calibration_progress}% - Maintain T-pose"
+                if stable_for >= self.calibration_window_s:
+                    self.stop_tpose_calibration()
+                    return
+            else:
+                # Mouvement : la fenêtre stable repart de maintenant
+                moving = self.imu_mapping[imu_ids[int(np.argmax(spread_deg))]]
+                self._calibration_started = now
+                self.calibration_progress = 0
+                self.calibration_status_text = f"🟠 Move less - Keep T-pose stable ({moving})"
         
         # Timeout after 30 seconds
         if self.calibration_duration > 30000:
             self.calibration_status_text = "⏰ Timeout - Restart calibration"
             self.calibration_mode = False
-            self.calibration_timer.stop()
         
-        self.update()
-
-    def safely_update_display_list(self, force=False):
-        """Updates the OpenGL display list with proper error checking."""
-        # Don't update if widget is being destroyed
-        if self.is_being_destroyed:
-            return False
-        
-        if not hasattr(self, 'last_update_time'):
-            self.last_update_time = 0
-        
-        try:
-            current_time = self.fps_timer.elapsed()
-            if not force and current_time - self.last_update_time < 100:
-                return False
-            
-            self.last_update_time = current_time
-            
-            if not self.check_context():
-                print("Warning: OpenGL context check failed in safely_update_display_list")
-                return False
-            
-            try:
-                self.makeCurrent()
-                
-                # We'll just skip display lists completely for now to ensure the model is visible
-                print("Skipping display list creation - using direct rendering for stability")
-                return True
-                
-            except OpenGL.error.GLError as e:
-                print(f"[ERROR] OpenGL error in display list creation: {e}")
-                self.display_list = 0
-                return False
-            finally:
-                try:
-                    if not self.is_being_destroyed and self.isValid() and self.context() and self.context().isValid():
-                        self.doneCurrent()
-                except Exception as e:
-                    print(f"Error in doneCurrent: {e}")
-        except Exception as e:
-            print(f"General error in safely_update_display_list: {e}")
-            import traceback
-            traceback.print_exc()
-            return False
-
-    def check_context(self):
-        """Checks if the OpenGL context is valid with detailed error reporting."""
-        # Skip if widget is being destroyed
-        if self.is_being_destroyed:
-            return False
-            
-        try:
-            if not hasattr(self, 'context'):
-                print("Error: Widget has no OpenGL context attribute")
-                return False
-                
-            if not self.isValid():
-                print("Warning: OpenGL widget not valid")
-                return False
-            
-            context = self.context()
-            if not context:
-                print("Error: Unable to get OpenGL context")
-                return False
-                
-            if not context.isValid():
-                print("Warning: OpenGL context not valid")
-                reason = "Unknown reason"
-                if hasattr(context, 'errorString'):
-                    reason = context.errorString()
-                print(f"Context invalid reason: {reason}")
-                return False
-        
-            try:
-                self.makeCurrent()
-                return True
-            except Exception as e:
-                print(f"Error activating OpenGL context: {e}")
-                return False
-        except Exception as e:
-            print(f"Exception in check_context: {e}")
-            return False
+        self.frame_scheduler.request_frame()
 
     # Also need to add the missing draw_limbs_internal and draw_joints_internal methods
     def draw_limbs_internal(self):
@@ -1085,7 +775,9 @@ class Model3DViewer(QGLWidget):
 
     def draw_joints_internal(self):
         """Draws joints with rotations via quaternions."""
-        for part_name, data in self.body_parts.items():
+        for i, (part_name, data) in enumerate(self.body_parts.items()):
+            if not self._joints_in_view[i]:
+                continue
             pos = data['pos']
             quat_rotation = data['rot']
             
@@ -1095,8 +787,9 @@ class Model3DViewer(QGLWidget):
             
             # Apply quaternion rotation via a matrix
             try:
-                rotation_matrix = quaternion_to_matrix(quat_rotation)
-                glMultMatrixf(rotation_matrix)
+                gl_matrix = np.identity(4, dtype=np.float32)
+                gl_matrix[:3, :3] = qmath.to_matrix(quat_rotation)
+                glMultMatrixf(gl_matrix.flatten(order='F'))  # OpenGL : ordre colonne
             except Exception as e:
                 print(f"Error applying rotation for {part_name}: {e}")
                 # In case of error, do not apply rotation
@@ -1113,35 +806,90 @@ class Model3DViewer(QGLWidget):
             else:
                 glColor3f(0.9, 0.9, 0.9)  # Gray
 
-            # Draw the joint sphere
+            # Draw the joint sphere, tessellated according to its size on screen
             if self.quadric:
-                if part_name == 'head':
-                    gluSphere(self.quadric, 0.15, 12, 12)  # Larger head
-                else:
-                    gluSphere(self.quadric, 0.05, 6, 6)  # Other joints
-            
-            # Try to add a label if it's a sensor - with error handling for projection failures
-            if sensor_type:
-                try:
-                    model = glGetDoublev(GL_MODELVIEW_MATRIX)
-                    proj = glGetDoublev(GL_PROJECTION_MATRIX)
-                    view = glGetIntegerv(GL_VIEWPORT)
-                    
-                    # Catch projection failures and handle them gracefully
-                    try:
-                        win_x, win_y, win_z = gluProject(0, 0, 0, model, proj, view)
-                        if not hasattr(self, 'labels'):
-                            self.labels = []
-                        self.labels.append((win_x, self.height() - win_y, f"{sensor_type}", sensor_type))
-                    except ValueError:
-                        # Skip label creation if projection fails
-                        pass
-                except Exception as e:
-                    # Ignore label errors
-                    pass
+                _, slices, stacks = JOINT_LODS[self._joint_lods[i]]
+                gluSphere(self.quadric, self.renderer.radii[i], slices, stacks)
             
             glPopMatrix()
 
+    def _gather_pose(self):
+        """Return (N, 3) positions, (N, 4) rotations and the sensor type of every body part."""
+        if self.use_forward_kinematics:
+            # Positions des segments recalculées depuis la racine et les orientations
+            self.kinematics.solve(self.body_parts.positions, self.body_parts.rotations,
+                                  out=self.body_parts.positions)
+        positions = self.body_parts.positions
+        rotations = self.body_parts.rotations
+        sensor_types = [self._get_mapped_sensor_type(name) for name in self.body_parts]
+        return positions, rotations, sensor_types
+
+    def _view_projection_matrix(self):
+        """CPU copy of the projection x modelview matrix set up in paintGL."""
+        view = look_at_matrix((0, 1.0, self.camera_distance), (0, 1.0, 0.0), (0, 1.0, 0.0))
+        view = view @ rotation_matrix(self.rotation_x, (1, 0, 0))
+        view = view @ rotation_matrix(self.rotation_y, (0, 1, 0))
+        view = view @ rotation_matrix(self.rotation_z, (0, 0, 1))
+        return self._projection @ view
+
+    def _update_joint_visibility(self, mvp, positions):
+        """Frustum test and LOD selection of the joints; returns pixels per world unit at each joint."""
+        width, height = self._viewport_size
+        depth = positions @ mvp[3, :3] + mvp[3, 3]
+        pixels_per_unit = self._projection[1, 1] * 0.5 * height / np.maximum(depth, 1e-6)
+        screen, visible = project_points(mvp, positions, width, height, out=self._joint_screen)
+        margin = self.renderer.radii * pixels_per_unit
+        self._joints_in_view = (visible
+                                & (screen[:, 0] > -margin) & (screen[:, 0] < width + margin)
+                                & (screen[:, 1] > -margin) & (screen[:, 1] < height + margin))
+        self._joint_lods = self.renderer.select_lods(pixels_per_unit)
+        return pixels_per_unit
+
+    def _apply_detail_settings(self):
+        """Grid density and maximum sphere LOD for the current performance mode."""
+        self.renderer.set_floor_grid(floor_grid_size(self.performance_mode))
+        self.renderer.max_lod = 1 if self.performance_mode else len(JOINT_LODS) - 1
+
+    def _apply_multisampling(self):
+        if self.format().samples() > 0:
+            if self.performance_mode:
+                glDisable(GL_MULTISAMPLE)
+            else:
+                glEnable(GL_MULTISAMPLE)
+
+    def set_performance_mode(self, enabled):
+        """Drop antialiasing, grid density and sphere detail for low-end machines (saved)."""
+        self.performance_mode = bool(enabled)
+        self.render_settings["performance_mode"] = self.performance_mode
+        save_render_settings(self.render_settings)
+        if self.isValid():
+            self.makeCurrent()
+            try:
+                self._apply_detail_settings()
+                self._apply_multisampling()
+            finally:
+                self.doneCurrent()
+        else:
+            self._apply_detail_settings()
+        print(f"[INFO] 3D performance mode {'enabled' if self.performance_mode else 'disabled'}")
+        self.frame_scheduler.request_frame()
+        return self.performance_mode
+
+    def _update_joint_labels(self, positions, sensor_types, mvp=None):
+        """Refill self.labels with (x, y, text, sensor_type) for sensor-mapped joints."""
+        self.labels.clear()
+        idx = [i for i, sensor_type in enumerate(sensor_types) if sensor_type]
+        if not idx:
+            return
+        width, height = self._viewport_size
+        if mvp is None:
+            mvp = self._view_projection_matrix()
+        screen, visible = project_points(mvp, positions[idx], width, height,
+                                         out=self._label_screen[:len(idx)])
+        for k, i in enumerate(idx):
+            if visible[k]:
+                self.labels.append((screen[k, 0], screen[k, 1], sensor_types[i], sensor_types[i]))
+
     def _get_mapped_sensor_type(self, part_name):
         for imu_id, mapped_part in self.imu_mapping.items():
             if mapped_part == part_name:
@@ -1181,7 +929,7 @@ class Model3DViewer(QGLWidget):
             self.rotation_x = max(-90, min(90, self.rotation_x))
             
             self.last_pos = event.pos()
-            self.update()  # Trigger a redraw
+            self.frame_scheduler.request_frame()
 
     def wheelEvent(self, event):
         # Implement zoom with mouse wheel
@@ -1189,7 +937,7 @@ class Model3DViewer(QGLWidget):
         # Zoom by changing the camera position in gluLookAt
         # We'll adjust this in paintGL by modifying the camera distance
         self.camera_distance = max(2.0, min(10.0, self.camera_distance - zoom_factor * 0.5))
-        self.update()
+        self.frame_scheduler.request_frame()
 
     def map_imu_to_body_part(self, imu_id, body_part):
         """Maps an IMU sensor to a body part."""
@@ -1208,9 +956,7 @@ class Model3DViewer(QGLWidget):
         # Update the mapping
         self.imu_mapping[imu_id] = body_part
         
-        # Force update of the display list to show the new mapping
-        self.safely_update_display_list(force=True)
-        self.update()
+        self.frame_scheduler.request_frame()
         return True
     
     def apply_imu_data(self, imu_id, quaternion_data):
@@ -1223,46 +969,17 @@ class Model3DViewer(QGLWidget):
             return False
             
         # Normalize the quaternion to ensure valid rotation
-        normalized_quat = normalize_quaternion(quaternion_data)
+        normalized_quat = qmath.normalize(quaternion_data)
         
         # Apply calibration if available
         if self.calibration_complete and body_part in self.calibration_offsets:
-            offset_quat = self.calibration_offsets[body_part]
-            corrected_quat = quaternion_multiply(normalized_quat, offset_quat)
-            self.body_parts[body_part]['rot'] = corrected_quat
-        else:
-            self.body_parts[body_part]['rot'] = normalized_quat
-        
-        # Système de mise à jour beaucoup plus agressif pour éviter le lag
-        if not hasattr(self, '_last_imu_update_time'):
-            self._last_imu_update_time = 0
-            
-        current_time = time.time()
-        if current_time - self._last_imu_update_time >= 0.033:  # Max 30 FPS
-            self._last_imu_update_time = current_time
-            if not self.is_being_destroyed and self.isValid():
-                try:
-                    self.update()
-                except:
-                    pass  # Ignorer les erreurs de mise à jour temporaires
-            
-        return True
+            normalized_quat = qmath.multiply(normalized_quat, self.calibration_offsets[body_part])
+        self.body_parts.rotations[self.body_parts.index[body_part]] = normalized_quat
 
-    def _batch_update_display(self):
-        """Mise à jour groupée optimisée."""
-        if hasattr(self, '_imu_data_updated') and self._imu_data_updated:
-            self._imu_data_updated = False
-            if not hasattr(self, '_last_batch_update_time'):
-                self._last_batch_update_time = 0
-                
-            current_time = time.time()
-            if current_time - self._last_batch_update_time >= 0.033:  # Max 30 FPS
-                self._last_batch_update_time = current_time
-                try:
-                    if not self.is_being_destroyed and self.isValid():
-                        self.update()
-                except Exception as e:
-                    pass  # Ignorer les erreurs temporaires
+        # Les échantillons IMU reçus entre deux frames sont regroupés en un seul repaint
+        if not self.is_being_destroyed:
+            self.frame_scheduler.request_frame()
+        return True
 
     def start_tpose_calibration(self):
         """Start T-pose calibration."""
@@ -1276,67 +993,59 @@ class Model3DViewer(QGLWidget):
         
         self.calibration_mode = True
         self.calibration_complete = False
-        self.calibration_samples = []
+        self.calibration_progress = 0
+        self.calibration_spread = {}
+        self._calibration_started = time.time()
         self.calibration_duration = 0
         self.calibration_status_text = "Starting calibration - Assume T-pose and hold still"
         
-        # Start the timer for regular status updates
-        self.calibration_timer.start(100)  # 100ms interval
+        # Status updates every 100 ms, driven by the frame scheduler
+        self._calibration_elapsed = 0.0
+        self.frame_scheduler.add_animator('calibration', self._calibration_animator)
         return True
+
+    def _calibration_animator(self, dt):
+        """Frame scheduler callback: sample the calibration status every 100 ms."""
+        self._calibration_elapsed += dt
+        if self._calibration_elapsed >= 0.1:
+            self._calibration_elapsed -= 0.1
+            self.update_calibration_status()
+        return self.calibration_mode
         
     def stop_tpose_calibration(self):
         """Stop T-pose calibration and calculate offsets."""
         print("[3D_DEBUG] stop_tpose_calibration called")
-        self.calibration_timer.stop()
+        self.frame_scheduler.remove_animator('calibration')
         self.calibration_mode = False
         
-        # Check if we have enough data
-        if len(self.calibration_samples) < 10:
+        # Fenêtre de T-pose de tous les IMUs en un seul tableau (imus, échantillons, 4)
+        imu_ids, _, window = self._calibration_window()
+        if not imu_ids or window.shape[1] < 3:
             print("Insufficient calibration data collected")
             self.calibration_status_text = "Calibration failed - insufficient data"
             return False
-            
-        # Calculate the average quaternion for each body part
-        average_quats = {}
-        for body_part in self.imu_mapping.values():
-            samples = []
-            for sample in self.calibration_samples:
-                if body_part in sample:
-                    samples.append(sample[body_part])
-            
-            if samples:
-                # Simple averaging for quaternions (not ideal but works for small variations)
-                avg_quat = np.mean(samples, axis=0)
-                avg_quat = normalize_quaternion(avg_quat)
-                average_quats[body_part] = avg_quat
-        
-        # Now calculate the offset quaternions 
-        # The offset is what needs to be applied to go from the calibrated T-pose to the ideal T-pose
-        self.calibration_offsets = {}
-        for body_part, avg_quat in average_quats.items():
-            # For a T-pose, we'd expect identity quaternion in the ideal case
-            # So the offset is the inverse of the average quaternion
-            # For quaternions, the inverse is the conjugate when normalized
-            w, x, y, z = avg_quat
-            # Conjugate: w, -x, -y, -z
-            offset_quat = normalize_quaternion(np.array([w, -x, -y, -z]))
-            self.calibration_offsets[body_part] = offset_quat
+
+        # Moyenne par vecteur propre (insensible au signe), puis offset = inverse de la moyenne :
+        # en T-pose idéale chaque IMU devrait donner l'identité
+        offsets, spread = tpose_offsets(window)
+        self.calibration_offsets = {self.imu_mapping[i]: offset for i, offset in zip(imu_ids, offsets)}
+        self.calibration_spread = {self.imu_mapping[i]: float(d) for i, d in zip(imu_ids, np.degrees(spread))}
         
         self.calibration_complete = True
         self.calibration_status_text = "✅ Calibration complete - T-pose correction active"
-        print(f"Calibration complete for {len(self.calibration_offsets)} body parts")
+        print(f"Calibration complete for {len(self.calibration_offsets)} body parts "
+              f"({window.shape[1]} samples, max spread {max(self.calibration_spread.values()):.2f} deg)")
+        self.calibration_completed.emit()
         
         # Apply calibration to current pose
-        for imu_id, body_part in self.imu_mapping.items():
-            if body_part in self.body_parts and body_part in self.calibration_offsets:
-                current_quat = self.body_parts[body_part]['rot']
-                offset_quat = self.calibration_offsets[body_part]
-                corrected_quat = quaternion_multiply(current_quat, offset_quat)
-                self.body_parts[body_part]['rot'] = corrected_quat
+        calibrated_parts = [p for p in dict.fromkeys(self.imu_mapping.values())
+                            if p in self.body_parts and p in self.calibration_offsets]
+        if calibrated_parts:
+            offsets = np.array([self.calibration_offsets[p] for p in calibrated_parts])
+            self.body_parts.apply_rotation_offsets(self.body_parts.indices(calibrated_parts), offsets)
         
         # Update the display
-        self.safely_update_display_list(force=True)
-        self.update()
+        self.frame_scheduler.request_frame()
         return True
     
     def reset_calibration(self):
@@ -1344,16 +1053,54 @@ class Model3DViewer(QGLWidget):
         """Reset calibration data."""
         self.calibration_mode = False
         self.calibration_complete = False
-        self.calibration_timer.stop()
-        self.calibration_samples = []
+        self.frame_scheduler.remove_animator('calibration')
+        self.calibration_progress = 0
+        self.calibration_spread = {}
         self.calibration_offsets = {}
         self.calibration_status_text = "🔄 Calibration reset - No correction active"
         
         # Update the display
-        self.safely_update_display_list(force=True)
-        self.update()
+        self.frame_scheduler.request_frame()
         return True
 
+    def get_calibration(self):
+        """Current offsets ({body part: quaternion}) and T-pose spreads ({body part: deg})."""
+        return dict(self.calibration_offsets), dict(self.calibration_spread)
+
+    def load_calibration(self, offsets, spread_deg=None):
+        """Restore offsets saved by a previous session ({body part: quaternion})."""
+        self.frame_scheduler.remove_animator('calibration')
+        self.calibration_mode = False
+        self.calibration_offsets = {part: qmath.normalize(np.asarray(q, dtype=np.float64))
+                                    for part, q in offsets.items()}
+        self.calibration_spread = dict(spread_deg or {})
+        self.calibration_complete = bool(self.calibration_offsets)
+        if self.calibration_complete:
+            self.calibration_status_text = "✅ Calibration profile loaded"
+        self.frame_scheduler.request_frame()
+        return self.calibration_complete
+
+    def check_calibration_drift(self, since=None):
+        """
+        Angle (deg) per body part between the last buffered T-pose window and the T-pose the
+        current offsets come from. None until the buffer holds a recent, stable window of
+        calibration_window_s made of samples not older than since (when the user confirmed
+        the T-pose: a still window alone is not necessarily a T-pose).
+        """
+        if not self.calibration_complete:
+            return None
+        mapped = [imu_id for imu_id, part in self.imu_mapping.items() if part in self.calibration_offsets]
+        imu_ids, times, window = self.imu_buffer.window(self.calibration_window_s, mapped, since=since)
+        if not mapped or len(imu_ids) < len(mapped) or len(times) < 3 or time.time() - times[-1] > 0.5:
+            return None
+        if times[-1] - times[0] < 0.9 * self.calibration_window_s:
+            return None  # Fenêtre pas encore pleine
+        offsets = np.array([self.calibration_offsets[self.imu_mapping[imu_id]] for imu_id in imu_ids])
+        drift, spread = calibration_drift(window, offsets)
+        if np.any(np.degrees(spread) > self.calibration_max_spread_deg):
+            return None  # Le sujet bouge : pas une T-pose
+        return {self.imu_mapping[imu_id]: float(d) for imu_id, d in zip(imu_ids, np.degrees(drift))}
+
     def draw_direction_marker(self, x, y, z, size=1.0):
         """Draws a direction marker at the specified position."""
         glPushMatrix()
@@ -1385,10 +1132,19 @@ class Model3DViewer(QGLWidget):
     def force_tpose(self):
         """Force tous les IMUs mappés à la T-pose (quaternion identité)."""
         print("[3D_DEBUG] Forcing T-pose for all mapped IMUs")
-        for imu_id, body_part in self.imu_mapping.items():
-            if body_part in self.body_parts:
-                self.body_parts[body_part]['rot'] = np.array([1.0, 0.0, 0.0, 0.0])
-        self.update()
+        idx = self.body_parts.indices(self.imu_mapping.values())
+        self.body_parts.rotations[idx] = (1.0, 0.0, 0.0, 0.0)
+        self.frame_scheduler.request_frame()
+
+    def set_anthropometrics(self, metadata):
+        """Scale the skeleton segments from participant_*_cm metadata (height, thigh, shank, arms)."""
+        used = self.kinematics.set_anthropometrics(metadata)
+        rest = self.kinematics.rest_pose(floor_height=0.0)
+        self.initial_body_parts_state.positions[:] = rest
+        self.body_parts.positions[:] = rest
+        print(f"[INFO] Skeleton scaled from {used} anthropometric measurement(s)")
+        self.frame_scheduler.request_frame()
+        return used
 
     def get_current_mappings(self):
         """Return the current IMU to body part mapping."""
@@ -0,0 +1,105 @@
+'''
+Headless rendering of the 3D viewer into an OpenGL framebuffer object.
+
+No window is shown, so frames can be rendered and timed on a CI machine, e.g.:
+    QT_QPA_PLATFORM=offscreen python plots/offscreen.py --frames 600 --size 800x600
+(or under Xvfb; with Mesa, LIBGL_ALWAYS_SOFTWARE=1 selects the OSMesa/llvmpipe path).
+'''
+import os
+import sys
+import time
+
+from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import (QOffscreenSurface, QOpenGLContext, QOpenGLFramebufferObject,
+                         QOpenGLFramebufferObjectFormat)
+from OpenGL.GL import glFinish
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from plots.model_3d_viewer import Model3DViewer
+
+
+class OffscreenViewer:
+    """
+    Render Model3DViewer frames into an FBO with its own context and offscreen surface.
+
+    The viewer is never shown; its state (pose, mappings, camera) is used as is and
+    render() returns the frame as a QImage.
+    """
+
+    def __init__(self, width=800, height=600, viewer=None, samples=0):
+        self.width = width
+        self.height = height
+        self.viewer = viewer if viewer is not None else Model3DViewer()
+
+        fmt = self.viewer.format()
+        self.surface = QOffscreenSurface()
+        self.surface.setFormat(fmt)
+        self.surface.create()
+
+        self.context = QOpenGLContext()
+        self.context.setFormat(fmt)
+        if not self.context.create():
+            raise RuntimeError("Unable to create an offscreen OpenGL context")
+        if not self.context.makeCurrent(self.surface):
+            raise RuntimeError("Unable to make the offscreen OpenGL context current")
+
+        fbo_format = QOpenGLFramebufferObjectFormat()
+        fbo_format.setAttachment(QOpenGLFramebufferObject.CombinedDepthStencil)
+        fbo_format.setSamples(samples)
+        self.fbo = QOpenGLFramebufferObject(width, height, fbo_format)
+        self.fbo.bind()
+        self.viewer.initialize_scene()
+
+    def render(self, read_back=True):
+        """Render one frame; returns it as a QImage (None if read_back is False)."""
+        self.context.makeCurrent(self.surface)
+        self.fbo.bind()
+        self.viewer.render_scene(self.width, self.height, offscreen=True)
+        if not read_back:
+            glFinish()
+            return None
+        return self.fbo.toImage()
+
+    def release(self):
+        self.context.makeCurrent(self.surface)
+        self.viewer.renderer.release()
+        self.viewer.overlay.release()
+        self.fbo.release()
+        self.fbo = None
+        self.context.doneCurrent()
+        self.surface.destroy()
+
+
+def benchmark(frames=300, width=800, height=600, walking=True, read_back=False):
+    """Render frames offscreen (walking animation by default) and return the measured FPS."""
+    # Référence gardée volontairement : sans elle PyQt détruit l'application aussitôt
+    app = QApplication.instance() or QApplication(sys.argv)  # noqa: F841
+    offscreen = OffscreenViewer(width, height)
+    viewer = offscreen.viewer
+    viewer.walking = walking
+    try:
+        offscreen.render(read_back)  # Première frame : allocation des buffers
+        start = time.perf_counter()
+        for _ in range(frames):
+            if walking:
+                viewer.update_animation_frame()
+            offscreen.render(read_back)
+        elapsed = time.perf_counter() - start
+    finally:
+        offscreen.release()
+    fps = frames / elapsed if elapsed > 0 else float('inf')
+    print(f"[INFO] {frames} frames {width}x{height} rendered offscreen in {elapsed:.3f} s ({fps:.1f} FPS)")
+    return fps
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Headless 3D viewer rendering benchmark")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", default="800x600", help="WIDTHxHEIGHT")
+    parser.add_argument("--static", action="store_true", help="do not animate the skeleton")
+    parser.add_argument("--read-back", action="store_true", help="read each frame back to a QImage")
+    args = parser.parse_args()
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    benchmark(args.frames, w, h, walking=not args.static, read_back=args.read_back)
@@ -0,0 +1,105 @@
+import numpy as np
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImage, QPainter
+from OpenGL.GL import *
+
+# Coordonnées de texture du quad plein écran (ligne 0 de l'image = haut de l'écran)
+_QUAD_TEXCOORDS = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype=np.float32)
+
+
+class OverlayTexture:
+    """
+    Screen-space overlay (legend, FPS) painted with QPainter into a QImage and kept in a
+    GL texture. The image is repainted and uploaded again only when its key changes;
+    other frames just draw one textured quad, without mixing QPainter into the GL frame.
+    """
+
+    def __init__(self):
+        self.texture = 0
+        self._key = None
+
+    def draw(self, key, width, height, paint, pixel_ratio=1.0):
+        """Draw the overlay; paint(painter, width, height) is called only when key changed."""
+        if width <= 0 or height <= 0:
+            return
+        if not self.texture:
+            self.texture = glGenTextures(1)
+        key = (key, width, height, pixel_ratio)
+        if key != self._key:
+            self._upload(self._render(width, height, paint, pixel_ratio))
+            self._key = key
+        self._draw_quad(width, height)
+
+    def invalidate(self):
+        self._key = None
+
+    def release(self):
+        if self.texture:
+            try:
+                glDeleteTextures([self.texture])
+            except Exception:
+                pass
+        self.texture = 0
+        self._key = None
+
+    @staticmethod
+    def _render(width, height, paint, pixel_ratio):
+        image = QImage(max(1, round(width * pixel_ratio)), max(1, round(height * pixel_ratio)),
+                       QImage.Format_RGBA8888_Premultiplied)
+        image.setDevicePixelRatio(pixel_ratio)
+        image.fill(Qt.transparent)
+        painter = QPainter(image)
+        try:
+            paint(painter, width, height)
+        finally:
+            painter.end()
+        return image
+
+    def _upload(self, image):
+        ptr = image.constBits()
+        ptr.setsize(image.byteCount())
+        glBindTexture(GL_TEXTURE_2D, self.texture)
+        glPixelStorei(GL_UNPACK_ALIGNMENT, 4)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MIN_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_MAG_FILTER, GL_LINEAR)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_S, GL_CLAMP_TO_EDGE)
+        glTexParameteri(GL_TEXTURE_2D, GL_TEXTURE_WRAP_T, GL_CLAMP_TO_EDGE)
+        glTexImage2D(GL_TEXTURE_2D, 0, GL_RGBA, image.width(), image.height(), 0,
+                     GL_RGBA, GL_UNSIGNED_BYTE, bytes(ptr))
+        glBindTexture(GL_TEXTURE_2D, 0)
+
+    def _draw_quad(self, width, height):
+        vertices = np.array([[0, 0], [width, 0], [width, height], [0, height]], dtype=np.float32)
+
+        glMatrixMode(GL_PROJECTION)
+        glPushMatrix()
+        glLoadIdentity()
+        glOrtho(0, width, height, 0, -1, 1)
+        glMatrixMode(GL_MODELVIEW)
+        glPushMatrix()
+        glLoadIdentity()
+        glPushAttrib(GL_ENABLE_BIT | GL_COLOR_BUFFER_BIT | GL_CURRENT_BIT)
+        try:
+            glDisable(GL_DEPTH_TEST)
+            glDisable(GL_CULL_FACE)
+            glEnable(GL_TEXTURE_2D)
+            glEnable(GL_BLEND)
+            # Image en alpha prémultiplié
+            glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+            glColor4f(1.0, 1.0, 1.0, 1.0)
+            glBindTexture(GL_TEXTURE_2D, self.texture)
+
+            glEnableClientState(GL_VERTEX_ARRAY)
+            glEnableClientState(GL_TEXTURE_COORD_ARRAY)
+            glVertexPointer(2, GL_FLOAT, 0, vertices)
+            glTexCoordPointer(2, GL_FLOAT, 0, _QUAD_TEXCOORDS)
+            glDrawArrays(GL_TRIANGLE_FAN, 0, 4)
+            glDisableClientState(GL_TEXTURE_COORD_ARRAY)
+            glDisableClientState(GL_VERTEX_ARRAY)
+            glBindTexture(GL_TEXTURE_2D, 0)
+        finally:
+            glPopAttrib()
+            glMatrixMode(GL_PROJECTION)
+            glPopMatrix()
+            glMatrixMode(GL_MODELVIEW)
+            glPopMatrix()
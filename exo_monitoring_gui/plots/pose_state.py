@@ -0,0 +1,116 @@
+import numpy as np
+
+from utils import quaternion_math as qmath
+
+
+class _PartView:
+    """Dict-like view of one body part, kept for code written against {'pos': ..., 'rot': ...}."""
+
+    __slots__ = ("_pose", "_i")
+
+    def __init__(self, pose, i):
+        self._pose = pose
+        self._i = i
+
+    def __getitem__(self, key):
+        if key == 'pos':
+            return self._pose.positions[self._i]
+        if key == 'rot':
+            return self._pose.rotations[self._i]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'pos':
+            self._pose.positions[self._i] = value
+        elif key == 'rot':
+            self._pose.rotations[self._i] = value
+        else:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+class PoseState:
+    """
+    Skeleton pose stored as contiguous arrays.
+
+    positions is (N, 3), rotations is (N, 4) quaternions (w, x, y, z), parents is (N,)
+    with -1 for the root. index maps a part name to its row. The object also behaves
+    like the former dict of {'pos', 'rot'} dicts (pose['head']['rot'] = q still works).
+    """
+
+    def __init__(self, names, positions, rotations=None, relations=None, parents=None):
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.positions = np.array(positions, dtype=np.float64).reshape(len(self.names), 3)
+        if rotations is None:
+            rotations = np.tile([1.0, 0.0, 0.0, 0.0], (len(self.names), 1))
+        self.rotations = np.array(rotations, dtype=np.float64).reshape(len(self.names), 4)
+
+        if parents is not None:
+            self.parents = np.array(parents, dtype=np.intp)
+        else:
+            # Premier parent listé dans les relations (ex. body_relations du prédicteur)
+            relations = relations or {}
+            self.parents = np.array([
+                self.index.get((relations.get(name) or [None])[0], -1) for name in self.names
+            ], dtype=np.intp)
+
+    # --- Interface dict (compatibilité) ---
+
+    def __getitem__(self, name):
+        return _PartView(self, self.index[name])
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def keys(self):
+        return list(self.names)
+
+    def values(self):
+        return [_PartView(self, i) for i in range(len(self.names))]
+
+    def items(self):
+        return [(name, _PartView(self, i)) for i, name in enumerate(self.names)]
+
+    # --- Opérations vectorisées ---
+
+    def copy(self):
+        return PoseState(self.names, self.positions.copy(), self.rotations.copy(), parents=self.parents.copy())
+
+    def copy_from(self, other, mask=None):
+        """Copy positions and rotations from another pose, optionally only where mask is True."""
+        if mask is None:
+            self.positions[:] = other.positions
+            self.rotations[:] = other.rotations
+        else:
+            self.positions[mask] = other.positions[mask]
+            self.rotations[mask] = other.rotations[mask]
+
+    def indices(self, names):
+        """Row indices of the given part names (unknown names are ignored)."""
+        return np.array([self.index[n] for n in names if n in self.index], dtype=np.intp)
+
+    def mask(self, names):
+        m = np.zeros(len(self.names), dtype=bool)
+        m[self.indices(names)] = True
+        return m
+
+    def normalize(self):
+        self.rotations[:] = qmath.normalize(self.rotations)
+
+    def apply_rotation_offsets(self, idx, offsets):
+        """rotations[idx] = rotations[idx] * offsets, for (len(idx), 4) offsets."""
+        if len(idx):
+            self.rotations[idx] = qmath.multiply(self.rotations[idx], offsets)
+
@@ -0,0 +1,42 @@
+import json
+import os
+
+# Réglages d'affichage 3D conservés entre deux lancements (à côté de sensor_mappings.json)
+SETTINGS_PATH = os.path.join(os.path.dirname(__file__), 'render_settings.json')
+
+DEFAULT_RENDER_SETTINGS = {
+    # Mode performance : pas d'antialiasing, grille du sol moins dense, sphères moins fines
+    "performance_mode": False,
+}
+
+NORMAL_GRID_SIZE = 0.5
+PERFORMANCE_GRID_SIZE = 1.0
+NORMAL_SAMPLES = 4
+
+
+def load_render_settings(path=SETTINGS_PATH):
+    settings = dict(DEFAULT_RENDER_SETTINGS)
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                settings.update(json.load(f))
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read render settings {path}: {e}")
+    return settings
+
+
+def save_render_settings(settings, path=SETTINGS_PATH):
+    try:
+        with open(path, 'w') as f:
+            json.dump(settings, f, indent=4)
+    except OSError as e:
+        print(f"[ERROR] Could not save render settings {path}: {e}")
+
+
+def antialiasing_samples(performance_mode):
+    """Multisample count of the GL surface (read at start-up, see main.py)."""
+    return 0 if performance_mode else NORMAL_SAMPLES
+
+
+def floor_grid_size(performance_mode):
+    return PERFORMANCE_GRID_SIZE if performance_mode else NORMAL_GRID_SIZE
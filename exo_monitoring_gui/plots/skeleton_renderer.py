@@ -0,0 +1,320 @@
+import ctypes
+import numpy as np
+from OpenGL.GL import *
+
+from utils import quaternion_math as qmath
+
+# Layout des sommets dans tous les buffers : x, y, z, r, g, b, a (float32, entrelacés)
+VERTEX_FLOATS = 7
+VERTEX_STRIDE = VERTEX_FLOATS * 4
+
+# Segments du squelette : (partie 1, partie 2, couleur RGB)
+LIMB_SEGMENTS = [
+    ('head', 'neck', (1.0, 0.8, 0.6)),
+
+    ('neck', 'torso', (0.2, 0.4, 0.8)),
+    ('torso', 'hip', (0.2, 0.4, 0.8)),
+
+    ('neck', 'deltoid_l', (0.0, 0.5, 1.0)),
+    ('deltoid_l', 'biceps_l', (0.0, 0.5, 1.0)),
+    ('biceps_l', 'forearm_l', (0.0, 0.5, 1.0)),
+    ('forearm_l', 'left_hand', (0.0, 0.5, 1.0)),
+    ('torso', 'dorsalis_major_l', (0.0, 0.5, 1.0)),
+    ('torso', 'pectorals_l', (0.0, 0.5, 1.0)),
+    ('pectorals_l', 'deltoid_l', (0.0, 0.5, 1.0)),
+
+    ('neck', 'deltoid_r', (1.0, 0.5, 0.0)),
+    ('deltoid_r', 'biceps_r', (1.0, 0.5, 0.0)),
+    ('biceps_r', 'forearm_r', (1.0, 0.5, 0.0)),
+    ('forearm_r', 'right_hand', (1.0, 0.5, 0.0)),
+    ('torso', 'dorsalis_major_r', (1.0, 0.5, 0.0)),
+    ('torso', 'pectorals_r', (1.0, 0.5, 0.0)),
+    ('pectorals_r', 'deltoid_r', (1.0, 0.5, 0.0)),
+
+    ('hip', 'quadriceps_l', (0.0, 0.7, 0.3)),
+    ('hip', 'glutes_l', (0.0, 0.7, 0.3)),
+    ('hip', 'ishcio_hamstrings_l', (0.0, 0.7, 0.3)),
+    ('quadriceps_l', 'calves_l', (0.0, 0.7, 0.3)),
+    ('ishcio_hamstrings_l', 'calves_l', (0.0, 0.7, 0.3)),
+    ('calves_l', 'left_foot', (0.0, 0.7, 0.3)),
+
+    ('hip', 'quadriceps_r', (0.7, 0.0, 0.3)),
+    ('hip', 'glutes_r', (0.7, 0.0, 0.3)),
+    ('hip', 'ishcio_hamstrings_r', (0.7, 0.0, 0.3)),
+    ('quadriceps_r', 'calves_r', (0.7, 0.0, 0.3)),
+    ('ishcio_hamstrings_r', 'calves_r', (0.7, 0.0, 0.3)),
+    ('calves_r', 'right_foot', (0.7, 0.0, 0.3)),
+]
+
+# Niveaux de détail des sphères : (rayon projeté max en pixels, tranches, anneaux)
+JOINT_LODS = [
+    (3.0, 4, 3),
+    (8.0, 6, 6),
+    (20.0, 12, 10),
+    (float('inf'), 16, 12),
+]
+HEAD_RADIUS = 0.15
+JOINT_RADIUS = 0.05
+
+SENSOR_COLORS = {
+    "IMU": (0.0, 0.8, 0.2, 1.0),   # Green
+    "EMG": (0.8, 0.2, 0.0, 1.0),   # Red
+    "pMMG": (0.0, 0.2, 0.8, 1.0),  # Blue
+    None: (0.9, 0.9, 0.9, 1.0),    # Gray
+}
+
+
+def perspective_matrix(fovy_deg, aspect, near, far):
+    """Same matrix as gluPerspective (row-major, column vectors)."""
+    f = 1.0 / np.tan(np.radians(fovy_deg) / 2.0)
+    return np.array([
+        [f / aspect, 0, 0, 0],
+        [0, f, 0, 0],
+        [0, 0, (far + near) / (near - far), 2 * far * near / (near - far)],
+        [0, 0, -1, 0],
+    ])
+
+
+def look_at_matrix(eye, center, up):
+    """Same matrix as gluLookAt (row-major, column vectors)."""
+    eye = np.asarray(eye, dtype=np.float64)
+    f = np.asarray(center, dtype=np.float64) - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, up)
+    s /= np.linalg.norm(s)
+    u = np.cross(s, f)
+    m = np.identity(4)
+    m[0, :3], m[1, :3], m[2, :3] = s, u, -f
+    m[:3, 3] = -m[:3, :3] @ eye
+    return m
+
+
+def rotation_matrix(angle_deg, axis):
+    """Same matrix as glRotatef for a unit axis (row-major, column vectors)."""
+    x, y, z = axis
+    c, s = np.cos(np.radians(angle_deg)), np.sin(np.radians(angle_deg))
+    m = np.identity(4)
+    m[:3, :3] = [
+        [x * x * (1 - c) + c, x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+        [y * x * (1 - c) + z * s, y * y * (1 - c) + c, y * z * (1 - c) - x * s],
+        [x * z * (1 - c) - y * s, y * z * (1 - c) + x * s, z * z * (1 - c) + c],
+    ]
+    return m
+
+
+def project_points(mvp, points, width, height, out=None):
+    """Project (N, 3) world points to window coordinates (origin top-left), like gluProject.
+
+    Returns an (N, 2) array (written into out when given) and a mask of points in front of the camera.
+    """
+    points = np.asarray(points, dtype=np.float64)
+    clip = points @ mvp[:3, :3].T + mvp[:3, 3]
+    w = points @ mvp[3, :3] + mvp[3, 3]
+    visible = w > 1e-9
+    safe_w = np.where(visible, w, 1.0)
+    if out is None:
+        out = np.empty((len(points), 2))
+    out[:, 0] = (clip[:, 0] / safe_w + 1.0) * 0.5 * width
+    out[:, 1] = height - (clip[:, 1] / safe_w + 1.0) * 0.5 * height
+    return out, visible
+
+
+def sphere_triangles(slices, stacks):
+    """Unit sphere as a (V, 3) triangle list, counter-clockwise seen from outside (like gluSphere)."""
+    theta = np.linspace(0.0, np.pi, stacks + 1)
+    phi = np.linspace(0.0, 2.0 * np.pi, slices + 1)
+    t, p = np.meshgrid(theta, phi, indexing='ij')
+    verts = np.stack([np.sin(t) * np.cos(p), np.cos(t), np.sin(t) * np.sin(p)], axis=-1)
+    a, b = verts[:-1, :-1], verts[1:, :-1]
+    c, d = verts[1:, 1:], verts[:-1, 1:]
+    return np.stack([a, c, b, a, d, c], axis=2).reshape(-1, 3).astype(np.float32)
+
+
+def _interleave(xyz, rgba):
+    out = np.empty((len(xyz), VERTEX_FLOATS), dtype=np.float32)
+    out[:, :3] = xyz
+    out[:, 3:] = rgba
+    return out
+
+
+def _floor_vertices(floor_size=10.0, grid_size=0.5):
+    """Static floor geometry: surface quad, grid lines and direction markers."""
+    quad = np.array([
+        [-floor_size, 0, -floor_size],
+        [-floor_size, 0, floor_size],
+        [floor_size, 0, floor_size],
+        [floor_size, 0, -floor_size],
+    ], dtype=np.float32)
+    quad = _interleave(quad, (0.3, 0.3, 0.1, 0.8))
+
+    ticks = np.arange(-floor_size, floor_size + grid_size, grid_size)
+    n = len(ticks)
+    grid = np.empty((4 * n, 3), dtype=np.float32)
+    grid[0:2 * n:2] = np.column_stack([ticks, np.full(n, 0.01), np.full(n, -floor_size)])
+    grid[1:2 * n:2] = np.column_stack([ticks, np.full(n, 0.01), np.full(n, floor_size)])
+    grid[2 * n::2] = np.column_stack([np.full(n, -floor_size), np.full(n, 0.01), ticks])
+    grid[2 * n + 1::2] = np.column_stack([np.full(n, floor_size), np.full(n, 0.01), ticks])
+    grid = _interleave(grid, (0.5, 0.5, 0.5, 1.0))
+
+    markers = []
+    for x, z, size in [(0, 0, 1.5),
+                       (-floor_size + 0.5, -floor_size + 0.5, 0.5),
+                       (floor_size - 0.5, -floor_size + 0.5, 0.5),
+                       (-floor_size + 0.5, floor_size - 0.5, 0.5),
+                       (floor_size - 0.5, floor_size - 0.5, 0.5)]:
+        origin = np.array([x, 0.02, z], dtype=np.float32)
+        for axis, color in enumerate([(1, 0, 0, 1), (0, 1, 0, 1), (0, 0, 1, 1)]):
+            tip = origin.copy()
+            tip[axis] += size
+            markers.append(_interleave(np.stack([origin, tip]), color))
+    markers = np.concatenate(markers)
+
+    return quad, grid, markers
+
+
+class SkeletonRenderer:
+    """
+    Retained-mode renderer for Model3DViewer.
+
+    The floor is uploaded once to a static VBO. Limb segments and joint spheres are
+    transformed on the CPU with NumPy and streamed to two small dynamic VBOs, so a
+    frame costs a few draw calls instead of one GL call per vertex.
+    Must be initialized and used with the viewer's GL context current.
+    """
+
+    def __init__(self, part_names):
+        self.part_names = list(part_names)
+        self.part_index = {name: i for i, name in enumerate(self.part_names)}
+        self.available = False
+
+        self._floor_vbo = None
+        self._limb_vbo = None
+        self._joint_vbo = None
+        self._floor_ranges = []
+        self._limb_count = 0
+        self._joint_count = 0
+
+        # Indices des segments dans l'ordre des positions (les segments inconnus sont ignorés)
+        segments = [(self.part_index[a], self.part_index[b], color)
+                    for a, b, color in LIMB_SEGMENTS
+                    if a in self.part_index and b in self.part_index]
+        self._segment_index = np.array([[a, b] for a, b, _ in segments], dtype=np.intp).reshape(-1)
+        limb_colors = np.array([color + (1.0,) for _, _, color in segments], dtype=np.float32)
+        self._limb_rgba = np.repeat(limb_colors, 2, axis=0)
+
+        # Sphères unitaires par niveau de détail ; grosse sphère pour la tête, petite pour le reste
+        self._lod_meshes = [sphere_triangles(slices, stacks) for _, slices, stacks in JOINT_LODS]
+        self._lod_limits = np.array([limit for limit, _, _ in JOINT_LODS])
+        is_head = np.array([n == 'head' for n in self.part_names], dtype=bool)
+        self.radii = np.where(is_head, HEAD_RADIUS, JOINT_RADIUS)
+        # Sans information de caméra : niveaux proches de l'ancien rendu (tête 12x12, articulations 6x6)
+        self._default_lods = np.where(is_head, 2, 1)
+        self.max_lod = len(JOINT_LODS) - 1
+        self.grid_size = 0.5
+
+    def initialize(self):
+        """Create the VBOs. Returns False when buffer objects are not supported."""
+        try:
+            self._floor_vbo, self._limb_vbo, self._joint_vbo = glGenBuffers(3)
+
+            self.available = True
+            self._upload_floor()
+        except Exception as e:
+            print(f"[WARNING] VBO renderer unavailable, falling back to immediate mode: {e}")
+            self.available = False
+        return self.available
+
+    def _upload_floor(self):
+        quad, grid, markers = _floor_vertices(grid_size=self.grid_size)
+        floor = np.concatenate([quad, grid, markers])
+        self._floor_ranges = [
+            (GL_QUADS, 0, len(quad)),
+            (GL_LINES, len(quad), len(grid) + len(markers)),
+        ]
+        glBindBuffer(GL_ARRAY_BUFFER, self._floor_vbo)
+        glBufferData(GL_ARRAY_BUFFER, floor.nbytes, floor, GL_STATIC_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def set_floor_grid(self, grid_size):
+        """Change the grid spacing; the static floor VBO is rebuilt once (context must be current)."""
+        if grid_size == self.grid_size:
+            return
+        self.grid_size = grid_size
+        if self.available:
+            self._upload_floor()
+
+    def select_lods(self, pixels_per_unit=None):
+        """LOD index of every joint from its projected size (pixels per world unit at the joint)."""
+        if pixels_per_unit is None:
+            lods = self._default_lods
+        else:
+            lods = np.searchsorted(self._lod_limits, self.radii * pixels_per_unit)
+        return np.minimum(lods, self.max_lod)
+
+    def release(self):
+        if self.available:
+            try:
+                glDeleteBuffers(3, [self._floor_vbo, self._limb_vbo, self._joint_vbo])
+            except Exception:
+                pass
+        self.available = False
+
+    def _draw_buffer(self, vbo, ranges):
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        glEnableClientState(GL_VERTEX_ARRAY)
+        glEnableClientState(GL_COLOR_ARRAY)
+        glVertexPointer(3, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(0))
+        glColorPointer(4, GL_FLOAT, VERTEX_STRIDE, ctypes.c_void_p(12))
+        for mode, first, count in ranges:
+            glDrawArrays(mode, first, count)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    @staticmethod
+    def _stream(vbo, vertices):
+        glBindBuffer(GL_ARRAY_BUFFER, vbo)
+        # Réallocation à chaque frame (orphaning) : le driver n'attend pas la frame précédente
+        glBufferData(GL_ARRAY_BUFFER, vertices.nbytes, vertices, GL_STREAM_DRAW)
+        glBindBuffer(GL_ARRAY_BUFFER, 0)
+
+    def update_pose(self, positions, rotations, joint_rgba, pixels_per_unit=None, in_view=None):
+        """Stream the current pose: (N, 3) positions, (N, 4) quaternions, (N, 4) joint colors.
+
+        pixels_per_unit selects the sphere LOD of each joint; joints outside in_view are skipped.
+        """
+        positions = np.asarray(positions, dtype=np.float32)
+
+        limbs = _interleave(positions[self._segment_index], self._limb_rgba)
+        self._stream(self._limb_vbo, limbs)
+        self._limb_count = len(limbs)
+
+        matrices = qmath.to_matrix(rotations).astype(np.float32)
+        joint_rgba = np.asarray(joint_rgba, dtype=np.float32)
+        lods = self.select_lods(pixels_per_unit)
+        drawn = np.arange(len(positions)) if in_view is None else np.flatnonzero(in_view)
+        radii = self.radii.astype(np.float32)
+        chunks = []
+        for level in np.unique(lods[drawn]):
+            idx = drawn[lods[drawn] == level]
+            mesh = self._lod_meshes[level]
+            world = (np.einsum('nij,vj->nvi', matrices[idx], mesh) * radii[idx, None, None]
+                     + positions[idx, None, :])
+            rgba = np.repeat(joint_rgba[idx], len(mesh), axis=0)
+            chunks.append(_interleave(world.reshape(-1, 3), rgba))
+        joints = np.concatenate(chunks) if chunks else np.empty((0, VERTEX_FLOATS), dtype=np.float32)
+        self._stream(self._joint_vbo, joints)
+        self._joint_count = len(joints)
+
+    def draw_floor(self):
+        glEnable(GL_BLEND)
+        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        glLineWidth(1.0)
+        self._draw_buffer(self._floor_vbo, self._floor_ranges)
+
+    def draw_skeleton(self):
+        if self._limb_count:
+            glLineWidth(3.0)
+            self._draw_buffer(self._limb_vbo, [(GL_LINES, 0, self._limb_count)])
+        if self._joint_count:
+            self._draw_buffer(self._joint_vbo, [(GL_TRIANGLES, 0, self._joint_count)])
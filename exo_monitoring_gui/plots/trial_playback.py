@@ -0,0 +1,294 @@
+import json
+import math
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import h5py
+import numpy as np
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from utils.hdf5_utils import TRIALS_GROUP, SAMPLE_PERIOD_S, open_locked
+from utils import quaternion_math as qmath
+
+BLOCK_SAMPLES = 250        # 10 s à 25 Hz par bloc lu
+READ_AHEAD_BLOCKS = 3      # Blocs préchargés après la position courante
+MAX_CACHED_BLOCKS = 24     # Blocs gardés en mémoire (LRU)
+
+
+def _imu_id(dataset_name):
+    digits = ''.join(filter(str.isdigit, dataset_name))
+    return int(digits) if digits else None
+
+
+class TrialQuaternionReader:
+    """
+    Lazy, block-wise reader of the IMU quaternions of one trial.
+
+    Blocks of BLOCK_SAMPLES rows (all IMUs at once) are kept in a small LRU cache and a
+    background thread reads the blocks ahead of the playback position, so the GUI thread
+    only touches the file when it seeks to a block that is not loaded yet.
+    """
+
+    def __init__(self, file_path, trial_id=None, block_size=BLOCK_SAMPLES,
+                 read_ahead=READ_AHEAD_BLOCKS, max_blocks=MAX_CACHED_BLOCKS):
+        self.file_path = file_path
+        self.trial_id = trial_id
+        self.block_size = block_size
+        self.read_ahead = read_ahead
+        self.max_blocks = max_blocks
+
+        self._lock = threading.Lock()
+        self._blocks = OrderedDict()
+        self._pending = set()
+        self._closed = False
+        self._dataset_paths = []
+        self.imu_ids = []
+        self.mapping = {}
+        self.num_samples = 0
+
+        # Le fichier n'est ouvert que pendant les lectures, sous file_lock : la review peut y
+        # écrire entre-temps (cache des signaux dérivés)
+        with open_locked(file_path) as f:
+            self._find_imu_datasets(f)
+            self._read_mapping(f)
+
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._read_ahead_loop, name="trial-playback-reader", daemon=True)
+        self._thread.start()
+
+    def _find_imu_datasets(self, f):
+        sensor_path = f"{TRIALS_GROUP}/{self.trial_id}/Sensor" if self.trial_id is not None else "Sensor"
+        if sensor_path not in f:
+            print(f"[WARNING] No Sensor group in {self.file_path} ({sensor_path})")
+            return
+        sensor_group = f[sensor_path]
+        imu_group = next((sensor_group[k] for k in sensor_group if k.upper() == "IMU"), None)
+        if imu_group is None:
+            return
+
+        found = []
+        for name, dset in imu_group.items():
+            imu_id = _imu_id(name)
+            if imu_id is None or not isinstance(dset, h5py.Dataset):
+                continue
+            if dset.ndim != 2 or dset.shape[1] != 4 or dset.shape[0] == 0:
+                continue
+            found.append((imu_id, dset))
+        found.sort(key=lambda item: item[0])
+
+        self.imu_ids = [imu_id for imu_id, _ in found]
+        self._dataset_paths = [dset.name for _, dset in found]
+        # Les IMUs d'un même enregistrement ont normalement la même longueur
+        self.num_samples = min((len(dset) for _, dset in found), default=0)
+
+    def _read_mapping(self, f):
+        """IMU id -> body part, from the sensor mappings injected in the file (attribute 'mapping')."""
+        value = f.attrs.get("mapping")
+        if value is None:
+            return
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        try:
+            imu_mappings = json.loads(value).get("IMU", {})
+        except (ValueError, AttributeError) as e:
+            print(f"[WARNING] Invalid sensor mapping in {self.file_path}: {e}")
+            return
+        self.mapping = {int(k): v for k, v in imu_mappings.items() if v and str(k).isdigit()}
+
+    @property
+    def duration(self):
+        return max(0, self.num_samples - 1) * SAMPLE_PERIOD_S
+
+    def _load_block(self, block_index):
+        """Return block block_index as a (imus, rows, 4) array, reading it if needed."""
+        with self._lock:
+            block = self._blocks.get(block_index)
+            if block is not None:
+                self._blocks.move_to_end(block_index)
+                return block
+            if self._closed:
+                return None
+
+        # Lecture hors verrou : les blocs déjà en cache restent accessibles pendant le préchargement
+        start = block_index * self.block_size
+        stop = min(start + self.block_size, self.num_samples)
+        with open_locked(self.file_path) as f:
+            block = qmath.normalize(np.stack([f[path][start:stop] for path in self._dataset_paths]))
+
+        with self._lock:
+            if self._closed:
+                return block
+            # Le même bloc a pu être lu entre-temps par l'autre thread
+            block = self._blocks.setdefault(block_index, block)
+            self._blocks.move_to_end(block_index)
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+            return block
+
+    def samples(self, index):
+        """(imus, 4) quaternions of sample index (clamped to the trial)."""
+        index = min(max(int(index), 0), self.num_samples - 1)
+        block = self._load_block(index // self.block_size)
+        return block[:, index % self.block_size]
+
+    def quaternions_at(self, time_s, prefetch=True):
+        """(imus, 4) quaternions at time_s, slerped between the two surrounding samples."""
+        sample = max(time_s, 0.0) / SAMPLE_PERIOD_S
+        index = int(math.floor(sample))
+        if prefetch:
+            self.prefetch(index)
+        q0 = self.samples(index)
+        frac = sample - index
+        if frac <= 1e-6 or index + 1 >= self.num_samples:
+            return q0
+        return qmath.slerp(q0, self.samples(index + 1), frac)
+
+    def prefetch(self, index):
+        """Queue the blocks following sample index for the background reader."""
+        first = max(int(index), 0) // self.block_size
+        last_block = (self.num_samples - 1) // self.block_size
+        with self._lock:
+            for block_index in range(first, min(first + self.read_ahead, last_block) + 1):
+                if block_index not in self._blocks and block_index not in self._pending:
+                    self._pending.add(block_index)
+                    self._requests.put(block_index)
+
+    def _read_ahead_loop(self):
+        while True:
+            block_index = self._requests.get()
+            if block_index is None:
+                return
+            try:
+                self._load_block(block_index)
+            except Exception as e:
+                print(f"[ERROR] Read-ahead of block {block_index} failed: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(block_index)
+
+    def close(self):
+        self._requests.put(None)
+        self._thread.join(timeout=1.0)
+        with self._lock:
+            self._closed = True
+            self._blocks.clear()
+
+
+class TrialPlayback(QObject):
+    """
+    Replays the recorded IMU quaternions of a trial on a Model3DViewer.
+
+    The playback clock advances in the viewer's frame scheduler (speed x real time);
+    each frame slerps between the two recorded samples around the clock, so the skeleton
+    moves smoothly even though samples only arrive every SAMPLE_PERIOD_S.
+    """
+
+    position_changed = pyqtSignal(float)  # Position de lecture en secondes
+    playing_changed = pyqtSignal(bool)
+
+    def __init__(self, viewer, parent=None):
+        super().__init__(parent)
+        self.viewer = viewer
+        self.reader = None
+        self.position = 0.0
+        self.speed = 1.0
+        self.playing = False
+        self._anchor = (0.0, 0.0)  # (horloge murale, position) au dernier play/seek/changement de vitesse
+
+    @property
+    def duration(self):
+        return self.reader.duration if self.reader is not None else 0.0
+
+    @property
+    def loaded(self):
+        return self.reader is not None and self.reader.num_samples > 0
+
+    def open(self, file_path, trial_id=None):
+        """Open the IMU stream of a trial (trial_id=None: root /Sensor); returns False if it has none."""
+        self.close()
+        try:
+            self.reader = TrialQuaternionReader(file_path, trial_id)
+        except Exception as e:
+            print(f"[ERROR] Could not open playback for {file_path}: {e}")
+            self.reader = None
+            return False
+
+        if not self.loaded:
+            print(f"[INFO] No IMU quaternions to replay in {file_path}")
+            self.close()
+            return False
+
+        # Mapping enregistré avec le trial ; sinon on garde celui déjà présent dans le viewer
+        for imu_id, body_part in self.reader.mapping.items():
+            if imu_id in self.reader.imu_ids:
+                self.viewer.map_imu_to_body_part(imu_id, body_part)
+        self.viewer.walking = False
+        print(f"[INFO] Playback ready: {len(self.reader.imu_ids)} IMUs, {self.reader.num_samples} samples "
+              f"({self.duration:.1f} s)")
+        self.seek(0.0)
+        return True
+
+    def close(self):
+        self.pause()
+        if self.reader is not None:
+            self.reader.close()
+            self.reader = None
+        self.position = 0.0
+
+    def set_speed(self, speed):
+        self.speed = max(0.01, float(speed))
+        self._anchor = (time.perf_counter(), self.position)
+
+    def play(self):
+        if not self.loaded or self.playing:
+            return
+        if self.position >= self.duration:
+            self.seek(0.0)
+        self.playing = True
+        self._anchor = (time.perf_counter(), self.position)
+        self.viewer.frame_scheduler.add_animator("trial_playback", self._advance)
+        self.playing_changed.emit(True)
+
+    def pause(self):
+        if not self.playing:
+            return
+        self.playing = False
+        self.viewer.frame_scheduler.remove_animator("trial_playback")
+        self.playing_changed.emit(False)
+
+    def toggle(self):
+        if self.playing:
+            self.pause()
+        else:
+            self.play()
+        return self.playing
+
+    def seek(self, time_s):
+        """Jump to time_s (seconds) and show that pose right away."""
+        if not self.loaded:
+            return
+        self.position = min(max(float(time_s), 0.0), self.duration)
+        self._anchor = (time.perf_counter(), self.position)
+        self._show(self.position)
+
+    def _advance(self, dt):
+        """Frame scheduler animator: follow the wall clock (x speed), whatever the frame rate."""
+        if not self.loaded:
+            self.playing = False
+            return False
+        started, start_position = self._anchor
+        self.position = min(start_position + (time.perf_counter() - started) * self.speed, self.duration)
+        self._show(self.position)
+        self.position_changed.emit(self.position)
+        if self.position >= self.duration:
+            self.playing = False
+            self.playing_changed.emit(False)
+            return False
+        return True
+
+    def _show(self, time_s):
+        reader = self.reader
+        for imu_id, quaternion in zip(reader.imu_ids, reader.quaternions_at(time_s)):
+            self.viewer.apply_imu_data(imu_id, quaternion)
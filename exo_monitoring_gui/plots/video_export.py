@@ -0,0 +1,267 @@
+'''
+Export of the 3D reconstruction of a recorded trial as a video (or a PNG frame sequence).
+
+The trial is cut into time segments rendered in parallel by worker processes, each with
+its own offscreen GL context (see offscreen.py); every worker pipes its frames to an
+ffmpeg subprocess and the segments are joined losslessly at the end, e.g.:
+    QT_QPA_PLATFORM=offscreen python plots/video_export.py trial.h5 trial.mp4 --trial 3
+'''
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.hdf5_utils import load_metadata
+
+# imageio-ffmpeg est optionnel : il fournit un binaire ffmpeg si aucun n'est installé
+try:
+    import imageio_ffmpeg
+except ImportError:
+    imageio_ffmpeg = None
+
+DEFAULT_FPS = 30
+DEFAULT_SIZE = (1280, 720)
+MIN_SEGMENT_S = 5.0  # En dessous, lancer un process de plus coûte plus cher qu'il ne rapporte
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.mov', '.avi')
+CANCEL_POLL_S = 0.2
+
+# Event partagé avec les workers (transmis à leur création, un Event ne se pickle pas avec la tâche)
+_stop_event = None
+
+
+def _init_worker(stop_event):
+    global _stop_event
+    _stop_event = stop_event
+
+
+def find_ffmpeg():
+    """Path of the ffmpeg executable (PATH first, then imageio-ffmpeg), or None."""
+    path = shutil.which("ffmpeg")
+    if path is None and imageio_ffmpeg is not None:
+        try:
+            path = imageio_ffmpeg.get_ffmpeg_exe()
+        except Exception:
+            path = None
+    return path
+
+
+def plan_segments(num_frames, workers, fps):
+    """Split [0, num_frames) into at most workers contiguous (start, stop) frame ranges."""
+    if num_frames <= 0:
+        return []
+    min_frames = max(1, int(MIN_SEGMENT_S * fps))
+    count = max(1, min(workers, num_frames // min_frames))
+    bounds = np.linspace(0, num_frames, count + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+class _FfmpegWriter:
+    """Raw RGBA frames piped to an ffmpeg H.264 encoder."""
+
+    def __init__(self, ffmpeg, path, width, height, fps):
+        command = [
+            ffmpeg, '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'rgba', '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+            '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', path,
+        ]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, image, index):
+        self.process.stdin.write(_image_bytes(image))
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.process.returncode}")
+
+
+class _PngWriter:
+    """Frames saved as frame_000000.png... (numbered over the whole trial)."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def write(self, image, index):
+        image.save(os.path.join(self.directory, f"frame_{index:06d}.png"))
+
+    def close(self):
+        pass
+
+
+def _image_bytes(image):
+    from PyQt5.QtGui import QImage
+
+    # RGBA8888 : 4 octets par pixel, donc pas de padding en fin de ligne
+    image = image.convertToFormat(QImage.Format_RGBA8888)
+    ptr = image.constBits()
+    ptr.setsize(image.byteCount())
+    return bytes(ptr)
+
+
+def render_segment(job):
+    """Worker process: render frames [start, stop) of the trial with its own offscreen context."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    from plots.offscreen import OffscreenViewer
+    from plots.trial_playback import TrialQuaternionReader
+
+    # Référence gardée volontairement : sans elle PyQt détruit l'application aussitôt
+    app = QApplication.instance() or QApplication([])  # noqa: F841
+    width, height = job["size"]
+    start, stop = job["frames"]
+
+    reader = TrialQuaternionReader(job["file_path"], job["trial_id"])
+    offscreen = OffscreenViewer(width, height, samples=job["samples"])
+    viewer = offscreen.viewer
+    viewer.walking = False  # Le mode performance enregistré est repris tel quel par le viewer
+    if job["metadata"]:
+        viewer.set_anthropometrics(job["metadata"])
+    for imu_id, body_part in reader.mapping.items():
+        if imu_id in reader.imu_ids:
+            viewer.map_imu_to_body_part(imu_id, body_part)
+
+    if job["segment_path"]:
+        writer = _FfmpegWriter(job["ffmpeg"], job["segment_path"], width, height, job["fps"])
+    else:
+        writer = _PngWriter(job["frames_dir"])
+    try:
+        for frame in range(start, stop):
+            if _stop_event is not None and _stop_event.is_set():
+                stop = frame
+                break
+            quaternions = reader.quaternions_at(frame / job["fps"])
+            for imu_id, quaternion in zip(reader.imu_ids, quaternions):
+                viewer.apply_imu_data(imu_id, quaternion)
+            writer.write(offscreen.render(), frame)
+    finally:
+        writer.close()
+        offscreen.release()
+        reader.close()
+    return job["index"], stop - start
+
+
+def _join_segments(ffmpeg, segment_paths, out_path, work_dir):
+    """Concatenate the segments without re-encoding (ffmpeg concat demuxer)."""
+    list_path = os.path.join(work_dir, "segments.txt")
+    with open(list_path, 'w') as f:
+        for path in segment_paths:
+            f.write(f"file '{path}'\n")
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', list_path,
+               '-c', 'copy', out_path]
+    subprocess.run(command, check=True)
+
+
+def export_trial_video(file_path, out_path, trial_id=None, fps=DEFAULT_FPS, size=DEFAULT_SIZE,
+                       workers=None, samples=4, progress_callback=None, cancelled=None):
+    """
+    Render the 3D skeleton of a recorded trial to out_path.
+
+    out_path ending in a video extension gives a single H.264 file; any other path is
+    used as a directory of PNG frames. Returns the number of frames written.
+    progress_callback(done_frames, total_frames) is called each time a segment is done.
+    cancelled() is polled while the segments render; when it returns True the workers stop
+    at their next frame, nothing is joined and the frames written so far are returned.
+    """
+    from plots.trial_playback import TrialQuaternionReader
+
+    reader = TrialQuaternionReader(file_path, trial_id)
+    try:
+        duration, has_imus = reader.duration, reader.num_samples > 0
+    finally:
+        reader.close()
+    if not has_imus:
+        raise ValueError(f"No IMU quaternions to render in {file_path}")
+
+    # yuv420p impose des dimensions paires
+    width, height = (int(v) // 2 * 2 for v in size)
+    num_frames = int(math.floor(duration * fps)) + 1
+    workers = workers or max(1, (os.cpu_count() or 2) - 1)
+    segments = plan_segments(num_frames, workers, fps)
+
+    as_video = out_path.lower().endswith(VIDEO_EXTENSIONS)
+    ffmpeg = find_ffmpeg() if as_video else None
+    if as_video and ffmpeg is None:
+        raise RuntimeError("ffmpeg not found: install it or imageio-ffmpeg, or export a PNG frame sequence")
+
+    work_dir = tempfile.mkdtemp(prefix="exo_video_", dir=os.path.dirname(os.path.abspath(out_path)))
+    if not as_video:
+        os.makedirs(out_path, exist_ok=True)
+    metadata, _ = load_metadata(file_path)
+    jobs = [{
+        "index": i,
+        "file_path": file_path,
+        "trial_id": trial_id,
+        "frames": frames,
+        "fps": fps,
+        "size": (width, height),
+        "samples": samples,
+        "metadata": metadata,
+        "ffmpeg": ffmpeg,
+        "segment_path": os.path.join(work_dir, f"segment_{i:03d}.mp4") if as_video else None,
+        "frames_dir": out_path,
+    } for i, frames in enumerate(segments)]
+
+    print(f"[INFO] Exporting {num_frames} frames ({duration:.1f} s at {fps} fps, {width}x{height}) "
+          f"in {len(jobs)} segment(s)")
+    done = 0
+    was_cancelled = False
+    # spawn : chaque process crée son propre contexte Qt/OpenGL
+    context = get_context("spawn")
+    stop_event = context.Event()
+    try:
+        with ProcessPoolExecutor(max_workers=len(jobs), mp_context=context,
+                                 initializer=_init_worker, initargs=(stop_event,)) as pool:
+            pending = {pool.submit(render_segment, job) for job in jobs}
+            while pending:
+                finished, pending = wait(pending, timeout=CANCEL_POLL_S, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    _, frames_written = future.result()
+                    done += frames_written
+                    if progress_callback is not None:
+                        progress_callback(done, num_frames)
+                if pending and cancelled is not None and cancelled():
+                    # Les segments en cours s'arrêtent à leur prochaine image, les autres ne démarrent pas
+                    stop_event.set()
+                    for future in pending:
+                        future.cancel()
+                    was_cancelled = True
+                    break
+        if as_video and not was_cancelled:
+            _join_segments(ffmpeg, [job["segment_path"] for job in jobs], out_path, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if was_cancelled:
+        print(f"[INFO] 3D reconstruction export cancelled after {done} frames")
+    else:
+        print(f"[INFO] 3D reconstruction exported to {out_path}")
+    return done
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Export the 3D reconstruction of a recorded trial")
+    parser.add_argument("file", help="HDF5 recording or subject container")
+    parser.add_argument("out", help="video file (.mp4, .mkv, ...) or directory for PNG frames")
+    parser.add_argument("--trial", type=int, default=None, help="trial number in a subject container")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS)
+    parser.add_argument("--size", default=f"{DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]}", help="WIDTHxHEIGHT")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--samples", type=int, default=4, help="MSAA samples of the offscreen framebuffer")
+    args = parser.parse_args()
+
+    w, h = (int(v) for v in args.size.lower().split("x"))
+    start = time.perf_counter()
+    export_trial_video(args.file, args.out, args.trial, fps=args.fps, size=(w, h), workers=args.workers,
+                       samples=args.samples,
+                       progress_callback=lambda d, t: print(f"[INFO] {d}/{t} frames rendered"))
+    print(f"[INFO] Done in {time.perf_counter() - start:.1f} s")
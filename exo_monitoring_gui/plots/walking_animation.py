@@ -0,0 +1,95 @@
+import math
+import numpy as np
+
+from utils import quaternion_math as qmath
+
+# Toutes les courbes sont des sinusoïdes du cycle de marche (phase de 0 à 2*pi) :
+#   valeur = amplitude * sin(fréquence * phase + déphasage)
+
+# Décalages de position des racines du squelette : (partie, axe 0=x 1=y 2=z, amplitude en m,
+# fréquence, déphasage). La cinématique directe recalcule les autres parties depuis les
+# racines : la tête et le cou suivent le torse, bras et jambes se balancent par leurs rotations.
+POSITION_CURVES = [
+    # Torse et hanches : balancement latéral et rebond vertical
+    ('torso', 0, 0.05, 1, 0.0),
+    ('torso', 1, 0.03, 2, 0.0),
+    ('hip', 0, 0.025, 1, 0.0),
+    ('hip', 1, 0.03, 2, 0.0),
+]
+
+# Rotations : (partie, axe, amplitude en degrés, fréquence, déphasage).
+# Plusieurs lignes pour une même partie sont composées dans l'ordre (q = q1 * q2 * ...).
+ROTATION_CURVES = [
+    ('torso', (0, 1, 0), 10.0, 1, 0.0),
+    # Tête : lacet (moitié du torse), tangage, roulis
+    ('head', (0, 1, 0), 5.0, 1, 0.0),
+    ('head', (1, 0, 0), 5.0, 1, 0.2),
+    ('head', (0, 0, 1), 3.0, 1, 0.0),
+    # Bras en opposition
+    *[(part, (1, 0, 0), 45.0, 1, 0.0) for part in ('deltoid_l', 'biceps_l', 'forearm_l', 'left_hand')],
+    *[(part, (1, 0, 0), -45.0, 1, 0.0) for part in ('deltoid_r', 'biceps_r', 'forearm_r', 'right_hand')],
+    # Jambes : la droite est déphasée d'un demi-cycle, genou et pied suivent la hanche
+    ('quadriceps_l', (1, 0, 0), 40.0, 1, 0.0),
+    ('ishcio_hamstrings_l', (1, 0, 0), 40.0, 1, 0.0),
+    ('calves_l', (1, 0, 0), 20.0, 1, 0.0),
+    ('left_foot', (1, 0, 0), 8.0, 1, 0.0),
+    ('quadriceps_r', (1, 0, 0), 40.0, 1, math.pi),
+    ('ishcio_hamstrings_r', (1, 0, 0), 40.0, 1, math.pi),
+    ('calves_r', (1, 0, 0), 20.0, 1, math.pi),
+    ('right_foot', (1, 0, 0), 8.0, 1, math.pi),
+]
+
+
+class AnimationTracks:
+    """
+    Keyframe tracks of a looping animation.
+
+    offsets is (frames, parts, 3) and rotations is (frames, parts, 4) quaternions, in the
+    order of names. Both arrays are read-only because they are shared between viewers.
+    """
+
+    def __init__(self, names, offsets, rotations):
+        self.names = tuple(names)
+        self.offsets = offsets
+        self.rotations = rotations
+        self.offsets.setflags(write=False)
+        self.rotations.setflags(write=False)
+
+    @property
+    def num_frames(self):
+        return len(self.offsets)
+
+
+def build_walking_tracks(names, num_frames):
+    """Compute the walking cycle for all frames at once from the curve tables."""
+    names = tuple(names)
+    index = {name: i for i, name in enumerate(names)}
+    phase = np.arange(num_frames) * (2.0 * math.pi / num_frames)
+
+    offsets = np.zeros((num_frames, len(names), 3))
+    for part, axis, amplitude, frequency, shift in POSITION_CURVES:
+        if part in index:
+            offsets[:, index[part], axis] += amplitude * np.sin(frequency * phase + shift)
+
+    rotations = np.zeros((num_frames, len(names), 4))
+    rotations[..., 0] = 1.0
+    for part, axis, amplitude, frequency, shift in ROTATION_CURVES:
+        if part in index:
+            angles = np.radians(amplitude) * np.sin(frequency * phase + shift)
+            i = index[part]
+            rotations[:, i] = qmath.multiply(rotations[:, i], qmath.from_axis_angle(axis, angles))
+
+    return AnimationTracks(names, offsets, rotations)
+
+
+# Pistes partagées entre toutes les instances du viewer : (noms des parties, nb de frames) -> pistes
+_TRACK_CACHE = {}
+
+
+def walking_tracks(names, num_frames=120):
+    """Walking tracks for this skeleton, computed on first use and then shared."""
+    key = (tuple(names), num_frames)
+    tracks = _TRACK_CACHE.get(key)
+    if tracks is None:
+        tracks = _TRACK_CACHE[key] = build_walking_tracks(*key)
+    return tracks
@@ -5,16 +5,17 @@ from PyQt5.QtCore import QTimer, Qt
 from PyQt5.QtGui import QPixmap
 import h5py
 import os
-import re
 from datetime import datetime
 from UI.informations import InformationWindow
-from utils.hdf5_utils import load_metadata, copy_only_root_metadata, copy_all_data_preserve_root_metadata, inject_metadata_to_hdf, load_sensor_config
+from utils.hdf5_utils import load_metadata, copy_only_root_metadata, inject_metadata_to_hdf, load_sensor_config, append_trial_from_file
 from UI.back.main_window_back import MainAppBack
+from UI.subject_catalog_dialog import SubjectCatalogDialog
 from utils.file_receiver import request_files, SERVER_IP, PORT, OUT_DIR
 class MainBar:
     def __init__(self, main_app):
         self.main_app = main_app
         self.main_app_back = MainAppBack(self.main_app)
+        self.catalog_dir = None
 
     def create_new_subject(self):
         """Creates a new subject file and opens information window"""
@@ -64,11 +65,13 @@ class MainBar:
                 self.main_app.info_window.info_submitted.connect(self.main_app_back.update_subject_metadata)
                 self.create_subject_action.setEnabled(False)
                 self.load_subject_action.setEnabled(False)
+                self.search_subjects_action.setEnabled(False)
                 self.load_existing_trial.setEnabled(False)
 
                 def closeEvent(event):
                     self.create_subject_action.setEnabled(True)
                     self.load_subject_action.setEnabled(True)
+                    self.search_subjects_action.setEnabled(True)
                     self.load_existing_trial.setEnabled(True)
                     self.save_subject_action.setEnabled(False)
                     self.save_subject_as_action.setEnabled(False)
@@ -83,7 +86,7 @@ class MainBar:
 
     # Add other methods of MainBar here
 
-    def load_existing_subject(self, review=False):
+    def load_existing_subject(self, review=False, filename=None):
         """Load an existing subject file"""
         if self.main_app.modified:
             reply = QMessageBox.question(self.main_app, 'Unsaved Changes',
@@ -95,14 +98,15 @@ class MainBar:
                 return
 
 
-        options = QFileDialog.Options()
-        filename, _ = QFileDialog.getOpenFileName(
-            self.main_app,
-            "Open Subject File",
-            "",
-            "HDF5 Files (*.h5 *.hdf5);;All Files (*)",
-            options=options
-        )
+        if filename is None:
+            options = QFileDialog.Options()
+            filename, _ = QFileDialog.getOpenFileName(
+                self.main_app,
+                "Open Subject File",
+                "",
+                "HDF5 Files (*.h5 *.hdf5);;All Files (*)",
+                options=options
+            )
 
         if filename:
             try:
@@ -128,11 +132,13 @@ class MainBar:
                         self.main_app.info_window.info_submitted.connect(self.main_app_back.update_subject_metadata)
                         self.create_subject_action.setEnabled(False)
                         self.load_subject_action.setEnabled(False)
+                        self.search_subjects_action.setEnabled(False)
                         self.load_existing_trial.setEnabled(False)
 
                         def closeEvent(event):
                             self.create_subject_action.setEnabled(True)
                             self.load_subject_action.setEnabled(True)
+                            self.search_subjects_action.setEnabled(True)
                             self.load_existing_trial.setEnabled(True)
                             self.save_subject_action.setEnabled(False)
                             self.save_subject_as_action.setEnabled(False)
@@ -153,6 +159,18 @@ class MainBar:
 
 
 
+    def search_subjects(self):
+        """Search subject files of a data folder through the catalog, then load the selected one"""
+        if self.catalog_dir is None and self.main_app.current_subject_file:
+            self.catalog_dir = os.path.dirname(os.path.abspath(self.main_app.current_subject_file))
+
+        dialog = SubjectCatalogDialog(self.main_app, self.catalog_dir)
+        if dialog.exec_() == QDialog.Accepted and dialog.selected_path:
+            self.catalog_dir = dialog.data_dir
+            self.load_existing_subject(filename=dialog.selected_path)
+        elif dialog.data_dir:
+            self.catalog_dir = dialog.data_dir
+
     def save_subject(self):
         """Save the current subject file"""
         if not self.main_app.current_subject_file:
@@ -471,6 +489,13 @@ class MainBar:
             tip="Load an existing subject file"
         )
 
+        self.search_subjects_action = self._create_action(
+            "Searc&h subjects...",
+            lambda: self.search_subjects(),
+            "Ctrl+Shift+O",
+            tip="Search all subject files of a folder"
+        )
+
         self.save_subject_action = self._create_action(
             "&Save subject",
             lambda: self.save_subject_notsave(),
@@ -530,6 +555,7 @@ class MainBar:
         # Add actions to file menu
         file_menu.addAction(self.create_subject_action)
         file_menu.addAction(self.load_subject_action)
+        file_menu.addAction(self.search_subjects_action)
         file_menu.addSeparator()
         file_menu.addAction(self.save_subject_action)
         file_menu.addAction(self.save_subject_as_action)
@@ -569,6 +595,7 @@ class MainBar:
         for attr_name in [
             "create_subject_action",
             "load_subject_action",
+            "search_subjects_action",
             "save_subject_action",
             "save_subject_as_action",
             "load_existing_trial",
@@ -660,6 +687,17 @@ class MainBar:
                 "Please connect sensors first using the 'Connect' button, then use this function to modify hardware settings and sensor-to-segment mappings."
             )
 
+    def _recorded_sensor_groups(self):
+        """Filtered IMU stream and quality codes of the last recording, stored with the received trial."""
+        backend = getattr(self.main_app, 'backend', None)
+        if backend is None or not hasattr(backend, 'recorded_sensor_groups'):
+            return None
+        try:
+            return backend.recorded_sensor_groups()
+        except Exception as e:
+            print(f"[ERROR] Filtered IMU stream not stored with the trial: {e}")
+            return None
+
     def request_h5_file(self):
         from UI.review import Review
         # Get current file or ask user to select one
@@ -688,9 +726,9 @@ class MainBar:
             print("3c'est iciiiiiiiiiiiiiiiiiii \n")
             print(latest_file)
             print(self.main_app.subject_file)
-            copy_all_data_preserve_root_metadata(latest_file, f)
+            append_trial_from_file(f, latest_file, self._recorded_sensor_groups())
 
-            self.review = Review(file_path=self.main_app.subject_file,existing_load=True)
+            self.review = Review(file_path=f, existing_load=True)
 
             for widget in QApplication.topLevelWidgets():
                 widget.close()
@@ -725,10 +763,10 @@ class MainBar:
             latest_file = max(received_files, key=os.path.getmtime)
             print("dededededededede 4")
             print(latest_file)
-            copy_all_data_preserve_root_metadata(latest_file, f)
+            # Le trial est ajouté dans le conteneur du sujet (/trials/<n>) au lieu d'un nouveau fichier
+            append_trial_from_file(f, latest_file, self._recorded_sensor_groups())
 
-            file_dictionary.append(f)
-            self.review = Review(parent=None, file_path=f, existing_load=True, trials=file_dictionary)
+            self.review = Review(parent=None, file_path=f, existing_load=True)
             print(file_dictionary)
             for widget in QApplication.topLevelWidgets():
                 widget.close()
@@ -822,44 +860,8 @@ class MainBar:
         if file_dictionary is None:
             file_dictionary = []
 
-        # Obtenir dossier et nom de base sans extension
-        base_dir = os.path.dirname(parent.file_path)
-        base_name = os.path.splitext(os.path.basename(parent.file_path))[0]
-
-        # Déterminer le numéro de trial
-        trial_number = len(file_dictionary) + 1
-
-        # Rechercher si _trial_{nombre} est déjà présent
-        match = re.match(r"^(.*)_trial_\d+$", base_name)
-        if match:
-            base_name_clean = match.group(1)
-        else:
-            base_name_clean = base_name
-
-        new_file_name = f"{base_name_clean}_trial_{trial_number}.h5"
-        new_file_path = os.path.join(base_dir, new_file_name)
-        
-        while os.path.exists(new_file_path):
-            base_name_clean += "_"
-            new_file_name = f"{base_name_clean}_trial_{trial_number}.h5"
-            new_file_path = os.path.join(base_dir, new_file_name)
-
-        try:
-            # Lire les métadonnées du fichier source
-            with h5py.File(parent.file_path, 'r') as source_file:
-                attrs = dict(source_file.attrs)
-
-            # Créer un nouveau fichier avec uniquement les mêmes métadonnées
-            with h5py.File(new_file_path, 'w') as new_file:
-                for key, value in attrs.items():
-                    new_file.attrs[key] = value
-
-            print(f"✅ Fichier créé avec les métadonnées : {new_file_path}")
-
-        except Exception as e:
-            print(f"❌ Erreur lors de la création du fichier : {e}")
-
+        # Le nouveau trial sera ajouté dans /trials/<n> du fichier sujet à la réception,
+        # il n'est plus nécessaire de créer un fichier <nom>_trial_N.h5 par trial.
         from plots.dashboard_app import DashboardApp
-        parent.dashboard_instance = DashboardApp(new_file_path, parent, file_dictionary)
+        parent.dashboard_instance = DashboardApp(parent.file_path, parent, file_dictionary)
         parent.dashboard_instance.showMaximized()
-
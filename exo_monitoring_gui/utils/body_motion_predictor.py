@@ -4,50 +4,56 @@ import torch.nn as nn
 import torch.optim as optim
 import os
 
+from utils import quaternion_math as qmath
+
+# Définir les relations entre les parties du corps (partie -> parties dont elle suit le mouvement)
+BODY_RELATIONS = {
+    # La tête suit le cou
+    'head': ['neck'],
+    # Les mains suivent les avant-bras
+    'left_hand': ['forearm_l'],
+    'right_hand': ['forearm_r'],
+    # Les avant-bras suivent les biceps
+    'forearm_l': ['biceps_l'],
+    'forearm_r': ['biceps_r'],
+    # Les biceps suivent les deltoïdes
+    'biceps_l': ['deltoid_l', 'torso'],
+    'biceps_r': ['deltoid_r', 'torso'],
+    # Les deltoïdes suivent le torse
+    'deltoid_l': ['torso'],
+    'deltoid_r': ['torso'],
+    # Les muscles du dos et de la poitrine suivent le torse
+    'dorsalis_major_l': ['torso'],
+    'dorsalis_major_r': ['torso'],
+    'pectorals_l': ['torso'],
+    'pectorals_r': ['torso'],
+    # Le cou suit le torse
+    'neck': ['torso'],
+    # Les jambes suivent les hanches
+    'quadriceps_l': ['hip'],
+    'quadriceps_r': ['hip'],
+    'ishcio_hamstrings_l': ['hip'],
+    'ishcio_hamstrings_r': ['hip'],
+    'glutes_l': ['hip'],
+    'glutes_r': ['hip'],
+    # Les mollets suivent les jambes
+    'calves_l': ['quadriceps_l', 'ishcio_hamstrings_l'],
+    'calves_r': ['quadriceps_r', 'ishcio_hamstrings_r'],
+    # Les pieds suivent les mollets
+    'left_foot': ['calves_l'],
+    'right_foot': ['calves_r'],
+    # Les hanches suivent le torse
+    'hip': ['torso']
+}
+
+
 class SimpleBodyPredictor:
     """Un prédicteur simple pour le mouvement du corps basé sur les parties avec des IMUs"""
     
     def __init__(self, model_path=None):
         self.model_path = model_path
-        # Définir les relations entre les parties du corps
-        self.body_relations = {
-            # La tête suit le cou
-            'head': ['neck'],
-            # Les mains suivent les avant-bras
-            'left_hand': ['forearm_l'],
-            'right_hand': ['forearm_r'],
-            # Les avant-bras suivent les biceps
-            'forearm_l': ['biceps_l'],
-            'forearm_r': ['biceps_r'],
-            # Les biceps suivent les deltoïdes
-            'biceps_l': ['deltoid_l', 'torso'],
-            'biceps_r': ['deltoid_r', 'torso'],
-            # Les deltoïdes suivent le torse
-            'deltoid_l': ['torso'],
-            'deltoid_r': ['torso'],
-            # Les muscles du dos et de la poitrine suivent le torse
-            'dorsalis_major_l': ['torso'],
-            'dorsalis_major_r': ['torso'],
-            'pectorals_l': ['torso'],
-            'pectorals_r': ['torso'],
-            # Le cou suit le torse
-            'neck': ['torso'],
-            # Les jambes suivent les hanches
-            'quadriceps_l': ['hip'],
-            'quadriceps_r': ['hip'],
-            'ishcio_hamstrings_l': ['hip'],
-            'ishcio_hamstrings_r': ['hip'],
-            'glutes_l': ['hip'],
-            'glutes_r': ['hip'],
-            # Les mollets suivent les jambes
-            'calves_l': ['quadriceps_l', 'ishcio_hamstrings_l'],
-            'calves_r': ['quadriceps_r', 'ishcio_hamstrings_r'],
-            # Les pieds suivent les mollets
-            'left_foot': ['calves_l'],
-            'right_foot': ['calves_r'],
-            # Les hanches suivent le torse
-            'hip': ['torso']
-        }
+        self.body_relations = {part: list(parents) for part, parents in BODY_RELATIONS.items()}
+        self._relation_matrices = {}  # Cache : ordre des parties -> matrice des relations
         
         # Chargement d'un modèle ML si disponible
         self.ml_model = None
@@ -148,11 +154,7 @@ class SimpleBodyPredictor:
                 if part_name not in imu_data:  # Uniquement les parties sans IMU
                     # Chaque partie a une rotation quaternion [w,x,y,z]
                     if idx + 4 <= len(output):
-                        rot = output[idx:idx+4]
-                        # Normaliser le quaternion
-                        norm = np.linalg.norm(rot)
-                        if norm > 1e-6:  # Éviter division par zéro
-                            rot = rot / norm
+                        rot = qmath.normalize(output[idx:idx+4])
                         predictions[part_name] = {'rot': rot}
                         idx += 4
             
@@ -176,14 +178,14 @@ class SimpleBodyPredictor:
         Returns:
             Dictionnaire mis à jour avec les rotations prédites pour toutes les parties
         """
+        if hasattr(body_parts, 'rotations'):
+            return self._predict_pose(body_parts, monitored_parts)
+
         imu_data = {k: v for k, v in body_parts.items() if k in monitored_parts}
         predictions = self.predict_from_partial_state(imu_data)
         
         # Copier les données d'entrée pour ne pas les modifier directement
-        updated_body_parts = {k: {
-            'pos': v['pos'].copy(), 
-            'rot': v['rot'].copy()
-        } for k, v in body_parts.items()}
+        updated_body_parts = _copy_body_parts(body_parts)
         
         # Mettre à jour les parties non surveillées avec les prédictions
         for part_name, pred in predictions.items():
@@ -192,6 +194,58 @@ class SimpleBodyPredictor:
         
         return updated_body_parts
 
+    def _relation_matrix(self, names):
+        """(N, N) matrix with W[i, j] = 1 when part i follows part j (see BODY_RELATIONS)."""
+        key = tuple(names)
+        if key not in self._relation_matrices:
+            index = {name: i for i, name in enumerate(names)}
+            W = np.zeros((len(names), len(names)))
+            for part_name, related_parts in self.body_relations.items():
+                if part_name in index:
+                    for rel_part in related_parts:
+                        if rel_part in index:
+                            W[index[part_name], index[rel_part]] = 1.0
+            self._relation_matrices[key] = W
+        return self._relation_matrices[key]
+
+    def _predict_pose(self, pose, monitored_parts):
+        """Version vectorisée de predict_joint_movement pour une PoseState (plots/pose_state.py)."""
+        updated = pose.copy()
+        monitored = pose.mask(monitored_parts)
+        if not monitored.any():
+            return updated
+
+        if self.ml_model:
+            imu_data = {name: pose[name] for name in monitored_parts if name in pose}
+            try:
+                ml_predictions = self._predict_with_ml(imu_data)
+            except Exception as e:
+                print(f"[WARNING] Erreur de prédiction ML: {e}, utilisation du fallback")
+                ml_predictions = {}
+            if ml_predictions:
+                for part_name, pred in ml_predictions.items():
+                    if part_name in updated:
+                        updated[part_name]['rot'] = pred['rot']
+                return updated
+
+        # Fallback : moyenne des rotations des parties liées surveillées, pour toutes les parties à la fois
+        weights = self._relation_matrix(pose.names) * monitored
+        counts = weights.sum(axis=1)
+        targets = (counts > 0) & ~monitored
+        if targets.any():
+            updated.rotations[targets] = qmath.normalize(weights[targets] @ pose.rotations)
+        return updated
+
+
+def _copy_body_parts(body_parts):
+    """Copy a pose (PoseState or dict of {'pos', 'rot'} dicts) without sharing arrays."""
+    if hasattr(body_parts, 'rotations'):
+        return body_parts.copy()
+    return {k: {
+        'pos': v['pos'].copy(),
+        'rot': v['rot'].copy()
+    } for k, v in body_parts.items()}
+
 
 class ImprovedBodyMotionNetwork(nn.Module):
     """Version améliorée du réseau pour de meilleures prédictions."""
@@ -361,20 +415,14 @@ class MLBodyPredictor:
             output = self.model(input_data.unsqueeze(0)).squeeze(0)
         
         # Copier les données d'entrée pour ne pas les modifier directement
-        updated_body_parts = {k: {
-            'pos': v['pos'].copy(), 
-            'rot': v['rot'].copy()
-        } for k, v in body_parts.items()}
+        updated_body_parts = _copy_body_parts(body_parts)
         
         # Mettre à jour les parties non surveillées avec les prédictions
         for part_name, idx in self.body_part_indices.items():
             if part_name not in monitored_parts:
                 output_idx = idx * 4  # 4 valeurs quaternion par partie
-                quat = output[output_idx:output_idx+4].cpu().numpy()
                 # Normaliser le quaternion prédit
-                quat_norm = np.linalg.norm(quat)
-                if quat_norm > 0:
-                    quat = quat / quat_norm
+                quat = qmath.normalize(output[output_idx:output_idx+4].cpu().numpy())
                 updated_body_parts[part_name]['rot'] = quat
         
         return updated_body_parts
@@ -0,0 +1,137 @@
+'''
+T-pose calibration profiles reused from one session to the next.
+
+A profile holds the offset and the T-pose spread of every calibrated IMU, with the IMU
+mapping it was computed for. It is stored in the subject HDF5 (/calibration, travels with
+the recordings) and in a local cache next to sensor_mappings.json keyed by subject, then
+by "<imu id>:<body part>": an entry only applies while that IMU is still on that body part.
+'''
+import json
+import os
+import time
+
+import h5py
+import numpy as np
+
+from utils.hdf5_utils import CALIBRATION_GROUP, open_locked
+
+PROFILE_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'plots', 'calibration_profiles.json')
+CALIBRATION_DRIFT_DEG = 5.0  # Au-delà, une nouvelle calibration est proposée
+DRIFT_CHECK_TIMEOUT_S = 5.0  # Délai après la confirmation de la T-pose pour trouver une fenêtre stable
+
+
+def subject_key(subject_file):
+    """Cache key of a subject: its HDF5 file name without extension (None without subject)."""
+    return os.path.splitext(os.path.basename(subject_file))[0] if subject_file else None
+
+
+def entry_key(imu_id, body_part):
+    return f"{int(imu_id)}:{body_part}"
+
+
+def make_profile(mapping, offsets, spread_deg):
+    """Profile of the mapped IMUs that have an offset ({body part: quaternion}, {body part: deg})."""
+    entries = {}
+    for imu_id, body_part in mapping.items():
+        if body_part in offsets:
+            entries[entry_key(imu_id, body_part)] = {
+                "imu_id": int(imu_id),
+                "body_part": body_part,
+                "offset": [float(c) for c in offsets[body_part]],
+                "spread_deg": float(spread_deg.get(body_part, np.nan)),
+            }
+    return {"saved_at": time.time(), "mapping": {str(k): v for k, v in mapping.items()}, "entries": entries}
+
+
+def _read_cache(path):
+    if os.path.exists(path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[WARNING] Could not read calibration profiles {path}: {e}")
+    return {}
+
+
+def write_profile_hdf5(subject_file, profile):
+    """Replace the /calibration group of the subject file with this profile."""
+    entries = list(profile["entries"].values())
+    with open_locked(subject_file, 'a') as f:
+        if CALIBRATION_GROUP in f:
+            del f[CALIBRATION_GROUP]
+        group = f.create_group(CALIBRATION_GROUP)
+        group.create_dataset("imu_ids", data=np.array([e["imu_id"] for e in entries], dtype=np.int32))
+        group.create_dataset("body_parts", data=[e["body_part"] for e in entries], dtype=h5py.string_dtype())
+        group.create_dataset("offsets", data=np.array([e["offset"] for e in entries], dtype=np.float64).reshape(-1, 4))
+        group.create_dataset("spread_deg", data=np.array([e["spread_deg"] for e in entries], dtype=np.float64))
+        group.attrs["saved_at"] = profile["saved_at"]
+        group.attrs["mapping"] = json.dumps(profile["mapping"])
+
+
+def read_profile_hdf5(subject_file):
+    """Profile stored in the subject file, or None."""
+    if not subject_file or not os.path.exists(subject_file):
+        return None
+    with open_locked(subject_file) as f:
+        group = f.get(CALIBRATION_GROUP)
+        if not isinstance(group, h5py.Group) or "offsets" not in group:
+            return None
+        body_parts = [p.decode("utf-8") if isinstance(p, bytes) else str(p) for p in group["body_parts"][()]]
+        entries = {}
+        for imu_id, body_part, offset, spread in zip(group["imu_ids"][()], body_parts,
+                                                     group["offsets"][()], group["spread_deg"][()]):
+            entries[entry_key(imu_id, body_part)] = {"imu_id": int(imu_id), "body_part": body_part,
+                                                     "offset": offset.tolist(), "spread_deg": float(spread)}
+        return {"saved_at": float(group.attrs.get("saved_at", 0.0)),
+                "mapping": json.loads(group.attrs.get("mapping", "{}")), "entries": entries}
+
+
+def save_calibration_profile(subject_file, profile, path=PROFILE_CACHE_PATH):
+    """Store a profile in the subject file and in the local cache (entries of other IMUs are kept)."""
+    subject = subject_key(subject_file)
+    if subject is None:
+        return False
+    try:
+        write_profile_hdf5(subject_file, profile)
+    except OSError as e:
+        print(f"[WARNING] Could not write calibration profile to {subject_file}: {e}")
+
+    cache = _read_cache(path)
+    cached = cache.setdefault(subject, {"entries": {}})
+    cached["entries"].update(profile["entries"])
+    cached["saved_at"] = profile["saved_at"]
+    cached["mapping"] = profile["mapping"]
+    try:
+        with open(path, 'w') as f:
+            json.dump(cache, f, indent=2)
+    except OSError as e:
+        print(f"[ERROR] Could not save calibration profiles {path}: {e}")
+        return False
+    return True
+
+
+def load_calibration_profile(subject_file, mapping, path=PROFILE_CACHE_PATH):
+    """
+    Offsets and spreads ({body part: quaternion}, {body part: deg}) of a saved profile for
+    the current mapping. The subject file wins over the local cache; None unless every
+    mapped IMU has an entry for its body part.
+    """
+    subject = subject_key(subject_file)
+    if subject is None or not mapping:
+        return None
+    sources = []
+    try:
+        sources.append(read_profile_hdf5(subject_file))
+    except OSError as e:
+        print(f"[WARNING] Could not read calibration profile from {subject_file}: {e}")
+    sources.append(_read_cache(path).get(subject))
+
+    for profile in sources:
+        if not profile:
+            continue
+        entries = [profile["entries"].get(entry_key(imu_id, part)) for imu_id, part in mapping.items()]
+        if all(entries):
+            offsets = {e["body_part"]: np.array(e["offset"], dtype=np.float64) for e in entries}
+            spread = {e["body_part"]: e["spread_deg"] for e in entries}
+            return offsets, spread
+    return None
@@ -0,0 +1,225 @@
+import json
+import hashlib
+import h5py
+import numpy as np
+
+from utils.hdf5_utils import DERIVED_GROUP, SAMPLE_PERIOD_S, open_locked
+from utils import quaternion_math as qmath
+from utils.imu_refilter import IMU_FILTER_RECIPE, filter_quaternions
+from utils.imu_smoothing import smooth_quaternions
+
+# SciPy est optionnel : sans lui, seules les recettes NumPy (RMS, Euler, IMU) sont calculées
+try:
+    from scipy import signal as sp_signal
+except ImportError:
+    sp_signal = None
+
+SAMPLE_RATE_HZ = 1.0 / SAMPLE_PERIOD_S
+
+# Une recette = un traitement + ses paramètres. Toute modification (y compris "version")
+# change le hash, donc le groupe /derived/<hash>/ : l'ancien cache n'est plus utilisé.
+# Les fréquences sont limitées par l'échantillonnage de la review (25 Hz, Nyquist 12.5 Hz).
+DEFAULT_RECIPES = [
+    {"kind": "rms", "label": "RMS", "groups": ["EMG", "PMMG"], "window_s": 0.2, "version": 1},
+    {"kind": "envelope", "label": "Envelope", "groups": ["EMG"], "cutoff_hz": 2.0, "order": 2, "version": 1},
+    {"kind": "bandpass", "label": "Band-pass", "groups": ["EMG"], "low_hz": 0.5, "high_hz": 10.0, "order": 2, "version": 1},
+    {"kind": "euler", "label": "Euler", "groups": ["IMU"], "version": 1},
+    # Passe-bas aller-retour : pas de retard de phase sur les orientations et les angles revus.
+    # 4 Hz garde les mouvements du corps ; le RTS aux bruits de KalmanQuaternionFilter coupait
+    # vers 0.1 Hz (32 deg d'erreur RMS sur un lacet de +/-46 deg à 1 Hz, contre 1 deg ici)
+    {"kind": "imu_zero_phase", "label": "Zero-phase", "groups": ["IMU"], "method": "low_pass",
+     "params": {"cutoff_hz": 4.0}, "version": 1},
+    {"kind": "imu_zero_phase", "label": "Zero-phase Euler", "groups": ["IMU"], "method": "low_pass",
+     "params": {"cutoff_hz": 4.0}, "output": "euler", "version": 1},
+]
+
+# Recettes trop lourdes pour la review : calculées en lot par utils/imu_refilter.py, la review
+# affiche seulement les résultats déjà en cache et à jour, sans jamais les calculer.
+BATCH_RECIPES = [IMU_FILTER_RECIPE]
+
+# Recettes remplacées dans DEFAULT_RECIPES : seuls leurs groupes /derived/<hash> sont supprimés.
+# Les autres groupes inconnus (recette SciPy calculée sur une autre machine, outil batch,
+# recette personnalisée) sont conservés, de même que ceux de BATCH_RECIPES.
+OBSOLETE_RECIPES = [
+    {"kind": "imu_zero_phase", "label": "Zero-phase", "groups": ["IMU"], "method": "rts",
+     "params": {"process_noise": 0.0001, "measurement_noise": 0.01}, "version": 1},
+    {"kind": "imu_zero_phase", "label": "Zero-phase Euler", "groups": ["IMU"], "method": "rts",
+     "params": {"process_noise": 0.0001, "measurement_noise": 0.01}, "output": "euler", "version": 1},
+    {"kind": "imu_filter", "label": "High precision", "groups": ["IMU"], "preset": "high_precision", "version": 1},
+]
+
+_SCIPY_KINDS = ("envelope", "bandpass")
+
+
+def recipe_hash(recipe):
+    """Short stable hash of a recipe, used as the /derived/<hash> group name."""
+    text = json.dumps(recipe, sort_keys=True)
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def source_digest(data):
+    """Fingerprint of a source dataset; the cached result is recomputed when it changes."""
+    data = np.ascontiguousarray(data)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str((data.shape, data.dtype.str)).encode("utf-8"))
+    h.update(data.tobytes())
+    return h.hexdigest()
+
+
+def derived_path(recipe, scope, key):
+    """Location of one derived result: /derived/<recipe-hash>/<scope>/<dataset>."""
+    return f"{DERIVED_GROUP}/{recipe_hash(recipe)}/{scope}/{key}"
+
+
+def store_derived(f, recipe, path, result, digest):
+    """Write (or replace) a derived result in an open file, tagged with its source digest."""
+    if path in f:
+        del f[path]
+    dset = f.create_dataset(path, data=result)
+    dset.attrs["source_digest"] = digest
+    f[f"{DERIVED_GROUP}/{recipe_hash(recipe)}"].attrs["recipe"] = json.dumps(recipe, sort_keys=True)
+
+
+def _moving_rms(x, window):
+    """Centered moving RMS computed with a cumulative sum (one pass, no Python loop)."""
+    x = np.asarray(x, dtype=np.float64)
+    if x.ndim > 1:
+        x = x[:, 0]
+    window = max(1, min(int(window), len(x)))
+    sq = np.concatenate(([0.0], np.cumsum(x * x)))
+    half = window // 2
+    idx = np.arange(len(x))
+    lo = np.clip(idx - half, 0, len(x))
+    hi = np.clip(idx - half + window, 0, len(x))
+    return np.sqrt((sq[hi] - sq[lo]) / np.maximum(hi - lo, 1))
+
+
+def compute_derived(recipe, data):
+    """Apply one recipe to a source array. Returns None when it cannot be applied."""
+    data = np.asarray(data)
+    if data.size == 0:
+        return None
+    try:
+        return _apply_recipe(recipe, data)
+    except (ValueError, np.linalg.LinAlgError) as e:
+        # Signal trop court pour le filtrage aller-retour, données dégénérées : seule cette
+        # recette manque, les autres sont calculées et mises en cache
+        print(f"[WARNING] Derived signal '{recipe['label']}' skipped: {e}")
+        return None
+
+
+def _apply_recipe(recipe, data):
+    kind = recipe["kind"]
+    if kind == "rms":
+        return _moving_rms(data, round(recipe["window_s"] * SAMPLE_RATE_HZ))
+
+    if kind == "euler":
+        if data.ndim != 2 or data.shape[1] != 4:
+            return None
+        return qmath.to_euler(qmath.normalize(data), degrees=True)
+
+    if kind == "imu_filter":
+        if data.ndim != 2 or data.shape[1] != 4:
+            return None
+        return filter_quaternions(data, recipe["preset"], config=recipe.get("config"),
+                                  zero_phase=recipe.get("zero_phase", False))
+
+    if kind == "imu_zero_phase":
+        if data.ndim != 2 or data.shape[1] != 4:
+            return None
+        smoothed = smooth_quaternions(data, recipe["method"], **recipe["params"])
+        return qmath.to_euler(smoothed, degrees=True) if recipe.get("output") == "euler" else smoothed
+
+    if sp_signal is None:
+        return None
+    x = np.asarray(data, dtype=np.float64)
+    if x.ndim > 1:
+        x = x[:, 0]
+    if kind == "envelope":
+        sos = sp_signal.butter(recipe["order"], recipe["cutoff_hz"], btype="low", fs=SAMPLE_RATE_HZ, output="sos")
+        return sp_signal.sosfiltfilt(sos, np.abs(x - np.mean(x)))
+    if kind == "bandpass":
+        sos = sp_signal.butter(recipe["order"], [recipe["low_hz"], recipe["high_hz"]],
+                               btype="band", fs=SAMPLE_RATE_HZ, output="sos")
+        return sp_signal.sosfiltfilt(sos, x)
+    return None
+
+
+def _available_recipes(recipes):
+    return [r for r in recipes if sp_signal is not None or r["kind"] not in _SCIPY_KINDS]
+
+
+def load_or_compute_derived(file_path, scope, data_structure, loaded_data, recipes=None, cancelled=None,
+                            batch_recipes=None):
+    """Return the derived signals of one trial, reading /derived from the file when up to date.
+
+    scope identifies the trial inside the file ("trial_<n>" for a container, "root" otherwise).
+    Missing or stale results (source digest changed) are computed and written back to
+    /derived/<recipe-hash>/<scope>/<dataset>; only the groups of OBSOLETE_RECIPES are removed.
+    batch_recipes (BATCH_RECIPES by default) are read from the cache only, never computed here.
+    The file is read, then written, under hdf5_utils.file_lock and is closed while computing,
+    so the review and the playback read-ahead can keep reading it meanwhile.
+    cancelled() is checked before each dataset; when it returns True, the results so far are returned.
+    Returns {source_dataset: [(derived_name, array), ...]}.
+    """
+    recipes = _available_recipes(DEFAULT_RECIPES if recipes is None else recipes)
+    hashes = {recipe_hash(r): r for r in recipes}
+    computed = set(hashes)
+    hashes.update({recipe_hash(r): r for r in (BATCH_RECIPES if batch_recipes is None else batch_recipes)})
+    derived = {}
+
+    # Lecture du cache : résultats à jour, et ce qui reste à calculer
+    missing = []
+    obsolete = []
+    try:
+        with open_locked(file_path) as f:
+            if DERIVED_GROUP in f:
+                obsolete = [name for name in map(recipe_hash, OBSOLETE_RECIPES)
+                            if name in f[DERIVED_GROUP] and name not in hashes]
+            for group_upper, dataset_list in data_structure.items():
+                group_recipes = [(h, r) for h, r in hashes.items() if group_upper in r["groups"]]
+                for dataset_name in dataset_list if group_recipes else ():
+                    key = dataset_name.split()[0]
+                    source = loaded_data.get(key)
+                    if source is None:
+                        continue
+                    digest = source_digest(source)
+                    for h, recipe in group_recipes:
+                        path = derived_path(recipe, scope, key)
+                        if path in f and f[path].attrs.get("source_digest") == digest:
+                            derived.setdefault(key, []).append((f"{key} {recipe['label']}", f[path][()]))
+                        elif h in computed:  # Sinon pas encore calculé par l'outil batch
+                            missing.append((key, recipe, path, digest))
+    except OSError as e:
+        print(f"[WARNING] Derived cache unavailable for {file_path}: {e}")
+        missing = []
+        for group_upper, dataset_list in data_structure.items():
+            for dataset_name in dataset_list:
+                key = dataset_name.split()[0]
+                if loaded_data.get(key) is not None:
+                    missing.extend((key, r, None, None) for r in recipes if group_upper in r["groups"])
+
+    # Calcul hors fichier et hors verrou
+    results = []
+    for key, recipe, path, digest in missing:
+        if cancelled is not None and cancelled():
+            break
+        result = compute_derived(recipe, loaded_data[key])
+        if result is not None:
+            derived.setdefault(key, []).append((f"{key} {recipe['label']}", result))
+            if path is not None:
+                results.append((recipe, path, result, digest))
+
+    # Écriture groupée, brève, sous le même verrou que les lecteurs
+    if results or obsolete:
+        try:
+            with open_locked(file_path, 'a') as f:
+                for name in obsolete:
+                    del f[f"{DERIVED_GROUP}/{name}"]
+                for recipe, path, result, digest in results:
+                    store_derived(f, recipe, path, result, digest)
+        except OSError as e:
+            # Fichier en lecture seule ou ouvert ailleurs : résultats non mis en cache
+            print(f"[WARNING] Derived cache not written for {file_path}: {e}")
+
+    return derived
@@ -1,5 +1,7 @@
 import h5py
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from PyQt5.QtWidgets import (
     QTreeWidgetItem, QVBoxLayout
@@ -207,6 +209,8 @@ def load_hdf5_and_populate_tree(self, file_path):
             nonlocal time_length
             if isinstance(obj, h5py.Dataset):
                 parts = name.strip("/").split("/")
+                if parts[0] in (DERIVED_GROUP, RESAMPLED_GROUP, CALIBRATION_GROUP):
+                    return
                 if len(parts) >= 2:
                     group_name, dataset_name = parts[-2], parts[-1]
                     group_upper = group_name.upper()
@@ -251,17 +255,43 @@ def load_hdf5_and_populate_tree(self, file_path):
         group_item.setExpanded(True)
 
 
+_FILE_LOCKS = {}
+_FILE_LOCKS_GUARD = threading.Lock()
+
+
+def file_lock(file_path):
+    """
+    Lock shared by every thread of the app that opens file_path.
+
+    HDF5 refuses to open a file in 'a' mode while another handle of the same process has
+    it open read-only: readers and writers of a subject file that may run at the same time
+    (review, playback read-ahead, derived cache) open it under this lock.
+    """
+    key = os.path.normcase(os.path.abspath(file_path))
+    with _FILE_LOCKS_GUARD:
+        return _FILE_LOCKS.setdefault(key, threading.RLock())
+
+
+@contextmanager
+def open_locked(file_path, mode='r'):
+    """h5py.File(file_path, mode) held under file_lock(file_path)."""
+    with file_lock(file_path), h5py.File(file_path, mode) as f:
+        yield f
+
+
 def load_hdf5_data(file_path):
 
     loaded_data = {}
     data_structure = {}
     time_length = None
 
-    with h5py.File(file_path, "r") as f:
+    with open_locked(file_path) as f:
         def visitor(name, obj):
             nonlocal time_length
             if isinstance(obj, h5py.Dataset):
                 parts = name.strip("/").split("/")
+                if parts[0] in (DERIVED_GROUP, RESAMPLED_GROUP, CALIBRATION_GROUP):
+                    return
                 if len(parts) >= 2:
                     group_name, dataset_name = parts[-2], parts[-1]
                     group_upper = group_name.upper()
@@ -408,4 +438,239 @@ def load_sensor_config(file_path):
             print(f"Métadonnées à la racine de '{file_path}':")
             for key, value in root_attrs.items():
                 if key == "metadata":
-                    return json.loads(value)
\ No newline at end of file
+                    return json.loads(value)
+
+# --- Conteneur multi-trials : /trials/<n>/Sensor/... + index compact ---
+
+TRIALS_GROUP = "trials"
+TRIAL_INDEX_DATASET = "trial_index"
+SAMPLE_PERIOD_S = 0.040  # Période d'échantillonnage supposée par la review (40 ms)
+DERIVED_GROUP = "derived"  # Cache des signaux dérivés, voir utils/derived_signals.py
+RESAMPLED_GROUP = "resampled"  # Trials rééchantillonnés sur une base de temps uniforme, voir utils/resampling.py
+CALIBRATION_GROUP = "calibration"  # Profil de calibration T-pose du sujet, voir utils/calibration_profiles.py
+
+TRIAL_INDEX_DTYPE = np.dtype([
+    ("trial", "i4"),
+    ("channel", "S64"),        # Chemin relatif au groupe Sensor, ex. b"IMU/imu1"
+    ("start_time", "f8"),      # Timestamp epoch de l'import du trial
+    ("duration", "f8"),        # Secondes
+    ("n_samples", "i8"),
+    ("offset", "i8"),          # Offset en octets dans le fichier (-1 si chunké)
+    ("nbytes", "i8"),
+])
+
+
+def is_trial_container(file_path):
+    """Return True if the file uses the /trials/<n> layout with a trial index."""
+    try:
+        with h5py.File(file_path, 'r') as f:
+            return TRIAL_INDEX_DATASET in f
+    except (OSError, KeyError):
+        return False
+
+
+def _index_rows_for_trial(trial_group, trial_id, start_time):
+    """Build the index rows describing every dataset of one trial group."""
+    rows = []
+    sensor_group = trial_group.get("Sensor")
+    if sensor_group is None:
+        return rows
+
+    def visitor(name, obj):
+        if not isinstance(obj, h5py.Dataset):
+            return
+        n_samples = obj.shape[0] if obj.shape else 0
+        offset = obj.id.get_offset()
+        rows.append((
+            trial_id,
+            name.encode("utf-8")[:64],
+            start_time,
+            n_samples * SAMPLE_PERIOD_S,
+            n_samples,
+            -1 if offset is None else offset,
+            obj.id.get_storage_size(),
+        ))
+
+    sensor_group.visititems(visitor)
+    return rows
+
+
+def _write_trial_index(f, rows):
+    """Replace the trial index dataset of an open file with the given rows."""
+    if TRIAL_INDEX_DATASET in f:
+        del f[TRIAL_INDEX_DATASET]
+    index = np.array(rows, dtype=TRIAL_INDEX_DTYPE)
+    f.create_dataset(TRIAL_INDEX_DATASET, data=index, maxshape=(None,), chunks=True)
+
+
+def _migrate_root_sensor_group(f, trials_group):
+    """Move a legacy root /Sensor recording to /trials/1 and return its index rows."""
+    sensor_group = f.get("Sensor")
+    if sensor_group is None or "1" in trials_group:
+        return []
+
+    def first_dataset(name, obj):
+        if isinstance(obj, h5py.Dataset) and obj.size > 0:
+            return name
+        return None
+
+    if sensor_group.visititems(first_dataset) is None:
+        return []
+
+    f.move("Sensor", f"{TRIALS_GROUP}/1/Sensor")
+    trial_group = trials_group["1"]
+    start_time = os.path.getmtime(f.filename)
+    trial_group.attrs["start_time"] = datetime.fromtimestamp(start_time).strftime("%Y-%m-%d %H:%M:%S")
+    print("Ancien enregistrement /Sensor déplacé vers /trials/1")
+    return _index_rows_for_trial(trial_group, 1, start_time)
+
+
+def append_trial_from_file(subject_file, source_path, extra_sensor_groups=None):
+    """Copy the Sensor group of a received recording into /trials/<n> of the subject file.
+
+    Root attributes of the subject file are left untouched, so participant metadata
+    is stored once per subject instead of once per trial file.
+    extra_sensor_groups ({group: {dataset: array}}) are streams computed by the app during
+    the recording (e.g. IMU_filtered), written next to the received ones and indexed with them.
+    Returns the new trial number, or None on failure.
+    """
+    if not os.path.exists(source_path):
+        print(f"Erreur : Le fichier source {source_path} n'existe pas.")
+        return None
+
+    try:
+        with h5py.File(source_path, 'r') as src_file, h5py.File(subject_file, 'a') as dst_file:
+            if "Sensor" not in src_file:
+                print(f"Erreur : Aucun groupe 'Sensor' dans {source_path}.")
+                return None
+
+            trials_group = dst_file.require_group(TRIALS_GROUP)
+            rows = []
+            if TRIAL_INDEX_DATASET in dst_file:
+                rows = dst_file[TRIAL_INDEX_DATASET][()].tolist()
+            else:
+                rows = _migrate_root_sensor_group(dst_file, trials_group)
+
+            existing = [int(name) for name in trials_group if name.isdigit()]
+            trial_id = max(existing, default=0) + 1
+
+            trial_group = trials_group.create_group(str(trial_id))
+            src_file.copy("Sensor", trial_group)
+            for group_name, datasets in (extra_sensor_groups or {}).items():
+                group = trial_group["Sensor"].require_group(group_name)
+                for name, data in datasets.items():
+                    if name not in group:
+                        group.create_dataset(name, data=data)
+
+            # Les attributs du fichier reçu (config capteurs, etc.) restent attachés au trial
+            for key, value in src_file.attrs.items():
+                trial_group.attrs[key] = value
+            start_time = datetime.now().timestamp()
+            trial_group.attrs["start_time"] = datetime.fromtimestamp(start_time).strftime("%Y-%m-%d %H:%M:%S")
+            trial_group.attrs["source_file"] = os.path.basename(source_path)
+
+            rows.extend(_index_rows_for_trial(trial_group, trial_id, start_time))
+            _write_trial_index(dst_file, rows)
+
+        print(f"✅ Trial {trial_id} ajouté à {subject_file}")
+        return trial_id
+    except Exception as e:
+        print(f"Erreur lors de l'ajout du trial : {e}")
+        return None
+
+
+def rebuild_trial_index(subject_file):
+    """Rebuild /trial_index from the /trials groups (e.g. after manual edits)."""
+    with h5py.File(subject_file, 'a') as f:
+        rows = []
+        trials_group = f.get(TRIALS_GROUP)
+        if trials_group is not None:
+            for name in sorted((n for n in trials_group if n.isdigit()), key=int):
+                trial_group = trials_group[name]
+                start_time = 0.0
+                if "start_time" in trial_group.attrs:
+                    try:
+                        start_time = datetime.strptime(
+                            str(trial_group.attrs["start_time"]), "%Y-%m-%d %H:%M:%S"
+                        ).timestamp()
+                    except ValueError:
+                        pass
+                rows.extend(_index_rows_for_trial(trial_group, int(name), start_time))
+        _write_trial_index(f, rows)
+    return len(rows)
+
+
+def is_signal_channel(channel):
+    """False for the Time/Label/Controller channels, which do not count in a trial's length."""
+    return not channel.upper().startswith(("TIME/", "LABEL/", "CONTROLLER/"))
+
+
+def trials_from_index(f):
+    """Trials described by the /trial_index dataset of an open container (see list_trials)."""
+    if TRIAL_INDEX_DATASET not in f:
+        return []
+    trials = {}
+    for row in f[TRIAL_INDEX_DATASET][()]:
+        trial_id = int(row["trial"])
+        entry = trials.setdefault(trial_id, {
+            "trial": trial_id,
+            "start_time": float(row["start_time"]),
+            "duration": 0.0,
+            "n_samples": 0,
+            "channels": [],
+        })
+        channel = row["channel"].decode("utf-8")
+        entry["channels"].append(channel)
+        if is_signal_channel(channel):
+            entry["n_samples"] = max(entry["n_samples"], int(row["n_samples"]))
+            entry["duration"] = max(entry["duration"], float(row["duration"]))
+    return [trials[k] for k in sorted(trials)]
+
+
+def list_trials(subject_file):
+    """Return the trials of a container, read from the index only.
+
+    Each entry is a dict with trial, start_time, duration, n_samples and channels.
+    """
+    with open_locked(subject_file) as f:
+        return trials_from_index(f)
+
+
+def load_trial_data(subject_file, trial_id):
+    """Load one trial of a container using the index, without walking the file.
+
+    Returns the same structure as load_hdf5_data.
+    """
+    loaded_data = {}
+    data_structure = {}
+    time_length = None
+
+    with open_locked(subject_file) as f:
+        index = f[TRIAL_INDEX_DATASET][()]
+        sensor_group = f[f"{TRIALS_GROUP}/{trial_id}/Sensor"]
+        for row in index[index["trial"] == trial_id]:
+            channel = row["channel"].decode("utf-8")
+            parts = channel.strip("/").split("/")
+            if len(parts) < 2:
+                continue
+            group_upper, dataset_upper = parts[-2].upper(), parts[-1].upper()
+
+            if group_upper == "TIME":
+                time_length = int(row["n_samples"])
+                continue
+            if group_upper in ("LABEL", "CONTROLLER"):
+                continue
+
+            data_structure.setdefault(group_upper, []).append(dataset_upper)
+            if row["n_samples"] > 0:
+                loaded_data[dataset_upper] = sensor_group[channel][()]
+
+    if time_length is None:
+        time_length = len(next(iter(loaded_data.values()), []))
+    time_axis = np.arange(time_length) * SAMPLE_PERIOD_S
+
+    return {
+        "loaded_data": loaded_data,
+        "data_structure": data_structure,
+        "time_axis": time_axis
+    }
@@ -0,0 +1,88 @@
+"""
+T-pose calibration from a buffered window of IMU samples.
+
+The dashboard pushes every processed frame (all IMUs at once) into an IMURingBuffer;
+calibration reads the last window for all mapped IMUs in one array, averages it with the
+eigenvector method and accepts it when the angular spread of every IMU stays small.
+"""
+import numpy as np
+
+from utils import quaternion_math as qmath
+
+IMU_BUFFER_SAMPLES = 500  # 20 s à 25 Hz
+
+
+class IMURingBuffer:
+    """Last samples of every IMU, stored as a (imus, capacity, 4) ring with their timestamps."""
+
+    def __init__(self, capacity=IMU_BUFFER_SAMPLES):
+        self.capacity = capacity
+        self.imu_ids = ()
+        self._rows = {}
+        self._q = np.zeros((0, capacity, 4))
+        self._t = np.zeros(capacity)
+        self._pos = 0
+        self._count = 0
+
+    def clear(self):
+        self._pos = 0
+        self._count = 0
+
+    def push(self, imu_ids, quaternions, timestamp):
+        """Append one sample of all IMUs ((imus, 4) quaternions in imu_ids order)."""
+        imu_ids = tuple(imu_ids)
+        if imu_ids != self.imu_ids:
+            # Nouvelle configuration de capteurs : on repart d'un buffer vide
+            self.imu_ids = imu_ids
+            self._rows = {imu_id: i for i, imu_id in enumerate(imu_ids)}
+            self._q = np.zeros((len(imu_ids), self.capacity, 4))
+            self.clear()
+        self._q[:, self._pos] = quaternions
+        self._t[self._pos] = timestamp
+        self._pos = (self._pos + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    @property
+    def latest_time(self):
+        return self._t[self._pos - 1] if self._count else None
+
+    def window(self, seconds, imu_ids=None, since=None):
+        """
+        Samples of the last `seconds` (and not older than since), oldest first.
+
+        Returns (ids, timestamps (n,), quaternions (len(ids), n, 4)); ids are the requested
+        IMUs that are in the buffer.
+        """
+        ids = [i for i in (self.imu_ids if imu_ids is None else imu_ids) if i in self._rows]
+        if not self._count or not ids:
+            return ids, np.zeros(0), np.zeros((len(ids), 0, 4))
+        order = (np.arange(self._count) + self._pos - self._count) % self.capacity
+        t = self._t[order]
+        keep = t >= t[-1] - seconds
+        if since is not None:
+            keep &= t >= since
+        rows = [self._rows[i] for i in ids]
+        return ids, t[keep], self._q[rows][:, order[keep]]
+
+
+def angular_spread(quaternions, mean):
+    """RMS angle (rad) between (imus, n, 4) samples and their (imus, 4) mean."""
+    return np.sqrt(np.mean(qmath.angular_distance(quaternions, mean[:, None]) ** 2, axis=1))
+
+
+def tpose_offsets(quaternions):
+    """
+    Calibration offsets of a (imus, n, 4) T-pose window: conjugate of each IMU's mean
+    orientation (identity expected in T-pose). Returns (offsets (imus, 4), spread rad (imus,)).
+    """
+    mean = qmath.average(quaternions)
+    return qmath.conjugate(mean), angular_spread(qmath.normalize(quaternions), mean)
+
+
+def calibration_drift(quaternions, offsets):
+    """
+    Angle (rad) between the mean orientation of each IMU in a (imus, n, 4) T-pose window and
+    the T-pose its (imus, 4) offsets were computed from. Returns (drift (imus,), spread (imus,)).
+    """
+    mean = qmath.average(quaternions)
+    return qmath.angular_distance(mean, qmath.conjugate(offsets)), angular_spread(qmath.normalize(quaternions), mean)
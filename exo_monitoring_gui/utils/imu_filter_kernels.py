@@ -0,0 +1,496 @@
+"""
+Noyaux récursifs des filtres Kalman et Madgwick (et du détecteur de valeurs aberrantes)
+sur des blocs (capteurs, échantillons, 4).
+
+Numba (optionnel) compile les boucles en code natif ; sans lui, la même récurrence tourne
+en NumPy, vectorisée sur l'axe des capteurs. KalmanQuaternionFilter et MadgwickFilter
+appellent ces noyaux (avec un bloc d'un échantillon) : filtrer échantillon par échantillon
+ou par bloc donne exactement les mêmes valeurs. Face aux calculs matriciels d'origine
+(np.linalg.inv, np.linalg.norm, math.*), l'écart reste de l'ordre de l'ulp : l'ordre des
+sommes de NumPy/BLAS et la libm varient selon la plateforme, voir
+test_kernels_match_reference_filters.
+
+L'état de chaque capteur est passé en tableaux modifiés sur place :
+    q (S, 4), last_t (S,), initialized (S,) bool, et p (S,) pour Kalman.
+"""
+import math
+import numpy as np
+
+# Numba est optionnel : il accélère les boucles, les résultats restent ceux de NumPy
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+NUMBA_AVAILABLE = njit is not None
+
+
+def _jit(func):
+    return njit(cache=True, nogil=True)(func) if NUMBA_AVAILABLE else func
+
+
+# === Version compilée : boucles scalaires ===
+
+@_jit
+def _normalize_into(w, x, y, z, out):
+    norm = math.sqrt(w * w + x * x + y * y + z * z)
+    if norm < 1e-9:
+        out[0], out[1], out[2], out[3] = 1.0, 0.0, 0.0, 0.0
+    else:
+        out[0], out[1], out[2], out[3] = w / norm, x / norm, y / norm, z / norm
+
+
+@_jit
+def _kalman_loop(z, t, hold, q, p, last_t, initialized, process_noise, measurement_noise, out):
+    zn = np.empty(4)
+    for s in range(z.shape[0]):
+        for j in range(z.shape[1]):
+            if hold[s, j] and initialized[s]:
+                zn[:] = q[s]
+            else:
+                _normalize_into(z[s, j, 0], z[s, j, 1], z[s, j, 2], z[s, j, 3], zn)
+            if not initialized[s]:
+                q[s, :] = zn
+                last_t[s] = t[s, j]
+                initialized[s] = True
+            else:
+                dt = t[s, j] - last_t[s]
+                last_t[s] = t[s, j]
+                predicted_p = p[s] + process_noise * dt
+                # Ordre de KalmanQuaternionFilter : K = P_pred @ inv(S)
+                gain = predicted_p * (1.0 / (predicted_p + measurement_noise))
+                _normalize_into(q[s, 0] + gain * (zn[0] - q[s, 0]), q[s, 1] + gain * (zn[1] - q[s, 1]),
+                                q[s, 2] + gain * (zn[2] - q[s, 2]), q[s, 3] + gain * (zn[3] - q[s, 3]),
+                                q[s])
+                p[s] = (1.0 - gain) * predicted_p
+            out[s, j, :] = q[s]
+
+
+@_jit
+def _ahrs_step(q, gyro, accel, dt, beta):
+    """MadgwickFilter._madgwick_ahrs_update sur q (modifié sur place)."""
+    q0, q1, q2, q3 = q[0], q[1], q[2], q[3]
+    gx, gy, gz = gyro[0], gyro[1], gyro[2]
+    ax, ay, az = accel[0], accel[1], accel[2]
+
+    norm = math.sqrt(ax * ax + ay * ay + az * az)
+    if norm == 0:
+        return
+    ax /= norm
+    ay /= norm
+    az /= norm
+
+    f1 = 2 * (q1 * q3 - q0 * q2) - ax
+    f2 = 2 * (q0 * q1 + q2 * q3) - ay
+    f3 = 2 * (0.5 - q1 * q1 - q2 * q2) - az
+    j_11or24 = 2 * q2
+    j_12or23 = 2 * q3
+    j_13or22 = 2 * q0
+    j_14or21 = 2 * q1
+    j_32 = 2 * j_14or21
+    j_33 = 2 * j_11or24
+
+    s0 = j_13or22 * f2 - j_12or23 * f1
+    s1 = j_12or23 * f2 + j_13or22 * f1 - j_32 * f3
+    s2 = j_11or24 * f1 + j_33 * f3 - j_13or22 * f2
+    s3 = j_14or21 * f1 + j_11or24 * f2
+    norm = math.sqrt(s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3)
+    if norm != 0:
+        s0 /= norm
+        s1 /= norm
+        s2 /= norm
+        s3 /= norm
+
+    dq0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz) - beta * s0
+    dq1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy) - beta * s1
+    dq2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx) - beta * s2
+    dq3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx) - beta * s3
+    _normalize_into(q0 + dq0 * dt, q1 + dq1 * dt, q2 + dq2 * dt, q3 + dq3 * dt, q)
+
+
+@_jit
+def _slerp_step(q, z, t):
+    """quaternion_math.slerp(q, z, t) sur q (modifié sur place)."""
+    dot = q[0] * z[0] + q[1] * z[1] + q[2] * z[2] + q[3] * z[3]
+    sign = 1.0
+    if dot < 0.0:
+        sign = -1.0
+        dot = -dot
+    if dot > 0.9995:
+        r0 = q[0] + t * (sign * z[0] - q[0])
+        r1 = q[1] + t * (sign * z[1] - q[1])
+        r2 = q[2] + t * (sign * z[2] - q[2])
+        r3 = q[3] + t * (sign * z[3] - q[3])
+    else:
+        theta_0 = math.acos(min(dot, 1.0))
+        sin_theta_0 = math.sin(theta_0)
+        theta = theta_0 * t
+        s0 = math.cos(theta) - dot * math.sin(theta) / sin_theta_0
+        s1 = sign * math.sin(theta) / sin_theta_0
+        r0 = s0 * q[0] + s1 * z[0]
+        r1 = s0 * q[1] + s1 * z[1]
+        r2 = s0 * q[2] + s1 * z[2]
+        r3 = s0 * q[3] + s1 * z[3]
+    _normalize_into(r0, r1, r2, r3, q)
+
+
+@_jit
+def _madgwick_loop(z, t, hold, gyro, accel, use_ahrs, q, last_t, initialized, beta, sample_rate, out):
+    for s in range(z.shape[0]):
+        for j in range(z.shape[1]):
+            if not initialized[s]:
+                _normalize_into(z[s, j, 0], z[s, j, 1], z[s, j, 2], z[s, j, 3], q[s])
+                last_t[s] = t[s, j]
+                initialized[s] = True
+            else:
+                dt = t[s, j] - last_t[s]
+                last_t[s] = t[s, j]
+                if use_ahrs:
+                    _ahrs_step(q[s], gyro[s, j], accel[s, j], dt, beta)
+                else:
+                    _slerp_step(q[s], q[s] if hold[s, j] else z[s, j], beta * dt * sample_rate)
+            out[s, j, :] = q[s]
+
+
+@_jit
+def _ring_push(ring, length, position, s, value):
+    ring[s, position[s]] = value
+    position[s] = (position[s] + 1) % ring.shape[1]
+    length[s] = min(length[s] + 1, ring.shape[1])
+
+
+@_jit
+def _outlier_loop(q, active, history, history_len, history_pos, distances, distance_len,
+                  distance_pos, rejects, threshold, recent, min_jump, max_rejects, out):
+    window = history.shape[1]
+    for s in range(q.shape[0]):
+        for j in range(q.shape[1]):
+            out[s, j] = False
+            if not active[s, j]:
+                continue
+            # Distance au plus proche des `recent` derniers acceptés
+            best = 0.0
+            for k in range(min(history_len[s], recent)):
+                r = history[s, (history_pos[s] - 1 - k) % window]
+                dot = abs(r[0] * q[s, j, 0] + r[1] * q[s, j, 1] + r[2] * q[s, j, 2] + r[3] * q[s, j, 3])
+                best = max(best, dot)
+            distance = 2 * math.acos(min(best, 1.0))
+
+            total = 0.0
+            squares = 0.0
+            for k in range(distance_len[s]):
+                value = distances[s, (distance_pos[s] - 1 - k) % window]
+                total += value
+                squares += value * value
+            count = max(distance_len[s], 1)
+            mean = total / count
+            std = math.sqrt(max(squares / count - mean * mean, 0.0))
+            if (history_len[s] >= window // 2 and std > 0 and (distance - mean) / std > threshold
+                    and distance - mean > min_jump):
+                rejects[s] += 1
+                if rejects[s] < max_rejects:
+                    out[s, j] = True
+                    continue
+                # Réamorçage : l'échantillon devient le seul accepté
+                history_len[s] = 0
+                history_pos[s] = 0
+                distance_len[s] = 0
+                distance_pos[s] = 0
+            elif history_len[s] > 0:
+                _ring_push(distances, distance_len, distance_pos, s, distance)
+            rejects[s] = 0
+            _ring_push(history, history_len, history_pos, s, q[s, j])
+
+
+# === Version NumPy : même récurrence, vectorisée sur les capteurs ===
+
+def _normalize_rows(w, x, y, z):
+    norm = np.sqrt(w * w + x * x + y * y + z * z)
+    small = norm < 1e-9
+    safe = np.where(small, 1.0, norm)
+    return np.stack([np.where(small, 1.0, w / safe), np.where(small, 0.0, x / safe),
+                     np.where(small, 0.0, y / safe), np.where(small, 0.0, z / safe)], axis=-1)
+
+
+def _slerp_rows(a, b, t):
+    dot = a[:, 0] * b[:, 0] + a[:, 1] * b[:, 1] + a[:, 2] * b[:, 2] + a[:, 3] * b[:, 3]
+    b = np.where((dot < 0.0)[:, None], -b, b)
+    dot = np.abs(dot)
+    close = dot > 0.9995
+    theta_0 = np.arccos(np.minimum(dot, 1.0))
+    sin_theta_0 = np.where(close, 1.0, np.sin(theta_0))
+    theta = theta_0 * t
+    s0 = (np.cos(theta) - dot * np.sin(theta) / sin_theta_0)[:, None]
+    s1 = (np.sin(theta) / sin_theta_0)[:, None]
+    r = np.where(close[:, None], a + t[:, None] * (b - a), s0 * a + s1 * b)
+    return _normalize_rows(r[:, 0], r[:, 1], r[:, 2], r[:, 3])
+
+
+def _kalman_numpy(z, t, hold, q, p, last_t, initialized, process_noise, measurement_noise, out):
+    for j in range(z.shape[1]):
+        zn = _normalize_rows(z[:, j, 0], z[:, j, 1], z[:, j, 2], z[:, j, 3])
+        zn = np.where((hold[:, j] & initialized)[:, None], q, zn)
+        start = ~initialized
+        q[start] = zn[start]
+        update = ~start
+        if update.any():
+            dt = t[update, j] - last_t[update]
+            predicted_p = p[update] + process_noise * dt
+            gain = (predicted_p * (1.0 / (predicted_p + measurement_noise)))[:, None]
+            r = q[update] + gain * (zn[update] - q[update])
+            q[update] = _normalize_rows(r[:, 0], r[:, 1], r[:, 2], r[:, 3])
+            p[update] = (1.0 - gain[:, 0]) * predicted_p
+        last_t[:] = t[:, j]
+        initialized[:] = True
+        out[:, j] = q
+
+
+def _ahrs_rows(q, gyro, accel, dt, beta):
+    q0, q1, q2, q3 = q[:, 0], q[:, 1], q[:, 2], q[:, 3]
+    gx, gy, gz = gyro[:, 0], gyro[:, 1], gyro[:, 2]
+    ax, ay, az = accel[:, 0], accel[:, 1], accel[:, 2]
+
+    norm = np.sqrt(ax * ax + ay * ay + az * az)
+    moving = norm != 0
+    safe = np.where(moving, norm, 1.0)
+    ax, ay, az = ax / safe, ay / safe, az / safe
+
+    f1 = 2 * (q1 * q3 - q0 * q2) - ax
+    f2 = 2 * (q0 * q1 + q2 * q3) - ay
+    f3 = 2 * (0.5 - q1 * q1 - q2 * q2) - az
+    j_11or24, j_12or23, j_13or22, j_14or21 = 2 * q2, 2 * q3, 2 * q0, 2 * q1
+    j_32, j_33 = 2 * j_14or21, 2 * j_11or24
+
+    s0 = j_13or22 * f2 - j_12or23 * f1
+    s1 = j_12or23 * f2 + j_13or22 * f1 - j_32 * f3
+    s2 = j_11or24 * f1 + j_33 * f3 - j_13or22 * f2
+    s3 = j_14or21 * f1 + j_11or24 * f2
+    norm = np.sqrt(s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3)
+    safe = np.where(norm != 0, norm, 1.0)
+    s0, s1, s2, s3 = s0 / safe, s1 / safe, s2 / safe, s3 / safe
+
+    dq0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz) - beta * s0
+    dq1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy) - beta * s1
+    dq2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx) - beta * s2
+    dq3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx) - beta * s3
+    updated = _normalize_rows(q0 + dq0 * dt, q1 + dq1 * dt, q2 + dq2 * dt, q3 + dq3 * dt)
+    # Accéléromètre nul : le quaternion n'est pas modifié
+    return np.where(moving[:, None], updated, q)
+
+
+def _madgwick_numpy(z, t, hold, gyro, accel, use_ahrs, q, last_t, initialized, beta, sample_rate, out):
+    for j in range(z.shape[1]):
+        start = ~initialized
+        if start.any():
+            q[start] = _normalize_rows(z[start, j, 0], z[start, j, 1], z[start, j, 2], z[start, j, 3])
+        update = ~start
+        if update.any():
+            dt = t[update, j] - last_t[update]
+            if use_ahrs:
+                q[update] = _ahrs_rows(q[update], gyro[update, j], accel[update, j], dt, beta)
+            else:
+                target = np.where(hold[update, j, None], q[update], z[update, j])
+                q[update] = _slerp_rows(q[update], target, beta * dt * sample_rate)
+        last_t[:] = t[:, j]
+        initialized[:] = True
+        out[:, j] = q
+
+
+# === API ===
+
+def _block(z, t, hold):
+    z = np.ascontiguousarray(z, dtype=np.float64)
+    t = np.ascontiguousarray(np.broadcast_to(np.asarray(t, dtype=np.float64), z.shape[:2]))
+    if hold is None:
+        hold = np.zeros(z.shape[:2], dtype=np.bool_)
+    return z, t, np.ascontiguousarray(hold, dtype=np.bool_)
+
+
+def kalman_block(z, t, q, p, last_t, initialized, process_noise, measurement_noise, hold=None):
+    """
+    KalmanQuaternionFilter over a (sensors, samples, 4) block; t is (samples,) or (sensors, samples).
+
+    F = H = I and Q, R are multiples of I, so the covariance stays p * I: p (S,) holds
+    its diagonal. The state arrays are updated in place; returns the (S, T, 4) estimates.
+    hold (S, T) marks samples measured as the current estimate (a held value): time and
+    covariance advance, the estimate does not move.
+    """
+    z, t, hold = _block(z, t, hold)
+    out = np.empty_like(z)
+    kernel = _kalman_loop if NUMBA_AVAILABLE else _kalman_numpy
+    kernel(z, t, hold, q, p, last_t, initialized, float(process_noise), float(measurement_noise), out)
+    return out
+
+
+def madgwick_block(z, t, q, last_t, initialized, beta, sample_rate, gyro=None, accel=None, hold=None):
+    """
+    MadgwickFilter over a (sensors, samples, 4) block, with the AHRS update when gyro and
+    accel ((S, T, 3)) are given and the SLERP smoothing otherwise. State updated in place.
+    hold marks SLERP samples measured as the current estimate, as in kalman_block.
+    """
+    z, t, hold = _block(z, t, hold)
+    out = np.empty_like(z)
+    use_ahrs = gyro is not None and accel is not None
+    if use_ahrs:
+        gyro = np.ascontiguousarray(gyro, dtype=np.float64)
+        accel = np.ascontiguousarray(accel, dtype=np.float64)
+    else:
+        gyro = accel = np.zeros(z.shape[:2] + (3,))
+    kernel = _madgwick_loop if NUMBA_AVAILABLE else _madgwick_numpy
+    kernel(z, t, hold, gyro, accel, use_ahrs, q, last_t, initialized, float(beta), float(sample_rate), out)
+    return out
+
+
+def outlier_block(q, active, history, history_len, history_pos, distances, distance_len,
+                  distance_pos, rejects, threshold, recent, min_jump, max_rejects):
+    """
+    OutlierDetector over a (sensors, samples, 4) block, one sample after the other. The
+    rings (history, distances), their lengths/positions and rejects are updated in place;
+    returns the (S, T) outlier mask. Only worth calling with Numba: without it,
+    OutlierDetector.detect_block runs its NumPy passes instead.
+    """
+    q = np.ascontiguousarray(q, dtype=np.float64)
+    out = np.empty(q.shape[:2], dtype=bool)
+    _outlier_loop(q, np.ascontiguousarray(active, dtype=np.bool_), history, history_len,
+                  history_pos, distances, distance_len, distance_pos, rejects, float(threshold),
+                  int(recent), float(min_jump), int(max_rejects), out)
+    return out
+
+
+# === Tests ===
+
+# Écart toléré face aux filtres d'origine : quelques ulp, propagés par la récurrence
+REFERENCE_TOLERANCE = 1e-12
+
+
+def _reference_kalman(z, t, process_noise, measurement_noise):
+    """KalmanQuaternionFilter.process d'avant les noyaux (matrices 4x4), échantillon par échantillon."""
+    from utils import quaternion_math as qmath
+
+    state, P, last = None, np.eye(4), None
+    Q, R = np.eye(4) * process_noise, np.eye(4) * measurement_noise
+    out = []
+    for zi, ti in zip(z, t):
+        if last is None:
+            state = qmath.normalize(zi)
+        else:
+            predicted_P = P + Q * (ti - last)
+            K = predicted_P @ np.linalg.inv(predicted_P + R)
+            state = qmath.normalize(state + K @ (qmath.normalize(zi) - state))
+            P = (np.eye(4) - K) @ predicted_P
+        last = ti
+        out.append(state)
+    return np.array(out)
+
+
+def _reference_madgwick(z, t, beta, sample_rate, gyro=None, accel=None):
+    """MadgwickFilter.process d'avant les noyaux (math.* scalaire), échantillon par échantillon."""
+    from utils import quaternion_math as qmath
+
+    q, last = None, None
+    out = []
+    for j, (zi, ti) in enumerate(zip(z, t)):
+        if last is None:
+            q = qmath.normalize(zi)
+        elif gyro is None:
+            q = qmath.slerp(q, zi, beta * (ti - last) * sample_rate)
+        else:
+            dt = ti - last
+            q0, q1, q2, q3 = q
+            gx, gy, gz = gyro[j]
+            ax, ay, az = accel[j]
+            norm = math.sqrt(ax*ax + ay*ay + az*az)
+            if norm != 0:
+                ax, ay, az = ax / norm, ay / norm, az / norm
+                f1 = 2*(q1*q3 - q0*q2) - ax
+                f2 = 2*(q0*q1 + q2*q3) - ay
+                f3 = 2*(0.5 - q1*q1 - q2*q2) - az
+                step = np.array([2*q0*f2 - 2*q3*f1,
+                                 2*q3*f2 + 2*q0*f1 - 4*q1*f3,
+                                 2*q2*f1 + 4*q2*f3 - 2*q0*f2,
+                                 2*q1*f1 + 2*q2*f2])
+                norm = math.sqrt(step @ step)
+                if norm != 0:
+                    step /= norm
+                q_dot = 0.5 * np.array([-q1*gx - q2*gy - q3*gz,
+                                        q0*gx + q2*gz - q3*gy,
+                                        q0*gy - q1*gz + q3*gx,
+                                        q0*gz + q1*gy - q2*gx]) - beta * step
+                q = qmath.normalize(q + q_dot * dt)
+        last = ti
+        out.append(q)
+    return np.array(out)
+
+
+def _fresh_state(sensors=1):
+    """(q, p, last_t, initialized) d'un filtre qui n'a encore rien reçu."""
+    return (np.tile([1.0, 0.0, 0.0, 0.0], (sensors, 1)), np.ones(sensors), np.zeros(sensors),
+            np.zeros(sensors, dtype=bool))
+
+
+def test_kernels_match_reference_filters():
+    """Les noyaux suivent les filtres d'origine à REFERENCE_TOLERANCE près, par échantillon comme par bloc."""
+    rng = np.random.default_rng(0)
+    n = 3000
+    z = rng.normal(size=(n, 4))
+    t = np.cumsum(rng.uniform(0.005, 0.02, n))
+    gyro = rng.normal(size=(n, 3))
+    accel = rng.normal(size=(n, 3))
+    accel[::97] = 0.0  # Accéléromètre nul : quaternion inchangé
+
+    def kalman(rows, state):
+        q, p, last_t, initialized = state
+        return kalman_block(z[None, rows], t[rows], q, p, last_t, initialized, 0.001, 0.1)
+
+    def slerp(rows, state):
+        q, _, last_t, initialized = state
+        return madgwick_block(z[None, rows], t[rows], q, last_t, initialized, 0.1, 100.0)
+
+    def ahrs(rows, state):
+        q, _, last_t, initialized = state
+        return madgwick_block(z[None, rows], t[rows], q, last_t, initialized, 0.1, 100.0,
+                              gyro[None, rows], accel[None, rows])
+
+    cases = [
+        ("kalman", kalman, _reference_kalman(z, t, 0.001, 0.1)),
+        ("madgwick slerp", slerp, _reference_madgwick(z, t, 0.1, 100.0)),
+        ("madgwick ahrs", ahrs, _reference_madgwick(z, t, 0.1, 100.0, gyro, accel)),
+    ]
+    for name, run, reference in cases:
+        block = run(slice(None), _fresh_state())[0]
+        state = _fresh_state()
+        per_sample = np.concatenate([run(slice(j, j + 1), state)[0] for j in range(n)])
+        error = np.abs(block - reference).max()
+        assert error < REFERENCE_TOLERANCE, f"{name}: block differs from the reference by {error}"
+        assert np.array_equal(block, per_sample), f"{name}: block and per-sample outputs differ"
+
+    # Plusieurs capteurs d'un coup : chaque ligne reste celle d'un filtre seul
+    sensors = np.stack([z, z[::-1], -z])
+    out = kalman_block(sensors, t, *_fresh_state(3), 0.001, 0.1)
+    for s in range(3):
+        error = np.abs(out[s] - _reference_kalman(sensors[s], t, 0.001, 0.1)).max()
+        assert error < REFERENCE_TOLERANCE, f"kalman sensor {s} differs from the reference by {error}"
+
+
+
+def test_hold_measures_current_estimate():
+    """Un échantillon hold vaut une mesure égale à l'estimation courante."""
+    rng = np.random.default_rng(1)
+    z = rng.normal(size=(1, 200, 4))
+    t = np.cumsum(rng.uniform(0.005, 0.02, 200))
+    hold = rng.random((1, 200)) < 0.2
+    for name, run in (("kalman", lambda q, p, last_t, initialized, zs, ts, h: kalman_block(
+                          zs, ts, q, p, last_t, initialized, 0.001, 0.1, h)),
+                      ("madgwick slerp", lambda q, p, last_t, initialized, zs, ts, h: madgwick_block(
+                          zs, ts, q, last_t, initialized, 0.1, 100.0, hold=h))):
+        held = run(*_fresh_state(), z, t, hold)
+        state = _fresh_state()
+        measured = np.concatenate([run(*state, state[0][:, None] if hold[0, j] and state[3][0] else z[:, j:j + 1],
+                                       t[j:j + 1], None) for j in range(200)], axis=1)
+        assert np.abs(held - measured).max() < REFERENCE_TOLERANCE, f"{name}: hold differs"
+
+
+if __name__ == "__main__":
+    test_kernels_match_reference_filters()
+    test_hold_measures_current_estimate()
+    print(f"Noyaux conformes aux filtres d'origine (Numba : {NUMBA_AVAILABLE})")
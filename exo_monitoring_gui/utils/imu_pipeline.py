@@ -0,0 +1,148 @@
+"""
+Étages de traitement entre le décodage des paquets et l'affichage / l'enregistrement.
+
+Le dashboard pousse chaque trame décodée dans une file ; un QThread la fait passer par
+les étages dans l'ordre (filtrage IMU par défaut) et la renvoie au thread GUI par le
+signal frame_ready, avec la latence mesurée de bout en bout et par étage.
+
+Un étage est un objet avec un attribut name et une méthode process(frame) -> frame ;
+frame est un dict ("timestamp", "imu", "imu_ids", ...) que chaque étage complète.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from utils.imu_processor import IMUProcessorFactory
+
+# Préréglages proposés dans le dashboard ; None : le flux brut est recopié tel quel
+IMU_FILTER_PRESETS = {
+    "Off": None,
+    "Low latency": IMUProcessorFactory.create_low_latency,
+    "Default": IMUProcessorFactory.create_default,
+    "Robust": IMUProcessorFactory.create_robust,
+    "High precision": IMUProcessorFactory.create_high_precision,
+}
+DEFAULT_IMU_PRESET = "Low latency"
+LATENCY_WINDOW = 250  # Trames gardées pour les statistiques (10 s à 25 Hz)
+
+
+class IMUFilterStage:
+    """Filters the frame's IMU quaternions with IMUProcessor.process_batch (all sensors at once)."""
+
+    name = "imu_filter"
+
+    def __init__(self, preset=DEFAULT_IMU_PRESET):
+        self.preset = None
+        self.processor = None
+        self.set_preset(preset)
+
+    def set_preset(self, preset):
+        if preset not in IMU_FILTER_PRESETS:
+            raise ValueError(f"Unknown IMU filter preset: {preset}")
+        factory = IMU_FILTER_PRESETS[preset]
+        self.processor = factory() if factory is not None else None
+        self.preset = preset
+
+    def process(self, frame):
+        raw = frame.get("imu")
+        if raw is None or len(raw) == 0:
+            return frame
+        raw = np.asarray(raw, dtype=np.float64)
+        if self.processor is None:
+            frame["imu_filtered"] = raw.copy()
+            return frame
+        filtered, codes = self.processor.process_batch(raw, frame["timestamp"], frame.get("imu_ids"))
+        frame["imu_filtered"] = filtered
+        frame["imu_quality"] = codes
+        return frame
+
+
+class ProcessingPipeline(QThread):
+    """Runs the stages on a worker thread, one frame at a time, in submission order."""
+
+    frame_ready = pyqtSignal(object)  # Trame traitée (dict), émise dans le thread du pipeline
+
+    def __init__(self, stages=None, parent=None):
+        super().__init__(parent)
+        self.stages = list(stages or [])  # Fixés avant start()
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._stage_latencies = {stage.name: deque(maxlen=LATENCY_WINDOW) for stage in self.stages}
+        self._last_error_time = {}
+
+    def stage(self, name):
+        return next((stage for stage in self.stages if stage.name == name), None)
+
+    def submit(self, frame):
+        """Queue a decoded frame; it comes back through frame_ready."""
+        frame["submitted"] = time.perf_counter()
+        self._queue.put(("frame", frame))
+
+    def call_in_thread(self, func):
+        """Run func() on the pipeline thread, between two frames (e.g. to change a stage's settings)."""
+        self._queue.put(("call", func))
+
+    def run(self):
+        while True:
+            kind, item = self._queue.get()
+            if kind == "stop":
+                return
+            if kind == "call":
+                try:
+                    item()
+                except Exception as e:
+                    print(f"[ERROR] Processing pipeline: {e}")
+                continue
+            self._process(item)
+
+    def _process(self, frame):
+        stage_ms = {}
+        for stage in self.stages:
+            start = time.perf_counter()
+            try:
+                frame = stage.process(frame)
+            except Exception as e:
+                # Une erreur d'étage ne bloque pas le flux : la trame continue sans ses sorties
+                now = time.time()
+                if now - self._last_error_time.get(stage.name, 0.0) > 5.0:
+                    print(f"[ERROR] Pipeline stage '{stage.name}' failed: {e}")
+                    self._last_error_time[stage.name] = now
+            stage_ms[stage.name] = (time.perf_counter() - start) * 1000
+        frame["stage_ms"] = stage_ms
+        frame["latency_ms"] = (time.perf_counter() - frame["submitted"]) * 1000
+
+        with self._lock:
+            self._latencies.append(frame["latency_ms"])
+            for name, ms in stage_ms.items():
+                self._stage_latencies[name].append(ms)
+        self.frame_ready.emit(frame)
+
+    def latency_stats(self):
+        """Latency over the last LATENCY_WINDOW frames (submit -> frame_ready, ms), or None."""
+        with self._lock:
+            latencies = np.array(self._latencies)
+            stages = {name: float(np.mean(values)) for name, values in self._stage_latencies.items() if values}
+        if latencies.size == 0:
+            return None
+        return {
+            "mean_ms": float(latencies.mean()),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "max_ms": float(latencies.max()),
+            "stages": stages,
+            "queued": self._queue.qsize(),
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._latencies.clear()
+            for values in self._stage_latencies.values():
+                values.clear()
+
+    def stop(self):
+        self._queue.put(("stop", None))
+        self.wait(2000)
@@ -12,6 +12,9 @@ from enum import Enum
 from dataclasses import dataclass
 import warnings
 
+from utils import quaternion_math as qmath
+from utils.imu_filter_kernels import NUMBA_AVAILABLE, kalman_block, madgwick_block, outlier_block
+
 # === Types et énumérations ===
 class IMUDataQuality(Enum):
     """Qualité des données IMU."""
@@ -54,116 +57,44 @@ class FilterConfig:
 
 # === Utilitaires quaternion ===
 class QuaternionUtils:
-    """Utilitaires pour les opérations quaternion."""
+    """Utilitaires pour les opérations quaternion (noyaux vectorisés de utils.quaternion_math)."""
     
     @staticmethod
     def normalize(q: np.ndarray) -> np.ndarray:
         """Normalise un quaternion."""
-        norm = np.linalg.norm(q)
-        if norm < 1e-9:
-            return np.array([1.0, 0.0, 0.0, 0.0])  # Identité
-        return q / norm
+        return qmath.normalize(q)
     
     @staticmethod
     def multiply(q1: np.ndarray, q2: np.ndarray) -> np.ndarray:
         """Multiplie deux quaternions."""
-        w1, x1, y1, z1 = q1
-        w2, x2, y2, z2 = q2
-        
-        w = w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2
-        x = w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2
-        y = w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2
-        z = w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2
-        
-        return QuaternionUtils.normalize(np.array([w, x, y, z]))
+        return qmath.multiply(q1, q2)
     
     @staticmethod
     def conjugate(q: np.ndarray) -> np.ndarray:
         """Calcule le conjugué d'un quaternion."""
-        return np.array([q[0], -q[1], -q[2], -q[3]])
+        return qmath.conjugate(q)
     
     @staticmethod
     def to_euler(q: np.ndarray, degrees: bool = False) -> np.ndarray:
         """Convertit un quaternion en angles d'Euler (roll, pitch, yaw)."""
-        w, x, y, z = q
-        
-        # Roll (rotation autour de l'axe X)
-        sinr_cosp = 2 * (w * x + y * z)
-        cosr_cosp = 1 - 2 * (x * x + y * y)
-        roll = math.atan2(sinr_cosp, cosr_cosp)
-        
-        # Pitch (rotation autour de l'axe Y)
-        sinp = 2 * (w * y - z * x)
-        if abs(sinp) >= 1:
-            pitch = math.copysign(math.pi / 2, sinp)  # ±90°
-        else:
-            pitch = math.asin(sinp)
-        
-        # Yaw (rotation autour de l'axe Z)
-        siny_cosp = 2 * (w * z + x * y)
-        cosy_cosp = 1 - 2 * (y * y + z * z)
-        yaw = math.atan2(siny_cosp, cosy_cosp)
-        
-        angles = np.array([roll, pitch, yaw])
-        return np.degrees(angles) if degrees else angles
+        return qmath.to_euler(q, degrees)
     
     @staticmethod
     def from_euler(roll: float, pitch: float, yaw: float, degrees: bool = False) -> np.ndarray:
         """Convertit des angles d'Euler en quaternion."""
-        if degrees:
-            roll = math.radians(roll)
-            pitch = math.radians(pitch)
-            yaw = math.radians(yaw)
-        
-        cy = math.cos(yaw * 0.5)
-        sy = math.sin(yaw * 0.5)
-        cp = math.cos(pitch * 0.5)
-        sp = math.sin(pitch * 0.5)
-        cr = math.cos(roll * 0.5)
-        sr = math.sin(roll * 0.5)
-        
-        w = cr * cp * cy + sr * sp * sy
-        x = sr * cp * cy - cr * sp * sy
-        y = cr * sp * cy + sr * cp * sy
-        z = cr * cp * sy - sr * sp * cy
-        
-        return QuaternionUtils.normalize(np.array([w, x, y, z]))
+        return qmath.from_euler(roll, pitch, yaw, degrees)
     
     @staticmethod
     def slerp(q1: np.ndarray, q2: np.ndarray, t: float) -> np.ndarray:
         """Interpolation sphérique entre deux quaternions."""
-        # Calculer le produit scalaire
-        dot = np.dot(q1, q2)
-        
-        # Si le produit scalaire est négatif, utiliser -q2 pour prendre le chemin le plus court
-        if dot < 0.0:
-            q2 = -q2
-            dot = -dot
-        
-        # Si les quaternions sont très proches, utiliser l'interpolation linéaire
-        if dot > 0.9995:
-            result = q1 + t * (q2 - q1)
-            return QuaternionUtils.normalize(result)
-        
-        # Calculer l'angle entre les quaternions
-        theta_0 = math.acos(abs(dot))
-        sin_theta_0 = math.sin(theta_0)
-        
-        theta = theta_0 * t
-        sin_theta = math.sin(theta)
-        
-        s0 = math.cos(theta) - dot * sin_theta / sin_theta_0
-        s1 = sin_theta / sin_theta_0
-        
-        return QuaternionUtils.normalize(s0 * q1 + s1 * q2)
+        return qmath.slerp(q1, q2, t)
     
     @staticmethod
     def angular_distance(q1: np.ndarray, q2: np.ndarray) -> float:
         """Calcule la distance angulaire entre deux quaternions en radians."""
-        dot = abs(np.dot(q1, q2))
-        # Limiter la valeur pour éviter les erreurs numériques
-        dot = min(1.0, max(-1.0, dot))
-        return 2 * math.acos(dot)
+        return qmath.angular_distance(q1, q2)
+
+IDENTITY_QUATERNION = qmath.IDENTITY
 
 # === Filtres de base ===
 class IMUFilter(ABC):
@@ -231,51 +162,22 @@ class KalmanQuaternionFilter(IMUFilter):
         self.last_timestamp = None
     
     def process(self, quaternion: np.ndarray, timestamp: float) -> np.ndarray:
-        if self.last_timestamp is None:
-            self.state = QuaternionUtils.normalize(quaternion)
-            self.last_timestamp = timestamp
-            return self.state
-        
-        dt = timestamp - self.last_timestamp
-        self.last_timestamp = timestamp
-        
-        # Prédiction (modèle d'évolution simple)
-        # F = I (pas de modèle dynamique)
-        F = np.eye(4)
-        
-        # Prédiction de l'état
-        predicted_state = self.state
-        
-        # Prédiction de la covariance
-        predicted_P = F @ self.P @ F.T + self.Q * dt
-        
-        # Correction (mise à jour avec la mesure)
-        H = np.eye(4)  # Matrice d'observation
-        
-        # Innovation
-        z = QuaternionUtils.normalize(quaternion)  # Mesure normalisée
-        y = z - predicted_state  # Innovation
-        
-        # Covariance de l'innovation
-        S = H @ predicted_P @ H.T + self.R
-        
-        # Gain de Kalman
-        try:
-            K = predicted_P @ H.T @ np.linalg.inv(S)
-        except np.linalg.LinAlgError:
-            # Si la matrice n'est pas inversible, utiliser la pseudo-inverse
-            K = predicted_P @ H.T @ np.linalg.pinv(S)
-        
-        # Mise à jour de l'état
-        self.state = predicted_state + K @ y
-        self.state = QuaternionUtils.normalize(self.state)
-        
-        # Mise à jour de la covariance
-        I_KH = np.eye(4) - K @ H
-        self.P = I_KH @ predicted_P
-        
-        return self.state
-    
+        return self.process_block(np.reshape(quaternion, (1, 4)), [timestamp])[0]
+
+    def process_block(self, quaternions: np.ndarray, timestamps) -> np.ndarray:
+        """Filtre (échantillons, 4) quaternions d'un coup ; mêmes valeurs que process() en boucle."""
+        # F = H = I et Q, R diagonales : P reste p * I, seul p est propagé
+        q = self.state[None].copy()
+        p = np.array([self.P[0, 0]])
+        last_t = np.array([self.last_timestamp if self.last_timestamp is not None else 0.0])
+        initialized = np.array([self.last_timestamp is not None])
+        out = kalman_block(np.asarray(quaternions)[None], np.asarray(timestamps)[None], q, p, last_t,
+                           initialized, self.process_noise, self.measurement_noise)
+        self.state = q[0]
+        self.P = np.eye(4) * p[0]
+        self.last_timestamp = float(last_t[0])
+        return out[0]
+
     def reset(self):
         self.state = np.array([1.0, 0.0, 0.0, 0.0])
         self.P = np.eye(4) * 1.0
@@ -302,83 +204,26 @@ class MadgwickFilter(IMUFilter):
             gyro: Données gyroscope [wx, wy, wz] (optionnel)
             accel: Données accéléromètre [ax, ay, az] (optionnel)
         """
-        if self.last_timestamp is None:
-            self.q = QuaternionUtils.normalize(quaternion)
-            self.last_timestamp = timestamp
-            return self.q
-        
-        dt = timestamp - self.last_timestamp
-        self.last_timestamp = timestamp
-        
-        # Si on a des données gyroscope et accéléromètre, utiliser l'algorithme complet
-        if gyro is not None and accel is not None:
-            self.q = self._madgwick_ahrs_update(self.q, gyro, accel, dt)
-        else:
-            # Sinon, utiliser seulement le quaternion de mesure avec lissage
-            self.q = QuaternionUtils.slerp(self.q, quaternion, self.beta * dt * self.sample_rate)
-        
-        return self.q
-    
-    def _madgwick_ahrs_update(self, q: np.ndarray, gyro: np.ndarray, 
-                             accel: np.ndarray, dt: float) -> np.ndarray:
-        """Implémentation de l'algorithme Madgwick AHRS."""
-        q0, q1, q2, q3 = q
-        gx, gy, gz = gyro
-        ax, ay, az = accel
-        
-        # Normaliser l'accéléromètre
-        norm = math.sqrt(ax*ax + ay*ay + az*az)
-        if norm == 0:
-            return q  # Éviter division par zéro
-        ax /= norm
-        ay /= norm
-        az /= norm
-        
-        # Fonction objective et gradient
-        f1 = 2*(q1*q3 - q0*q2) - ax
-        f2 = 2*(q0*q1 + q2*q3) - ay
-        f3 = 2*(0.5 - q1*q1 - q2*q2) - az
-        
-        J_11or24 = 2*q2
-        J_12or23 = 2*q3
-        J_13or22 = 2*q0
-        J_14or21 = 2*q1
-        J_32 = 2*J_14or21
-        J_33 = 2*J_11or24
-        
-        # Gradient
-        step = np.array([
-            J_13or22*f2 - J_12or23*f1,
-            J_12or23*f2 + J_13or22*f1 - J_32*f3,
-            J_11or24*f1 + J_33*f3 - J_13or22*f2,
-            J_14or21*f1 + J_11or24*f2
-        ])
-        
-        # Normaliser le gradient
-        norm = math.sqrt(step[0]*step[0] + step[1]*step[1] + step[2]*step[2] + step[3]*step[3])
-        if norm != 0:
-            step /= norm
-        
-        # Intégration du gyroscope
-        qDot1 = 0.5 * (-q1*gx - q2*gy - q3*gz)
-        qDot2 = 0.5 * (q0*gx + q2*gz - q3*gy)
-        qDot3 = 0.5 * (q0*gy - q1*gz + q3*gx)
-        qDot4 = 0.5 * (q0*gz + q1*gy - q2*gx)
-        
-        # Appliquer la correction du gradient
-        qDot1 -= self.beta * step[0]
-        qDot2 -= self.beta * step[1]
-        qDot3 -= self.beta * step[2]
-        qDot4 -= self.beta * step[3]
-        
-        # Intégrer pour obtenir le quaternion
-        q0 += qDot1 * dt
-        q1 += qDot2 * dt
-        q2 += qDot3 * dt
-        q3 += qDot4 * dt
-        
-        return QuaternionUtils.normalize(np.array([q0, q1, q2, q3]))
-    
+        return self.process_block(
+            np.reshape(quaternion, (1, 4)), [timestamp],
+            None if gyro is None else np.reshape(gyro, (1, 3)),
+            None if accel is None else np.reshape(accel, (1, 3)))[0]
+
+    def process_block(self, quaternions: np.ndarray, timestamps,
+                      gyro: Optional[np.ndarray] = None,
+                      accel: Optional[np.ndarray] = None) -> np.ndarray:
+        """Filtre (échantillons, 4) quaternions d'un coup (gyro/accel : (échantillons, 3))."""
+        q = self.q[None].copy()
+        last_t = np.array([self.last_timestamp if self.last_timestamp is not None else 0.0])
+        initialized = np.array([self.last_timestamp is not None])
+        out = madgwick_block(np.asarray(quaternions)[None], np.asarray(timestamps)[None], q, last_t,
+                             initialized, self.beta, self.sample_rate,
+                             None if gyro is None else np.asarray(gyro)[None],
+                             None if accel is None else np.asarray(accel)[None])
+        self.q = q[0]
+        self.last_timestamp = float(last_t[0])
+        return out[0]
+
     def reset(self):
         self.q = np.array([1.0, 0.0, 0.0, 0.0])
         self.last_timestamp = None
@@ -460,45 +305,327 @@ class AdaptiveFilter(IMUFilter):
 
 # === Détecteur d'anomalies ===
 class OutlierDetector:
-    """Détecteur d'anomalies pour les données IMU."""
-    
-    def __init__(self, window_size: int = 20, threshold: float = 3.0):
+    """
+    Détecteur d'anomalies pour les données IMU, pour un ou plusieurs capteurs (une ligne
+    par capteur), sur un échantillon ou un bloc (capteurs, échantillons) à la fois.
+
+    Les derniers quaternions acceptés sont gardés dans un anneau NumPy ; la distance d'un
+    échantillon au plus proche des `recent` derniers acceptés vient de produits scalaires
+    sur tout le bloc. Un échantillon est aberrant quand sa distance dépasse la moyenne des
+    window_size dernières distances acceptées de plus de threshold écarts-types et d'au
+    moins min_jump. Un bloc donne les mêmes décisions qu'échantillon par échantillon.
+
+    Après max_rejects rejets consécutifs, le capteur a réellement bougé (début de mouvement
+    après un repos, nouvelle pose) : son historique est réamorcé sur l'échantillon courant
+    au lieu de rester figé sur les statistiques de repos.
+    """
+
+    def __init__(self, window_size: int = 20, threshold: float = 3.0, n_sensors: int = 1,
+                 recent: int = 10, min_jump: float = math.radians(2.0), max_rejects: int = 5):
         self.window_size = window_size
         self.threshold = threshold
-        self.history = deque(maxlen=window_size)
-        
+        self.n_sensors = n_sensors
+        self.recent = min(recent, window_size)
+        # En dessous de ce saut (rad), jamais d'anomalie : évite de bloquer un capteur immobile
+        self.min_jump = min_jump
+        self.max_rejects = max_rejects
+        self.reset()
+
+    def reset(self, rows=None):
+        """Vide l'historique de tous les capteurs, ou seulement des lignes rows."""
+        if rows is None:
+            n, w = self.n_sensors, self.window_size
+            self.history = np.zeros((n, w, 4))
+            self.history_len = np.zeros(n, dtype=np.int64)
+            self.history_pos = np.zeros(n, dtype=np.int64)
+            self.distances = np.zeros((n, w))
+            self.distance_len = np.zeros(n, dtype=np.int64)
+            self.distance_pos = np.zeros(n, dtype=np.int64)
+            self.mean = np.zeros(n)
+            self.m2 = np.zeros(n)
+            self.rejects = np.zeros(n, dtype=np.int64)
+            return
+        for array in (self.history, self.history_len, self.history_pos, self.distances,
+                      self.distance_len, self.distance_pos, self.mean, self.m2, self.rejects):
+            array[rows] = 0
+
     def is_outlier(self, quaternion: np.ndarray) -> bool:
-        """Détermine si un quaternion est une valeur aberrante."""
-        if len(self.history) < self.window_size // 2:
-            self.history.append(quaternion)
-            return False
-        
-        # Calculer les distances angulaires avec l'historique récent
-        distances = []
-        for hist_quat in list(self.history)[-10:]:  # Utiliser les 10 dernières mesures
-            dist = QuaternionUtils.angular_distance(quaternion, hist_quat)
-            distances.append(dist)
-        
-        if not distances:
-            return False
-        
-        # Calculer la moyenne et l'écart-type
-        mean_dist = np.mean(distances)
-        std_dist = np.std(distances)
-        
-        # Vérifier si c'est un outlier
-        current_dist = min(distances)  # Distance minimale
-        is_outlier = False
-        
-        if std_dist > 0:
-            z_score = (current_dist - mean_dist) / std_dist
-            is_outlier = abs(z_score) > self.threshold
-        
-        # Ajouter à l'historique seulement si ce n'est pas un outlier
-        if not is_outlier:
-            self.history.append(quaternion)
-        
-        return is_outlier
+        """Détermine si un quaternion est une valeur aberrante (capteur unique)."""
+        q = np.asarray(quaternion, dtype=np.float64)[None]
+        return bool(self.detect(q)[0])
+
+    def detect(self, q: np.ndarray, active: Optional[np.ndarray] = None) -> np.ndarray:
+        """Teste un quaternion par capteur ((n_sensors, 4)) ; renvoie le masque des valeurs aberrantes."""
+        return self.detect_block(q[:, None], None if active is None else active[:, None])[:, 0]
+
+    def detect_block(self, q: np.ndarray, active: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Teste un bloc (n_sensors, échantillons, 4) ; renvoie le masque (n_sensors, échantillons).
+
+        Chaque échantillon est comparé aux statistiques des window_size distances acceptées
+        qui le précèdent : le masque est celui du traitement échantillon par échantillon.
+        Avec Numba, une boucle compilée ; sinon, des passes NumPy par tranches.
+        """
+        n, count = q.shape[:2]
+        if active is None:
+            active = np.ones((n, count), dtype=bool)
+        if NUMBA_AVAILABLE:
+            # Boucle compilée, échantillon par échantillon (voir imu_filter_kernels)
+            outlier = outlier_block(q, active, self.history, self.history_len, self.history_pos,
+                                    self.distances, self.distance_len, self.distance_pos,
+                                    self.rejects, self.threshold, self.recent, self.min_jump,
+                                    self.max_rejects)
+            self._update_stats()
+            return outlier
+        # En NumPy, par tranches de window_size : moins de passes par tranche
+        return np.concatenate([self._detect_chunk(q[:, i:i + self.window_size],
+                                                  active[:, i:i + self.window_size])
+                               for i in range(0, count, self.window_size)], axis=1)
+
+    def _detect_chunk(self, q, active):
+        """
+        detect_block en NumPy. Un réamorçage coupe le bloc : références, statistiques et
+        préchauffage repartent de l'échantillon réamorcé, et le bloc est refait à partir de
+        là (voir _flag_block).
+        """
+        n, count = q.shape[:2]
+        rows = np.arange(n)[:, None]
+        columns = np.arange(count)
+        reseeds = np.zeros((n, count), dtype=bool)
+        while True:
+            outlier, references, distance, accepted_before = self._flag_block(q, active, reseeds)
+
+            # Rejets consécutifs (échantillons actifs seulement), comptés depuis le bloc précédent
+            last_accept = _last_index(active & ~outlier)
+            rejected = np.cumsum(outlier, axis=1)
+            run = rejected - np.where(last_accept >= 0, rejected[rows, np.maximum(last_accept, 0)],
+                                      -self.rejects[:, None])
+            hit = outlier & (run >= self.max_rejects)
+            if not hit.any():
+                break
+            # Le premier de chaque ligne est réamorcé (accepté), la suite du bloc est refaite
+            first = hit.argmax(axis=1)
+            hit_rows = np.nonzero(hit.any(axis=1))[0]
+            reseeds[hit_rows, first[hit_rows]] = True
+        self.rejects = run[:, -1]
+
+        # Historique des lignes réamorcées : à partir du dernier réamorçage seulement
+        last_reseed = reseeds.shape[1] - 1 - np.argmax(reseeds[:, ::-1], axis=1)
+        reseeded = reseeds.any(axis=1)
+        kept = active & ~outlier & (columns >= np.where(reseeded, last_reseed, 0)[:, None])
+        if not np.array_equal(kept, references):
+            _, _, distance, accepted_before = self._flag_block(q, active, reseeds, kept)
+        self.reset(np.nonzero(reseeded)[0])
+
+        # Seules les valeurs non aberrantes entrent dans l'historique et les statistiques
+        self._push(self.history, self.history_len, self.history_pos, q, kept)
+        self._push(self.distances, self.distance_len, self.distance_pos, distance,
+                   kept & (accepted_before > 0))
+        self._update_stats()
+        return outlier
+
+    def _update_stats(self):
+        """Moyenne et somme des carrés des écarts (m2) des distances de l'anneau."""
+        k = np.arange(self.window_size)
+        valid = ((k - self.distance_pos[:, None]) % self.window_size
+                 >= self.window_size - self.distance_len[:, None])
+        self.mean = np.where(valid, self.distances, 0.0).sum(axis=1) / np.maximum(self.distance_len, 1)
+        self.m2 = np.where(valid, (self.distances - self.mean[:, None]) ** 2, 0.0).sum(axis=1)
+
+    def _flag_block(self, q, active, reseeds, references=None):
+        """
+        Valeurs aberrantes du bloc pour des réamorçages donnés. Les valeurs aberrantes d'une
+        passe ne servent ni de référence ni aux statistiques de la suivante, jusqu'à ce que
+        le masque ne change plus. Chaque décision ne dépend que des précédentes : chaque
+        passe fige au moins un échantillon de plus, et le masque stable est celui du
+        traitement échantillon par échantillon. Avec references, une seule passe.
+        """
+        segment = _last_index(reseeds)
+        single_pass = references is not None
+        candidates = references if single_pass else active
+        for _ in range(1 if single_pass else q.shape[1] + 1):
+            distance, accepted_before = self._distances(q, candidates, segment)
+            mean, std = self._rolling_stats(distance, candidates & (accepted_before > 0), segment)
+            z_score = (distance - mean) / np.where(std > 0, std, 1.0)
+            outlier = (active & ~reseeds & (accepted_before >= self.window_size // 2) & (std > 0)
+                       & (z_score > self.threshold) & (distance - mean > self.min_jump))
+            references = candidates
+            candidates = active & ~outlier
+            if np.array_equal(candidates, references):
+                break
+        return outlier, references, distance, accepted_before
+
+    def _distances(self, q, accepted, segment):
+        """
+        Distance de chaque échantillon au plus proche des `recent` quaternions acceptés avant
+        lui dans son segment (fin de l'historique s'il n'y a pas eu de réamorçage, puis
+        échantillons du bloc marqués accepted), et nombre d'acceptés avant lui.
+        """
+        n, count = accepted.shape
+        recent = self.recent
+        size = recent + count
+        rows = np.arange(n)[:, None]
+        k = np.arange(recent)[::-1]
+        tail = self.history[rows, (self.history_pos[:, None] - 1 - k) % self.window_size]
+        sequence = np.concatenate([tail, q], axis=1).reshape(-1, 4)
+        is_reference = np.concatenate([k < self.history_len[:, None], accepted], axis=1)
+
+        # Chaîne des précédents acceptés (recent sauts), en index à plat : lignes mises bout à bout
+        offset = rows * size
+        last = _last_index(is_reference)
+        previous = np.where(last >= 0, last + offset, -1)
+        previous = np.concatenate([np.full((n, 1), -1), previous[:, :-1]], axis=1).ravel()
+        lowest = offset + np.where(segment >= 0, recent + segment, 0)
+        chain = np.empty((recent, n, count), dtype=np.int64)
+        current = previous.reshape(n, size)[:, recent:]
+        for r in range(recent):
+            current = np.where(current >= lowest, current, -1)
+            chain[r] = current
+            current = previous.take(np.maximum(current, 0))
+        references = sequence.take(np.maximum(chain, 0).ravel(), axis=0).reshape(recent, n, count, 4)
+        dots = np.abs(np.einsum('rijk,ijk->rij', references, q))
+        best = np.where(chain >= 0, dots, 0.0).max(axis=0)
+        distance = 2 * np.arccos(np.minimum(best, 1.0))
+
+        before = np.cumsum(accepted, axis=1) - accepted
+        accepted_before = np.where(segment >= 0, before - before[rows, np.maximum(segment, 0)],
+                                   self.history_len[:, None] + before)
+        return distance, accepted_before
+
+    def _rolling_stats(self, distance, accepted, segment):
+        """Moyenne et écart-type des window_size distances acceptées avant chaque échantillon."""
+        n, count = accepted.shape
+        window = self.window_size
+        size = window + count
+        rows = np.arange(n)[:, None]
+        k = np.arange(window)[::-1]
+        ring = (self.distance_pos[:, None] - 1 - k) % window
+        values = np.concatenate([self.distances[rows, ring], distance], axis=1)
+        mask = np.concatenate([k < self.distance_len[:, None], accepted], axis=1)
+        values = np.where(mask, values, 0.0)
+
+        # Sommes cumulées jusqu'à chaque position et position de la m-ième distance acceptée
+        sums = np.zeros((2, n, size + 1))
+        np.cumsum(values, axis=1, out=sums[0, :, 1:])
+        np.cumsum(values * values, axis=1, out=sums[1, :, 1:])
+        rank = np.cumsum(mask, axis=1)
+        end_of_rank = np.zeros((n, size + 1), dtype=np.int64)
+        end_of_rank[np.nonzero(mask)[0], rank[mask]] = (np.nonzero(mask)[1] + 1)
+        offset = rows * (size + 1)
+
+        upper = rank[:, window - 1:-1]
+        lower = upper - window
+        if (segment >= 0).any():
+            lower = np.maximum(lower, np.where(segment >= 0, rank[rows, window - 1 + np.maximum(segment, 0)], 0))
+        lower = np.maximum(lower, 0)
+        upper_end = np.arange(window, size) + offset
+        lower_end = end_of_rank.ravel().take(lower + offset) + offset
+        total = np.maximum(upper - lower, 1)
+        mean = (sums[0].ravel().take(upper_end) - sums[0].ravel().take(lower_end)) / total
+        variance = (sums[1].ravel().take(upper_end) - sums[1].ravel().take(lower_end)) / total - mean ** 2
+        return mean, np.sqrt(np.maximum(variance, 0.0))
+
+    def _push(self, ring, length, position, values, mask):
+        """Ajoute values[mask] (dans l'ordre) à l'anneau ; les window_size plus récentes sont gardées."""
+        n, count = mask.shape
+        window = self.window_size
+        rows = np.arange(n)[:, None]
+        k = np.arange(window)[::-1]
+        old = ring[rows, (position[:, None] - 1 - k) % window]
+        combined = np.concatenate([old, values], axis=1)
+        keep = np.concatenate([k < length[:, None], mask], axis=1)
+        # Les window_size dernières positions gardées, de la plus ancienne à la plus récente
+        order = np.sort(np.where(keep, np.arange(window + count), -1), axis=1)[:, -window:]
+        ring[:] = np.where((order >= 0).reshape(order.shape + (1,) * (ring.ndim - 2)),
+                           combined[rows, np.maximum(order, 0)], 0.0)
+        length[:] = np.minimum(keep.sum(axis=1), window)
+        position[:] = 0
+
+# Codes qualité renvoyés par IMUProcessor.process_batch (index dans QUALITY_LEVELS)
+QUALITY_LEVELS = (IMUDataQuality.EXCELLENT, IMUDataQuality.GOOD, IMUDataQuality.DEGRADED,
+                  IMUDataQuality.POOR, IMUDataQuality.LOST)
+QUALITY_CODES = {quality: code for code, quality in enumerate(QUALITY_LEVELS)}
+_GOOD = QUALITY_CODES[IMUDataQuality.GOOD]
+_DEGRADED = QUALITY_CODES[IMUDataQuality.DEGRADED]
+_POOR = QUALITY_CODES[IMUDataQuality.POOR]
+_LOST = QUALITY_CODES[IMUDataQuality.LOST]
+
+
+class _BatchState:
+    """
+    État de process_batch pour un groupe de capteurs : une ligne par capteur dans chaque
+    tableau, avec la même logique que les objets par capteur de process_imu_data
+    (OutlierDetector, filtres, dernière lecture valide).
+    """
+
+    ADAPTIVE_HISTORY = 50  # Comme AdaptiveFilter.quality_history
+
+    def __init__(self, sensor_ids, threshold: float = 3.0, window_size: int = 20):
+        n = len(sensor_ids)
+        identity = np.tile(IDENTITY_QUATERNION, (n, 1))
+        self.sensor_ids = tuple(sensor_ids)
+        self.threshold = threshold
+        self.rows = {sensor_id: i for i, sensor_id in enumerate(self.sensor_ids)}
+
+        # Pertes de signal et dernière lecture valide
+        self.lost_counters = np.zeros(n, dtype=np.int64)
+        self.last_good = identity.copy()
+        self.last_good_time = np.zeros(n)
+        self.has_good = np.zeros(n, dtype=bool)
+
+        # Valeurs aberrantes : même détecteur que process_imu_data, une ligne par capteur
+        self.outliers = OutlierDetector(window_size, threshold, n_sensors=n)
+
+        # Filtre principal : passe-bas, Kalman ou Madgwick
+        self.q = identity.copy()
+        self.initialized = np.zeros(n, dtype=bool)
+        self.last_t = np.zeros(n)
+        self.p = np.ones(n)  # Covariance de Kalman p * I
+
+        # Filtre adaptatif : passe-bas de secours et historique de qualité
+        self.backup_q = identity.copy()
+        self.backup_initialized = np.zeros(n, dtype=bool)
+        self.backup_last_t = np.zeros(n)
+        self.quality_history = np.zeros((n, self.ADAPTIVE_HISTORY))
+        self.quality_count = np.zeros(n, dtype=np.int64)
+        self.adaptive_last_good = identity.copy()
+        self.degraded_mode = np.zeros(n, dtype=bool)
+
+    def reset_rows(self, rows):
+        fresh = _BatchState(self.sensor_ids, self.threshold, self.outliers.window_size)
+        for name, value in vars(fresh).items():
+            if isinstance(value, np.ndarray):
+                getattr(self, name)[rows] = value[rows]
+        self.outliers.reset(rows)
+
+
+def _low_pass_alpha(cutoff_freq: float, sample_rate: float) -> float:
+    dt = 1.0 / sample_rate
+    rc = 1.0 / (2.0 * math.pi * cutoff_freq)
+    return dt / (dt + rc)
+
+
+def _last_index(mask: np.ndarray) -> np.ndarray:
+    """Pour chaque échantillon, index du dernier échantillon marqué jusqu'à lui inclus (-1 sinon)."""
+    return np.maximum.accumulate(np.where(mask, np.arange(mask.shape[1]), -1), axis=1)
+
+
+def _masked_block(mask, run, z, *arrays, rows=None):
+    """
+    Passe les échantillons marqués de chaque ligne à run(lignes, z, *arrays) en un seul bloc
+    par nombre d'échantillons marqués (les autres ne font pas avancer le filtre) ; renvoie
+    (lignes, échantillons, 4) avec NaN hors du masque. rows : ligne d'état de chaque ligne.
+    """
+    rows = np.arange(len(mask)) if rows is None else rows
+    result = np.full(z.shape, np.nan)
+    counts = mask.sum(axis=1)
+    for count in np.unique(counts[counts > 0]):
+        group = np.nonzero(counts == count)[0]
+        columns = np.nonzero(mask[group])[1].reshape(len(group), count)
+        index = (group[:, None], columns)
+        result[index] = run(rows[group], z[index], *(array[index] for array in arrays))
+    return result
+
 
 # === Processeur principal ===
 class IMUProcessor:
@@ -512,6 +639,7 @@ class IMUProcessor:
         self.outlier_detectors = {}
         self.signal_lost_counters = {}
         self.last_good_readings = {}
+        self._batch_state = None  # État vectorisé de process_batch
         
         # Statistiques
         self.stats = {
@@ -633,6 +761,236 @@ class IMUProcessor:
         
         return reading
     
+    def process_batch(self, quaternions: np.ndarray, timestamps: np.ndarray = None,
+                      sensor_ids: Optional[List[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Traite un bloc d'échantillons de plusieurs IMUs en une fois.
+
+        Même chaîne que process_imu_data (validité, normalisation, valeurs aberrantes,
+        filtrage) sur tout le bloc : les masques sont calculés d'un coup et chaque filtre
+        reçoit le bloc entier (voir imu_filter_kernels).
+
+        Args:
+            quaternions: (capteurs, échantillons, 4) en [w, x, y, z] ; (capteurs, 4) pour un seul échantillon
+            timestamps: (échantillons,) ou (capteurs, échantillons) en secondes ; si None, le bloc
+                se termine maintenant, au pas de config.sample_rate
+            sensor_ids: IDs des capteurs dans l'ordre des lignes (1..N par défaut)
+
+        Returns:
+            (quaternions filtrés de même forme, codes qualité int8 : index dans QUALITY_LEVELS)
+        """
+        q = np.asarray(quaternions, dtype=np.float64)
+        single = q.ndim == 2
+        if single:
+            q = q[:, None]
+        if q.ndim != 3 or q.shape[2] != 4:
+            raise ValueError(f"Expected a (sensors, samples, 4) array, got {np.shape(quaternions)}")
+        n_sensors, n_samples = q.shape[:2]
+
+        if sensor_ids is None:
+            sensor_ids = range(1, n_sensors + 1)
+        sensor_ids = tuple(sensor_ids)
+        if len(sensor_ids) != n_sensors:
+            raise ValueError(f"{len(sensor_ids)} sensor ids for {n_sensors} sensors")
+        if self._batch_state is None or self._batch_state.sensor_ids != sensor_ids:
+            self._batch_state = _BatchState(sensor_ids, self.config.outlier_threshold)
+        state = self._batch_state
+
+        if timestamps is None:
+            end = time.time()
+            timestamps = end - (n_samples - 1 - np.arange(n_samples)) / self.config.sample_rate
+        times = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), (n_sensors, n_samples))
+        rows = np.arange(n_sensors)[:, None]
+
+        # Validité et normalisation de tout le bloc en une seule passe
+        finite = np.isfinite(q).all(axis=2)
+        norms = np.linalg.norm(np.where(finite[..., None], q, 0.0), axis=2)
+        valid = finite & (norms >= 1e-6) & (norms <= 10.0)
+        normalized = np.where(valid[..., None], q / np.where(valid, norms, 1.0)[..., None], IDENTITY_QUATERNION)
+
+        outlier = state.outliers.detect_block(normalized, valid)
+        good = valid & ~outlier
+
+        # Valeur aberrante : on garde la dernière lecture valide si elle a moins d'une seconde
+        last = _last_index(good)
+        before = last >= 0
+        index = np.maximum(last, 0)
+        last_time = np.where(before, times[rows, index], state.last_good_time[:, None])
+        has_good = before | state.has_good[:, None]
+        held = outlier & has_good & (times - last_time < 1.0)
+
+        # Données invalides : pertes consécutives depuis le dernier échantillon valide non aberrant
+        invalid_count = np.cumsum(~valid, axis=1)
+        lost_run = invalid_count - np.where(before, invalid_count[rows, index], -state.lost_counters[:, None])
+        lost = ~valid & (lost_run > 10)
+
+        result = self._batch_filter(state, normalized, times, valid, held, good)
+
+        # Invalide : dernière sortie valide, puis identité après 10 pertes
+        last_output = np.where(before[..., None], result[rows, index], state.last_good[:, None])
+        filtered = np.where(valid[..., None], result,
+                            np.where(has_good[..., None], last_output, IDENTITY_QUATERNION))
+        filtered[lost] = IDENTITY_QUATERNION
+        codes = np.where(valid, np.where(outlier, np.where(held, _DEGRADED, _POOR), _GOOD),
+                         np.where(lost, _LOST, _POOR)).astype(np.int8)
+
+        state.lost_counters = lost_run[:, -1]
+        state.last_good = last_output[:, -1].copy()
+        state.last_good_time = last_time[:, -1].copy()
+        state.has_good = has_good[:, -1].copy()
+
+        n_outliers = int(outlier.sum())
+        self.stats['total_readings'] += n_sensors * n_samples
+        self.stats['outliers_detected'] += n_outliers
+        self.stats['signal_losses'] += int(lost.sum())
+        if n_outliers:
+            print(f"[IMU] {n_outliers} valeur(s) aberrante(s) dans le bloc, dernière valeur valide utilisée")
+
+        if single:
+            return filtered[:, 0], codes[:, 0]
+        return filtered, codes
+
+    def _batch_filter(self, state: _BatchState, z: np.ndarray, t: np.ndarray,
+                      active: np.ndarray, held: np.ndarray, good: np.ndarray) -> np.ndarray:
+        """
+        Filtre configuré sur les échantillons actifs du bloc ; renvoie (N, T, 4), NaN ailleurs.
+        Une valeur retenue (held) est mesurée comme la dernière sortie des échantillons good,
+        comme dans process_imu_data ; pour un filtre seul, c'est son estimation courante.
+        """
+        config = self.config
+        filter_type = config.filter_type
+        if filter_type == FilterType.KALMAN:
+            return _masked_block(active, lambda rows, *block: self._batch_kalman(state, rows, *block),
+                                 z, t, held)
+        if filter_type == FilterType.MADGWICK:
+            return _masked_block(active, lambda rows, *block: self._batch_madgwick(state, rows, *block),
+                                 z, t, held)
+        if filter_type == FilterType.ADAPTIVE:
+            return _masked_block(active, lambda rows, *block: self._batch_adaptive(state, rows, *block),
+                                 z, t, held, good)
+
+        cutoff = 1000.0 if filter_type == FilterType.NONE else config.cutoff_frequency
+        alpha = _low_pass_alpha(cutoff, config.sample_rate)
+        return _masked_block(active, lambda rows, zs, hs: self._batch_low_pass(
+            rows, zs, state.q, state.last_t, state.initialized, alpha, hs), z, held)
+
+    @staticmethod
+    def _batch_low_pass(rows, z, q, count, initialized, alpha, hold=None):
+        """
+        LowPassFilter.process sur les lignes rows : le lissage SLERP de madgwick_block avec un
+        pas constant (count compte les échantillons, beta * dt * sample_rate = alpha).
+        """
+        q_rows, count_rows, initialized_rows = q[rows], count[rows], initialized[rows]
+        steps = count_rows[:, None] + np.arange(1, z.shape[1] + 1)
+        out = madgwick_block(z, steps, q_rows, count_rows, initialized_rows, alpha, 1.0, hold=hold)
+        q[rows], count[rows], initialized[rows] = q_rows, count_rows, initialized_rows
+        return out
+
+    def _batch_madgwick(self, state, rows, z, t, hold=None):
+        """MadgwickFilter.process sans gyroscope/accéléromètre (lissage SLERP)."""
+        q, last_t, initialized = state.q[rows], state.last_t[rows], state.initialized[rows]
+        out = madgwick_block(z, t, q, last_t, initialized, self.config.beta, self.config.sample_rate,
+                             hold=hold)
+        state.q[rows], state.last_t[rows], state.initialized[rows] = q, last_t, initialized
+        return out
+
+    def _batch_kalman(self, state, rows, z, t, hold=None):
+        """KalmanQuaternionFilter.process en bloc sur les lignes rows."""
+        q, p, last_t, initialized = state.q[rows], state.p[rows], state.last_t[rows], state.initialized[rows]
+        out = kalman_block(z, t, q, p, last_t, initialized, self.config.kalman_q, self.config.kalman_r,
+                           hold)
+        state.q[rows], state.p[rows] = q, p
+        state.last_t[rows], state.initialized[rows] = last_t, initialized
+        return out
+
+    def _batch_adaptive(self, state, rows, z, t, held, good):
+        """
+        AdaptiveFilter.process : Madgwick ou passe-bas de secours selon la qualité moyenne des
+        ADAPTIVE_HISTORY derniers échantillons. Le saut de plus de 30° est mesuré par rapport
+        au dernier résultat de bonne qualité, et une valeur retenue est mesurée comme la
+        dernière sortie good : les deux dépendent des modes choisis avant. La première passe
+        mesure une valeur retenue comme l'estimation du filtre actif (la dernière sortie good,
+        sauf changement de mode entre les deux) ; le bloc est refiltré avec les mesures
+        explicites jusqu'à ce que mesures et qualités ne changent plus (chaque passe fige au
+        moins un échantillon de plus).
+        """
+        n, count = z.shape[:2]
+        index = np.arange(n)[:, None]
+        seen = (state.quality_count[rows, None] + np.arange(count)) > 0
+        names = ('q', 'last_t', 'initialized', 'backup_q', 'backup_last_t', 'backup_initialized')
+        saved = {name: getattr(state, name)[rows] for name in names}
+
+        def last_output(values, mask, carry):
+            """Valeur de values au dernier échantillon de mask jusqu'à chaque échantillon (carry avant)."""
+            last = _last_index(mask)
+            return np.where((last >= 0)[..., None], values[index, np.maximum(last, 0)], carry[:, None])
+
+        # Premières estimations : la mesure précédente, la dernière mesure good
+        reference = np.concatenate([state.adaptive_last_good[rows, None], z[:, :-1]], axis=1)
+        source = np.where(held[..., None], last_output(z, good, state.last_good[rows]), z)
+        hold = held
+        previous = None
+        for _ in range(count + 1):
+            norm = np.linalg.norm(source, axis=2)
+            jump = qmath.angular_distance(source, reference) > math.radians(30)
+            quality = np.where(seen & jump, 0.2, 1.0 - np.minimum(1.0, np.abs(norm - 1.0) * 10))
+            quality = np.where((np.abs(norm - 1.0) > 0.1) | ~np.isfinite(source).all(axis=2), 0.0, quality)
+            if previous is not None:
+                # À l'arrondi près : le filtre renormalise l'estimation mesurée
+                if (np.array_equal(quality, previous[0])
+                        and np.allclose(source, previous[1], rtol=0.0, atol=1e-12)):
+                    break
+                for name in names:
+                    getattr(state, name)[rows] = saved[name]
+                hold = np.zeros_like(held)
+            avg_quality, degraded, result = self._adaptive_pass(state, rows, source, t, quality, hold)
+            # Valeur retenue mesurée par hold : l'estimation, c'est-à-dire la sortie
+            previous = (quality, np.where(hold[..., None], result, source))
+
+            # Dernier résultat de qualité > 0.5 avant chaque échantillon
+            carry = state.adaptive_last_good[rows]
+            reference = np.concatenate([carry[:, None], last_output(result, quality > 0.5, carry)[:, :-1]], axis=1)
+            source = np.where(held[..., None], last_output(result, good, state.last_good[rows]), z)
+        quality = previous[0]
+
+        history = state.ADAPTIVE_HISTORY
+        quality_count = state.quality_count[rows]
+        tail = np.arange(max(0, count - history), count)
+        state.quality_history[rows[:, None], (quality_count[:, None] + tail) % history] = quality[:, tail]
+        state.quality_count[rows] += count
+
+        was_degraded = np.concatenate([state.degraded_mode[rows, None], degraded[:, :-1]], axis=1)
+        for i, j in zip(*np.nonzero(degraded & ~was_degraded)):
+            print(f"[IMU] Basculement en mode dégradé (qualité: {avg_quality[i, j]:.3f})")
+        for i, j in zip(*np.nonzero(~degraded & was_degraded)):
+            print(f"[IMU] Retour en mode normal (qualité: {avg_quality[i, j]:.3f})")
+        state.degraded_mode[rows] = degraded[:, -1]
+        state.adaptive_last_good[rows] = last_output(result, quality > 0.5, state.adaptive_last_good[rows])[:, -1]
+        return result
+
+    def _adaptive_pass(self, state, rows, z, t, quality, hold):
+        """Moyenne glissante de la qualité, mode de chaque échantillon et filtrage du bloc."""
+        config = self.config
+        history = state.ADAPTIVE_HISTORY
+        n, count = z.shape[:2]
+        # Anneau précédent (du plus ancien au plus récent) puis le bloc
+        quality_count = state.quality_count[rows]
+        k = np.arange(history)
+        ring = state.quality_history[rows[:, None], (quality_count[:, None] + k) % history]
+        ring = np.where(k >= history - np.minimum(quality_count, history)[:, None], ring, 0.0)
+        sums = np.cumsum(np.concatenate([np.zeros((n, 1)), ring, quality], axis=1), axis=1)
+        window_sum = sums[:, history + 1:] - sums[:, 1:count + 1]
+        avg_quality = window_sum / np.minimum(quality_count[:, None] + np.arange(1, count + 1), history)
+        degraded = avg_quality < config.adaptive_threshold
+
+        alpha = _low_pass_alpha(config.cutoff_frequency, config.sample_rate)
+        backup = _masked_block(degraded, lambda sub, zs, hs: self._batch_low_pass(
+            sub, zs, state.backup_q, state.backup_last_t, state.backup_initialized, alpha, hs),
+                               z, hold, rows=rows)
+        primary = _masked_block(~degraded, lambda sub, *block: self._batch_madgwick(state, sub, *block),
+                                z, t, hold, rows=rows)
+        return avg_quality, degraded, np.where(degraded[..., None], backup, primary)
+
     def _is_valid_quaternion(self, quaternion: np.ndarray) -> bool:
         """Vérifie si un quaternion est valide."""
         if quaternion is None or len(quaternion) != 4:
@@ -688,28 +1046,7 @@ class IMUProcessor:
     
     def _quaternion_to_rotation_matrix(self, q: np.ndarray) -> np.ndarray:
         """Convertit un quaternion en matrice de rotation 3x3."""
-        w, x, y, z = q
-        
-        # Première ligne
-        r00 = 1 - 2*(y*y + z*z)
-        r01 = 2*(x*y - w*z)
-        r02 = 2*(x*z + w*y)
-        
-        # Deuxième ligne  
-        r10 = 2*(x*y + w*z)
-        r11 = 1 - 2*(x*x + z*z)
-        r12 = 2*(y*z - w*x)
-        
-        # Troisième ligne
-        r20 = 2*(x*z - w*y)
-        r21 = 2*(y*z + w*x)
-        r22 = 1 - 2*(x*x + y*y)
-        
-        return np.array([
-            [r00, r01, r02],
-            [r10, r11, r12],
-            [r20, r21, r22]
-        ])
+        return qmath.to_matrix(q)
     
     def _quaternion_to_axis_angle(self, q: np.ndarray) -> Dict[str, Any]:
         """Convertit un quaternion en représentation axe-angle."""
@@ -743,9 +1080,13 @@ class IMUProcessor:
             'signal_losses': self.stats['signal_losses'],
             'signal_loss_rate': self.stats['signal_losses'] / total,
             'filter_type': self.config.filter_type.value,
-            'active_sensors': len(self.filters),
+            'active_sensors': len(set(self.filters) | set(self._batch_sensor_ids())),
             'sensors_with_data': len([s for s in self.last_good_readings.values() if s is not None])
+                                 + (int(self._batch_state.has_good.sum()) if self._batch_state is not None else 0)
         }
+
+    def _batch_sensor_ids(self):
+        return self._batch_state.sensor_ids if self._batch_state is not None else ()
     
     def update_config(self, new_config: FilterConfig):
         """Met à jour la configuration et recrée les filtres si nécessaire."""
@@ -758,6 +1099,7 @@ class IMUProcessor:
             # Recréer tous les filtres
             for sensor_id in self.filters:
                 self.filters[sensor_id] = self._create_filter(sensor_id)
+            self._batch_state = None
             
             self.stats['filter_switches'] += 1
     
@@ -768,11 +1110,14 @@ class IMUProcessor:
             self.signal_lost_counters[sensor_id] = 0
             self.last_good_readings[sensor_id] = None
             print(f"[IMU] Capteur {sensor_id} remis à zéro")
+        if self._batch_state is not None and sensor_id in self._batch_state.rows:
+            self._batch_state.reset_rows([self._batch_state.rows[sensor_id]])
     
     def reset_all(self):
         """Remet à zéro tous les capteurs."""
         for sensor_id in list(self.filters.keys()):
             self.reset_sensor(sensor_id)
+        self._batch_state = None
         
         self.stats = {
             'total_readings': 0,
@@ -865,8 +1210,80 @@ def test_imu_processor():
     print(f"\nStatistiques finales:")
     for key, value in stats.items():
         print(f"  {key}: {value}")
+
+    # Traitement par bloc : 6 IMUs x 1 s à 200 Hz en un appel
+    batch_processor = IMUProcessorFactory.create_low_latency()
+    angles = np.arange(200) * 0.01
+    block = np.zeros((6, 200, 4))
+    block[..., 0] = np.cos(angles / 2)
+    block[..., 3] = np.sin(angles / 2)
+    block += np.random.normal(0, 0.01, block.shape)
+    start = time.perf_counter()
+    filtered, codes = batch_processor.process_batch(block, np.arange(200) / 200.0)
+    elapsed = time.perf_counter() - start
+    print(f"\nBloc {block.shape}: {elapsed * 1000:.2f} ms, "
+          f"qualité GOOD sur {np.mean(codes == QUALITY_CODES[IMUDataQuality.GOOD]) * 100:.0f}% des échantillons")
+
+    # Noyaux par bloc : mêmes valeurs que le filtre appelé échantillon par échantillon
+    times = np.arange(200) / 200.0
+    per_sample = KalmanQuaternionFilter()
+    looped = np.array([per_sample.process(q, t) for q, t in zip(block[0], times)])
+    start = time.perf_counter()
+    blocked = KalmanQuaternionFilter().process_block(block[0], times)
+    elapsed = time.perf_counter() - start
+    print(f"Kalman par bloc ({'Numba' if NUMBA_AVAILABLE else 'NumPy'}): {elapsed * 1000:.2f} ms, "
+          f"écart max avec process(): {np.max(np.abs(looped - blocked)):.1e}")
     
     print("=== Test terminé ===")
 
+def test_outlier_detector_rest_then_motion():
+    """Un capteur qui se met à bouger après un repos ne doit pas rester bloqué en valeur aberrante."""
+    rate = 50.0
+    rest, moving, after = 100, 50, 50
+    step = math.radians(150.0) / rate  # Lacet à 150°/s
+    yaw = np.concatenate([np.zeros(rest), np.arange(1, moving + 1) * step,
+                          np.full(after, moving * step)])
+    block = np.zeros((1, len(yaw), 4))
+    block[0, :, 0] = np.cos(yaw / 2)
+    block[0, :, 3] = np.sin(yaw / 2)
+    block += np.random.default_rng(0).normal(0, 0.001, block.shape)
+
+    processor = IMUProcessorFactory.create_low_latency()
+    filtered, codes = processor.process_batch(block, np.arange(len(yaw)) / rate)
+
+    good = QUALITY_CODES[IMUDataQuality.GOOD]
+    held = np.sum(codes[0, rest:rest + moving] != good)
+    assert held <= processor._batch_state.outliers.max_rejects, f"{held} échantillons retenus en mouvement"
+    assert np.all(codes[0, -after:] == good), "Capteur encore rejeté à sa nouvelle pose"
+    error = qmath.angular_distance(filtered[0, -1], QuaternionUtils.normalize(block[0, -1]))
+    assert math.degrees(error) < 1.0, f"Erreur finale {math.degrees(error):.1f}°"
+
+def test_outlier_detector_block_matches_per_sample():
+    """Par blocs (compilé ou passes NumPy), les mêmes valeurs aberrantes qu'échantillon par échantillon."""
+    rng = np.random.default_rng(2)
+    sensors, count, size = 6, 400, 100
+    yaw = np.arange(count) * 0.01
+    block = np.zeros((sensors, count, 4))
+    block[..., 0] = np.cos(yaw / 2)
+    block[..., 3] = np.sin(yaw / 2)
+    block += rng.normal(0, 0.01, block.shape)
+    block[:, 150:160] = [0.3, 0.5, 0.1, 0.8]  # Nouvelle pose : réamorçage
+    block /= np.linalg.norm(block, axis=2, keepdims=True)
+    active = rng.random((sensors, count)) > 0.05
+
+    reference = OutlierDetector(threshold=2.0, n_sensors=sensors)
+    expected = np.stack([reference.detect(block[:, j], active[:, j]) for j in range(count)], axis=1)
+    assert expected.any()
+    for method in ("detect_block", "_detect_chunk"):
+        detector = OutlierDetector(threshold=2.0, n_sensors=sensors)
+        detect = getattr(detector, method)
+        found = np.concatenate([detect(block[:, i:i + size], active[:, i:i + size])
+                                for i in range(0, count, size)], axis=1)
+        assert np.array_equal(found, expected), f"{method} : {np.sum(found != expected)} écarts"
+        assert np.array_equal(detector.rejects, reference.rejects)
+        assert np.allclose(detector.mean, reference.mean, rtol=0, atol=1e-12)
+
 if __name__ == "__main__":
     test_imu_processor()
+    test_outlier_detector_rest_then_motion()
+    test_outlier_detector_block_matches_per_sample()
@@ -0,0 +1,227 @@
+'''
+Offline re-filtering of recorded IMU quaternions with an IMUProcessorFactory preset.
+
+Every IMU dataset of every .h5 file under a directory is filtered in a process pool (one
+sensor per task) and stored as a derived signal, /derived/<recipe-hash>/<scope>/<IMUn>,
+the cache the review already reads: the filtered trace shows up under each raw IMU.
+Samples are timed by the device timestamps of Sensor/Time (40 ms steps when a trial has
+none) and each sensor is filtered forward then backward, so the offline result has no
+phase lag. Results whose source digest still matches are skipped, so an interrupted run resumes:
+    python utils/imu_refilter.py data/ --workers 6
+'''
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import h5py
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.hdf5_utils import TRIALS_GROUP, SAMPLE_PERIOD_S
+from utils.imu_processor import IMUProcessorFactory
+
+HDF5_EXTENSIONS = (".h5", ".hdf5")
+
+# Recette des signaux dérivés, affichée par la review depuis le cache (voir derived_signals.BATCH_RECIPES)
+# Le bruit de processus du preset live (0.0001) coupe vers 0.16 Hz à 100 Hz : 27 deg d'erreur
+# médiane sur un balancement de +/-40 deg à 1 Hz. 0.1 en aller-retour : 1.2 deg, 0.2 deg au repos.
+IMU_FILTER_RECIPE = {"kind": "imu_filter", "label": "High precision", "groups": ["IMU"],
+                     "preset": "high_precision", "config": {"kalman_q": 0.1, "outlier_threshold": 3.0},
+                     "zero_phase": True, "version": 2}
+
+
+def _run_preset(data, times, preset, config):
+    processor = getattr(IMUProcessorFactory, f"create_{preset}")()
+    for name, value in (config or {}).items():
+        setattr(processor.config, name, value)
+    steps = np.diff(times)
+    steps = steps[steps > 0]
+    if steps.size:
+        processor.config.sample_rate = 1.0 / float(np.median(steps))
+    filtered, _ = processor.process_batch(data[None], times)
+    return filtered[0]
+
+
+def filter_quaternions(data, preset="high_precision", timestamps=None, config=None, zero_phase=False):
+    """
+    (n, 4) quaternions of one sensor through IMUProcessorFactory.create_<preset>().
+
+    timestamps are the device times in seconds (SAMPLE_PERIOD_S steps when None); config
+    overrides FilterConfig fields of the preset. With zero_phase, the forward result is
+    filtered again backward in time, which cancels the lag of the causal filter.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if timestamps is None:
+        times = np.arange(len(data)) * SAMPLE_PERIOD_S
+    else:
+        times = np.asarray(timestamps, dtype=np.float64)
+    filtered = _run_preset(data, times, preset, config)
+    if zero_phase and len(data) > 1:
+        filtered = _run_preset(filtered[::-1], times[-1] - times[::-1], preset, config)[::-1]
+    return filtered
+
+
+def _filter_task(task):
+    """Worker process: filter one sensor; returns (task index, (n, 4) result)."""
+    return task["index"], filter_quaternions(task["data"], task["preset"], task["timestamps"],
+                                             task["config"], task["zero_phase"])
+
+
+def imu_datasets(f):
+    """
+    (scope, key, dataset, time dataset or None) of every (n, 4) IMU dataset, with the scope
+    names used by the review.
+    """
+    if TRIALS_GROUP in f:
+        trials = sorted((int(name) for name in f[TRIALS_GROUP] if name.isdigit()))
+        sensor_groups = [(f"trial_{t}", f[f"{TRIALS_GROUP}/{t}"].get("Sensor")) for t in trials]
+    else:
+        sensor_groups = [("root", f.get("Sensor"))]
+
+    found = []
+    for scope, sensor_group in sensor_groups:
+        if not isinstance(sensor_group, h5py.Group):
+            continue
+        times = None
+        for group_name, group in sensor_group.items():
+            if group_name.upper() == "TIME" and isinstance(group, h5py.Group):
+                times = next((d for d in group.values() if isinstance(d, h5py.Dataset) and d.ndim == 1), None)
+        for group_name, group in sensor_group.items():
+            if group_name.upper() != "IMU" or not isinstance(group, h5py.Group):
+                continue
+            for name, dset in group.items():
+                if isinstance(dset, h5py.Dataset) and dset.ndim == 2 and dset.shape[1] == 4 and dset.shape[0] > 0:
+                    found.append((scope, name.upper(), dset, times))
+    return found
+
+
+def sensor_timestamps(raw_times, n_samples):
+    """Device times (s) of the first n_samples, or None when Sensor/Time cannot time them all."""
+    from utils.resampling import device_times
+
+    if raw_times is None or len(raw_times) < n_samples or n_samples < 2:
+        return None
+    times = device_times(raw_times[:n_samples])
+    # Horodatages en double ou désordonnés : le temps ne recule jamais pour les filtres
+    return np.maximum.accumulate(times)
+
+
+def _stale_tasks(file_path, recipe, force):
+    """
+    Sensors of one file whose derived result is missing or older than the raw data, and the
+    sensor count. Tasks only name the datasets: the arrays are read again by _load_task.
+    """
+    from utils.derived_signals import derived_path, source_digest
+
+    tasks = []
+    with h5py.File(file_path, 'r') as f:
+        datasets = imu_datasets(f)
+        for scope, key, dset, time_dset in datasets:
+            # Un capteur à la fois en mémoire : seule l'empreinte est conservée
+            digest = source_digest(dset[()])
+            path = derived_path(recipe, scope, key)
+            if not force and path in f and f[path].attrs.get("source_digest") == digest:
+                continue
+            tasks.append({"file_path": file_path, "path": path, "digest": digest, "dataset": dset.name,
+                          "time_dataset": time_dset.name if time_dset is not None else None,
+                          "preset": recipe["preset"], "config": recipe.get("config"),
+                          "zero_phase": recipe.get("zero_phase", False)})
+    return tasks, len(datasets)
+
+
+def _load_task(task):
+    """Worker payload of one task: its raw quaternions and device timestamps, read just before submission."""
+    with h5py.File(task["file_path"], 'r') as f:
+        data = f[task["dataset"]][()]
+        raw_times = f[task["time_dataset"]][()] if task["time_dataset"] is not None else None
+    return dict(task, data=data, timestamps=sensor_timestamps(raw_times, len(data)))
+
+
+def refilter_directory(data_dir, recipe=None, max_workers=None, force=False, progress_callback=None):
+    """
+    Re-filter every IMU dataset of the .h5 files under data_dir and store the derived results.
+
+    Only this process reads and writes the files; the workers receive the raw arrays and
+    only compute. Each sensor is read when its task is submitted, with at most two tasks
+    per worker in flight. progress_callback(done, total) is called after each sensor.
+    Returns a dict with the number of files, filtered sensors, up-to-date sensors and errors.
+    """
+    from utils.derived_signals import store_derived
+
+    recipe = recipe or IMU_FILTER_RECIPE
+    files = sorted(
+        os.path.join(root, name)
+        for root, _dirs, names in os.walk(os.path.abspath(data_dir))
+        for name in names if name.lower().endswith(HDF5_EXTENSIONS)
+    )
+
+    tasks = []
+    up_to_date = 0
+    errors = 0
+    for file_path in files:
+        try:
+            file_tasks, n_sensors = _stale_tasks(file_path, recipe, force)
+        except Exception as e:
+            print(f"[ERROR] Cannot read IMU datasets of {file_path}: {e}")
+            errors += 1
+            continue
+        tasks.extend(file_tasks)
+        up_to_date += n_sensors - len(file_tasks)
+    for i, task in enumerate(tasks):
+        task["index"] = i
+
+    print(f"[INFO] {len(tasks)} IMU sensor(s) to filter in {len(files)} file(s), {up_to_date} already up to date")
+    done = 0
+    filtered = 0
+    if tasks:
+        max_in_flight = 2 * (max_workers or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            pending = set()
+            queued = iter(tasks)
+            while True:
+                # Lecture paresseuse : les tableaux bruts ne sont chargés qu'au moment de la soumission
+                for task in queued:
+                    try:
+                        pending.add(pool.submit(_filter_task, _load_task(task)))
+                    except Exception as e:
+                        print(f"[ERROR] Cannot read {task['dataset']} of {task['file_path']}: {e}")
+                        errors += 1
+                        done += 1
+                        if progress_callback is not None:
+                            progress_callback(done, len(tasks))
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    try:
+                        index, result = future.result()
+                        task = tasks[index]
+                        with h5py.File(task["file_path"], 'a') as f:
+                            store_derived(f, recipe, task["path"], result, task["digest"])
+                        filtered += 1
+                    except Exception as e:
+                        print(f"[ERROR] IMU re-filtering failed: {e}")
+                        errors += 1
+                    done += 1
+                    if progress_callback is not None:
+                        progress_callback(done, len(tasks))
+
+    return {"files": len(files), "filtered": filtered, "up_to_date": up_to_date, "errors": errors}
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Re-filter the recorded IMU quaternions of a directory of .h5 files")
+    parser.add_argument("data_dir")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="recompute results that are already up to date")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summary = refilter_directory(args.data_dir, max_workers=args.workers, force=args.force,
+                                 progress_callback=lambda d, t: print(f"[INFO] {d}/{t} sensors filtered"))
+    print(f"[INFO] Done in {time.perf_counter() - start:.1f} s: {summary}")
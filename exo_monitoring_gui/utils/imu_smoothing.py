@@ -0,0 +1,177 @@
+"""
+Lissage à phase nulle (aller-retour) des quaternions enregistrés, pour la review hors ligne.
+
+Les filtres de imu_processor sont causaux : leur retard se retrouve dans les angles revus.
+Hors ligne on dispose du trial entier, on lisse donc dans les deux sens :
+- rts_smooth : Kalman (modèle de KalmanQuaternionFilter) puis lisseur de Rauch-Tung-Striebel ;
+- zero_phase_low_pass : Butterworth aller-retour sur la carte logarithmique, autour de
+  l'orientation moyenne de chaque capteur, vecteurs de rotation déroulés au passage de
+  +/-180 degrés (le sujet qui se retourne).
+Les deux acceptent (capteurs, échantillons, 4) ou (échantillons, 4). Les lignes non finies
+(trous de l'enregistrement) sont comblées par SLERP entre leurs voisines avant le lissage,
+puis rendues en NaN.
+"""
+import math
+
+import numpy as np
+
+from utils import quaternion_math as qmath
+from utils.imu_filter_kernels import kalman_block
+
+# SciPy est optionnel : sans lui, le passe-bas aller-retour est un filtre du premier ordre
+try:
+    from scipy import signal as sp_signal
+except ImportError:
+    sp_signal = None
+
+SAMPLE_PERIOD_S = 0.040
+
+
+def _fill_gaps(q):
+    """
+    Normalize a (sensors, samples, 4) block and replace its non-finite rows by a SLERP
+    between the nearest finite rows of the same sensor (the nearest one at the ends, the
+    identity for a sensor without any). Returns the filled block and the mask of finite rows.
+    """
+    finite = np.isfinite(q).all(axis=2)
+    q = qmath.normalize(np.where(finite[..., None], q, qmath.IDENTITY))
+    if finite.all():
+        return q, finite
+    n_sensors, n_samples = finite.shape
+    index = np.arange(n_samples)
+    before = np.maximum.accumulate(np.where(finite, index, -1), axis=1)
+    after = np.minimum.accumulate(np.where(finite, index, n_samples)[:, ::-1], axis=1)[:, ::-1]
+    before = np.where(before >= 0, before, after)
+    after = np.where(after < n_samples, after, before)
+    span = after - before
+    t = np.where(span > 0, (index - before) / np.maximum(span, 1), 0.0)
+    rows = np.arange(n_sensors)[:, None]
+    empty = ~finite.any(axis=1)
+    ends = np.where(empty[:, None, None], qmath.IDENTITY, q[rows, np.clip(before, 0, n_samples - 1)])
+    filled = qmath.slerp(ends, np.where(empty[:, None, None], qmath.IDENTITY,
+                                        q[rows, np.clip(after, 0, n_samples - 1)]), t)
+    return np.where(finite[..., None], q, filled), finite
+
+
+def _as_block(quaternions):
+    q = np.asarray(quaternions, dtype=np.float64)
+    single = q.ndim == 2
+    if single:
+        q = q[None]
+    if q.ndim != 3 or q.shape[2] != 4:
+        raise ValueError(f"Expected (sensors, samples, 4) or (samples, 4) quaternions, got {np.shape(quaternions)}")
+    q, finite = _fill_gaps(q)
+    # Signes continus : l'interpolation linéaire entre q et -q n'a pas de sens
+    return qmath.align_hemispheres(q), single, finite
+
+
+def _output(result, single, finite):
+    result = np.where(finite[..., None], result, np.nan)
+    return result[0] if single else result
+
+
+def rts_smooth(quaternions, timestamps=None, process_noise=0.0001, measurement_noise=0.01):
+    """
+    Zero-phase Kalman smoothing: forward KalmanQuaternionFilter pass, then the RTS backward pass.
+
+    With F = H = I the covariance is p * I and does not depend on the data: the gains of
+    both passes are computed once from the time steps, and each pass is a single sweep
+    over the samples, vectorized over sensors (the forward one runs in imu_filter_kernels).
+    """
+    z, single, finite = _as_block(quaternions)
+    n_sensors, n_samples = z.shape[:2]
+    if n_samples < 2:
+        return _output(z, single, finite)
+    t = np.arange(n_samples) * SAMPLE_PERIOD_S if timestamps is None else np.asarray(timestamps, dtype=np.float64)
+    dt = np.diff(t)
+
+    # Covariances filtrées et prédites (scalaires, communes à tous les capteurs)
+    p_filtered = np.empty(n_samples)
+    p_predicted = np.empty(n_samples)
+    p_filtered[0] = p_predicted[0] = 1.0
+    for k in range(1, n_samples):
+        p_predicted[k] = p_filtered[k - 1] + process_noise * dt[k - 1]
+        gain = p_predicted[k] / (p_predicted[k] + measurement_noise)
+        p_filtered[k] = (1.0 - gain) * p_predicted[k]
+
+    filtered = kalman_block(z, t, np.tile(qmath.IDENTITY, (n_sensors, 1)), np.ones(n_sensors),
+                            np.zeros(n_sensors), np.zeros(n_sensors, dtype=bool),
+                            process_noise, measurement_noise)
+
+    # Passe arrière : x_s[k] = x_f[k] + C_k (x_s[k+1] - x_f[k]), C_k = p_f[k] / p_pred[k+1]
+    smoothing_gain = p_filtered[:-1] / p_predicted[1:]
+    smoothed = np.empty_like(filtered)
+    smoothed[:, -1] = filtered[:, -1]
+    for k in range(n_samples - 2, -1, -1):
+        smoothed[:, k] = filtered[:, k] + smoothing_gain[k] * (smoothed[:, k + 1] - filtered[:, k])
+    return _output(qmath.normalize(smoothed), single, finite)
+
+
+def _first_order_filtfilt(x, alpha):
+    """Forward then backward single-pole low-pass along axis 1 (fallback without SciPy)."""
+    y = np.array(x)
+    for k in range(1, y.shape[1]):
+        y[:, k] = y[:, k - 1] + alpha * (y[:, k] - y[:, k - 1])
+    for k in range(y.shape[1] - 2, -1, -1):
+        y[:, k] = y[:, k + 1] + alpha * (y[:, k] - y[:, k + 1])
+    return y
+
+
+def _unwrap_rotation_vectors(v):
+    """
+    Make (sensors, samples, 3) rotation vectors continuous along the sample axis.
+
+    The log map keeps angles in [0, pi]: past 180 degrees the vector jumps from pi * n to
+    about -pi * n. Axes are given consistent signs from one sample to the next (the angle
+    becomes signed), then the signed angle is unwrapped by 2 pi like a phase.
+    """
+    angle = np.linalg.norm(v, axis=-1)
+    axis = v / np.maximum(angle, 1e-12)[..., None]
+    flips = np.sum(axis[:, 1:] * axis[:, :-1], axis=-1) < 0.0
+    parity = np.cumsum(flips, axis=-1) % 2
+    signs = np.concatenate([np.ones((v.shape[0], 1)), 1.0 - 2.0 * parity], axis=-1)
+    return np.unwrap(angle * signs, axis=-1)[..., None] * (axis * signs[..., None])
+
+
+def zero_phase_low_pass(quaternions, cutoff_hz=4.0, sample_rate=1.0 / SAMPLE_PERIOD_S, order=2):
+    """
+    Butterworth filtfilt of the quaternions on the log map around each sensor's mean orientation.
+
+    The rotation vectors are unwrapped across +/-pi first, so samples more than 180 degrees
+    from the mean (a subject turning around) are filtered without a jump.
+    """
+    z, single, finite = _as_block(quaternions)
+    if z.shape[1] < 2:
+        return _output(z, single, finite)
+
+    reference = qmath.average(z, axis=1)[:, None]
+    v = _unwrap_rotation_vectors(qmath.log_map(qmath.multiply(qmath.conjugate(reference), z)))
+
+    smoothed = None
+    if sp_signal is not None:
+        try:
+            sos = sp_signal.butter(order, cutoff_hz, btype="low", fs=sample_rate, output="sos")
+            smoothed = sp_signal.sosfiltfilt(sos, v, axis=1)
+        except ValueError as e:
+            # Trial trop court pour le filtrage aller-retour
+            print(f"[WARNING] Zero-phase low-pass falls back to first order: {e}")
+    if smoothed is None:
+        rc = 1.0 / (2.0 * math.pi * cutoff_hz)
+        dt = 1.0 / sample_rate
+        smoothed = _first_order_filtfilt(v, dt / (dt + rc))
+
+    return _output(qmath.multiply(reference, qmath.exp_map(smoothed)), single, finite)
+
+
+def smooth_quaternions(quaternions, method="low_pass", **params):
+    """
+    Dispatch to zero_phase_low_pass ("low_pass", default) or rts_smooth ("rts").
+
+    rts_smooth keeps the noise model of KalmanQuaternionFilter, whose cut-off is far below
+    body motion (about 40 degrees of error on +/-60 degrees at 0.5 Hz): only for slow drifts.
+    """
+    if method == "rts":
+        return rts_smooth(quaternions, **params)
+    if method == "low_pass":
+        return zero_phase_low_pass(quaternions, **params)
+    raise ValueError(f"Unknown smoothing method: {method}")
@@ -0,0 +1,284 @@
+"""
+Noyaux quaternion vectorisés, partagés par le traitement IMU, la review et le rendu 3D.
+
+Toutes les fonctions prennent des tableaux (..., 4) en [w, x, y, z] et diffusent
+(broadcast) sur les dimensions de tête : un quaternion seul (4,), un lot (N, 4) ou un
+bloc (capteurs, échantillons, 4) passent par le même code.
+"""
+import numpy as np
+
+IDENTITY = np.array([1.0, 0.0, 0.0, 0.0])
+IDENTITY.setflags(write=False)
+
+# En dessous de cet écart, slerp interpole linéairement (sin(theta) trop petit)
+SLERP_LINEAR_DOT = 0.9995
+
+
+def normalize(q):
+    """Unit quaternions; near-zero ones become the identity."""
+    q = np.asarray(q, dtype=np.float64)
+    norm = np.linalg.norm(q, axis=-1, keepdims=True)
+    return np.where(norm < 1e-9, IDENTITY, q / np.maximum(norm, 1e-9))
+
+
+def multiply(q1, q2, renormalize=True):
+    """Hamilton product q1 * q2 (normalized unless renormalize is False)."""
+    q1 = np.asarray(q1, dtype=np.float64)
+    q2 = np.asarray(q2, dtype=np.float64)
+    w1, x1, y1, z1 = np.moveaxis(q1, -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(q2, -1, 0)
+    out = np.stack([
+        w1 * w2 - x1 * x2 - y1 * y2 - z1 * z2,
+        w1 * x2 + x1 * w2 + y1 * z2 - z1 * y2,
+        w1 * y2 - x1 * z2 + y1 * w2 + z1 * x2,
+        w1 * z2 + x1 * y2 - y1 * x2 + z1 * w2,
+    ], axis=-1)
+    return normalize(out) if renormalize else out
+
+
+def conjugate(q):
+    """Conjugate (= inverse of a unit quaternion)."""
+    q = np.asarray(q, dtype=np.float64)
+    return q * np.array([1.0, -1.0, -1.0, -1.0])
+
+
+def slerp(q1, q2, t):
+    """Spherical interpolation along the shortest path; t is a scalar or one value per quaternion."""
+    q1 = np.asarray(q1, dtype=np.float64)
+    q2 = np.asarray(q2, dtype=np.float64)
+    shape = np.broadcast_shapes(q1.shape, q2.shape)[:-1]
+    t = np.broadcast_to(np.asarray(t, dtype=np.float64), shape)[..., None]
+
+    dot = np.sum(q1 * q2, axis=-1, keepdims=True)
+    q2 = np.where(dot < 0.0, -q2, q2)
+    dot = np.abs(dot)
+
+    theta_0 = np.arccos(np.minimum(dot, 1.0))
+    close = dot > SLERP_LINEAR_DOT
+    sin_theta_0 = np.where(close, 1.0, np.sin(theta_0))
+    theta = theta_0 * t
+    s0 = np.cos(theta) - dot * np.sin(theta) / sin_theta_0
+    s1 = np.sin(theta) / sin_theta_0
+    lerped = q1 + t * (q2 - q1)
+    return normalize(np.where(close, lerped, s0 * q1 + s1 * q2))
+
+
+def angular_distance(q1, q2):
+    """Rotation angle (rad) between q1 and q2."""
+    dot = np.abs(np.sum(np.asarray(q1, dtype=np.float64) * np.asarray(q2, dtype=np.float64), axis=-1))
+    return 2 * np.arccos(np.minimum(dot, 1.0))
+
+
+def average(q, axis=-2):
+    """
+    Mean rotation of quaternions along axis: eigenvector of the largest eigenvalue of
+    sum(q q^T) (Markley et al. 2007). Insensitive to signs, unlike a component-wise mean.
+    """
+    q = np.moveaxis(normalize(q), axis, -2)
+    _, vectors = np.linalg.eigh(np.einsum('...ni,...nj->...ij', q, q))
+    mean = vectors[..., :, -1]
+    return np.where(mean[..., :1] < 0.0, -mean, mean)
+
+
+def align_hemispheres(q):
+    """Flip signs along the sample axis (-2) so consecutive quaternions have a positive dot product."""
+    q = np.asarray(q, dtype=np.float64)
+    flips = np.sum(q[..., 1:, :] * q[..., :-1, :], axis=-1) < 0.0
+    parity = np.cumsum(flips, axis=-1) % 2
+    signs = np.concatenate([np.ones(q.shape[:-2] + (1,)), 1.0 - 2.0 * parity], axis=-1)
+    return q * signs[..., None]
+
+
+def log_map(q):
+    """(..., 3) rotation vectors (axis * angle, rad) of unit quaternions; inverse of exp_map."""
+    q = normalize(q)
+    q = np.where(q[..., :1] < 0.0, -q, q)
+    v = q[..., 1:]
+    s = np.linalg.norm(v, axis=-1, keepdims=True)
+    angle = 2.0 * np.arctan2(s, q[..., :1])
+    # Petit angle : angle / s -> 2 / w ~ 2
+    return v * np.where(s > 1e-12, angle / np.maximum(s, 1e-12), 2.0)
+
+
+def exp_map(v):
+    """Unit quaternions of (..., 3) rotation vectors."""
+    v = np.asarray(v, dtype=np.float64)
+    angle = np.linalg.norm(v, axis=-1, keepdims=True)
+    half = 0.5 * angle
+    scale = np.where(angle > 1e-12, np.sin(half) / np.maximum(angle, 1e-12), 0.5)
+    return np.concatenate([np.cos(half), v * scale], axis=-1)
+
+
+def to_euler(q, degrees=False):
+    """(..., 3) roll, pitch, yaw (X, Y, Z) of the quaternions; pitch saturates at +-90 degrees."""
+    w, x, y, z = np.moveaxis(np.asarray(q, dtype=np.float64), -1, 0)
+    roll = np.arctan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = np.arcsin(np.clip(2 * (w * y - z * x), -1.0, 1.0))
+    yaw = np.arctan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    angles = np.stack([roll, pitch, yaw], axis=-1)
+    return np.degrees(angles) if degrees else angles
+
+
+def from_euler(roll, pitch, yaw, degrees=False):
+    """Quaternions from roll, pitch, yaw (scalars or broadcastable arrays)."""
+    angles = np.stack(np.broadcast_arrays(*(np.asarray(a, dtype=np.float64) for a in (roll, pitch, yaw))), axis=-1)
+    if degrees:
+        angles = np.radians(angles)
+    cr, cp, cy = np.moveaxis(np.cos(angles * 0.5), -1, 0)
+    sr, sp, sy = np.moveaxis(np.sin(angles * 0.5), -1, 0)
+    return normalize(np.stack([
+        cr * cp * cy + sr * sp * sy,
+        sr * cp * cy - cr * sp * sy,
+        cr * sp * cy + sr * cp * sy,
+        cr * cp * sy - sr * sp * cy,
+    ], axis=-1))
+
+
+def from_axis_angle(axis, angles):
+    """Quaternions for rotations of angles (rad, any shape) about one axis."""
+    axis = np.asarray(axis, dtype=np.float64)
+    axis = axis / np.linalg.norm(axis)
+    half = 0.5 * np.asarray(angles, dtype=np.float64)
+    return np.concatenate([np.cos(half)[..., None], np.sin(half)[..., None] * axis], axis=-1)
+
+
+def to_matrix(q):
+    """(..., 3, 3) rotation matrices (column vectors: v' = R @ v)."""
+    q = np.asarray(q, dtype=np.float64)
+    w, x, y, z = np.moveaxis(q, -1, 0)
+    m = np.empty(q.shape[:-1] + (3, 3))
+    m[..., 0, 0] = 1 - 2 * (y * y + z * z)
+    m[..., 0, 1] = 2 * (x * y - w * z)
+    m[..., 0, 2] = 2 * (x * z + w * y)
+    m[..., 1, 0] = 2 * (x * y + w * z)
+    m[..., 1, 1] = 1 - 2 * (x * x + z * z)
+    m[..., 1, 2] = 2 * (y * z - w * x)
+    m[..., 2, 0] = 2 * (x * z - w * y)
+    m[..., 2, 1] = 2 * (y * z + w * x)
+    m[..., 2, 2] = 1 - 2 * (x * x + y * y)
+    return m
+
+
+# === Tests ===
+
+def _random_quaternions(rng, shape):
+    return normalize(rng.normal(size=tuple(shape) + (4,)))
+
+
+def _same_rotation(q1, q2, tolerance=1e-12):
+    """q1 and q2 (unit) are the same rotation, up to sign."""
+    return np.allclose(np.abs(np.sum(q1 * q2, axis=-1)), 1.0, rtol=0.0, atol=tolerance)
+
+
+def test_multiply_conjugate():
+    """Produit de Hamilton : identité, inverse par le conjugué, associativité."""
+    rng = np.random.default_rng(0)
+    a, b, c = _random_quaternions(rng, (3, 100))
+    assert np.allclose(multiply(IDENTITY, a), a) and np.allclose(multiply(a, IDENTITY), a)
+    assert np.allclose(multiply(a, conjugate(a)), IDENTITY)
+    assert np.allclose(multiply(conjugate(a), a), IDENTITY)
+    assert np.allclose(multiply(multiply(a, b), c), multiply(a, multiply(b, c)))
+    assert np.allclose(conjugate(multiply(a, b)), multiply(conjugate(b), conjugate(a)))
+    assert np.allclose(conjugate(conjugate(a)), a)
+    # Deux rotations autour du même axe s'ajoutent
+    axis = np.array([1.0, 2.0, -0.5])
+    assert np.allclose(multiply(from_axis_angle(axis, 0.3), from_axis_angle(axis, 0.9)),
+                       from_axis_angle(axis, 1.2))
+
+
+def test_slerp():
+    """Extrémités, chemin le plus court, milieu d'une rotation et t différent par ligne."""
+    rng = np.random.default_rng(1)
+    a, b = _random_quaternions(rng, (2, 100))
+    assert _same_rotation(slerp(a, b, 0.0), a) and _same_rotation(slerp(a, b, 1.0), b)
+    assert _same_rotation(slerp(a, -b, 1.0), b)
+    assert np.allclose(slerp(a, -b, 0.5), slerp(a, b, 0.5))
+
+    axis = np.array([0.0, 1.0, 1.0])
+    angles = np.linspace(0.0, 3.0, 7)
+    t = np.linspace(0.0, 1.0, 7)
+    # t par ligne, y compris sous le seuil linéaire (petits angles)
+    expected = from_axis_angle(axis, angles * t)
+    assert _same_rotation(slerp(IDENTITY, from_axis_angle(axis, angles), t), expected, 1e-9)
+    per_row = slerp(a, b, np.linspace(0.0, 1.0, 100))
+    assert np.allclose(per_row, [slerp(a[i], b[i], ti) for i, ti in enumerate(np.linspace(0.0, 1.0, 100))])
+
+
+def test_to_matrix():
+    """Matrices des rotations autour de z, orthonormales, et produit de quaternions = produit de matrices."""
+    angles = np.linspace(-np.pi, np.pi, 13)
+    c, s = np.cos(angles), np.sin(angles)
+    expected = np.zeros((13, 3, 3))
+    expected[:, 0, 0], expected[:, 0, 1], expected[:, 1, 0], expected[:, 1, 1] = c, -s, s, c
+    expected[:, 2, 2] = 1.0
+    assert np.allclose(to_matrix(from_axis_angle([0.0, 0.0, 1.0], angles)), expected)
+    assert np.allclose(to_matrix(IDENTITY), np.eye(3))
+
+    rng = np.random.default_rng(2)
+    a, b = _random_quaternions(rng, (2, 50))
+    m = to_matrix(a)
+    assert np.allclose(m @ np.swapaxes(m, -1, -2), np.eye(3))
+    assert np.allclose(np.linalg.det(m), 1.0)
+    assert np.allclose(to_matrix(multiply(a, b)), m @ to_matrix(b))
+    assert np.allclose(to_matrix(-a), m)
+
+
+def test_average_sign_invariance():
+    """La moyenne ne dépend ni des signes ni de l'ordre des quaternions."""
+    rng = np.random.default_rng(3)
+    center = from_axis_angle([1.0, -1.0, 0.5], 0.8)
+    offsets = from_axis_angle([0.0, 0.0, 1.0], np.array([-0.2, -0.1, 0.1, 0.2]))
+    q = multiply(center, offsets)
+    assert _same_rotation(average(q), center)
+    signs = np.where(rng.random(len(q)) < 0.5, -1.0, 1.0)[:, None]
+    assert np.allclose(average(q * signs), average(q))
+    assert np.allclose(average(q[::-1]), average(q))
+    assert average(q)[0] >= 0.0
+
+
+def test_log_exp_maps():
+    """log_map et exp_map sont inverses (à ±q près), petits angles compris."""
+    rng = np.random.default_rng(4)
+    q = _random_quaternions(rng, (200,))
+    assert _same_rotation(exp_map(log_map(q)), q)
+    v = rng.normal(size=(200, 3))
+    v *= (rng.uniform(0.0, np.pi - 1e-6, 200) / np.linalg.norm(v, axis=-1))[:, None]
+    assert np.allclose(log_map(exp_map(v)), v)
+    small = np.array([1e-9, -2e-9, 3e-10])
+    assert np.allclose(log_map(exp_map(small)), small, rtol=1e-6, atol=0.0)
+    assert np.allclose(log_map(IDENTITY), 0.0) and np.allclose(exp_map(np.zeros(3)), IDENTITY)
+    assert np.allclose(np.linalg.norm(log_map(from_axis_angle([0.0, 1.0, 0.0], 1.25)), axis=-1), 1.25)
+
+
+def test_broadcast_shapes():
+    """Un quaternion, un lot et un bloc (capteurs, échantillons) passent par le même code."""
+    rng = np.random.default_rng(5)
+    single = _random_quaternions(rng, ())
+    batch = _random_quaternions(rng, (5,))
+    block = _random_quaternions(rng, (3, 5))
+    assert normalize(single).shape == (4,) and normalize(np.zeros(4)).tolist() == IDENTITY.tolist()
+    assert multiply(single, batch).shape == (5, 4)
+    assert multiply(block, batch).shape == (3, 5, 4)
+    assert multiply(block[:, :1], batch).shape == (3, 5, 4)
+    assert np.allclose(multiply(block, batch)[1], multiply(block[1], batch))
+    assert slerp(block, batch, np.linspace(0.0, 1.0, 5)).shape == (3, 5, 4)
+    assert slerp(block, single, rng.random((3, 5))).shape == (3, 5, 4)
+    assert angular_distance(block, batch).shape == (3, 5)
+    assert average(block).shape == (3, 4) and average(block, axis=0).shape == (5, 4)
+    assert align_hemispheres(block).shape == (3, 5, 4)
+    assert log_map(block).shape == (3, 5, 3) and exp_map(log_map(block)).shape == (3, 5, 4)
+    assert to_euler(block).shape == (3, 5, 3) and to_matrix(block).shape == (3, 5, 3, 3)
+    assert to_matrix(single).shape == (3, 3)
+    assert from_euler(np.zeros((3, 5)), 0.0, 0.0).shape == (3, 5, 4)
+    assert from_axis_angle([1.0, 0.0, 0.0], np.zeros((3, 5))).shape == (3, 5, 4)
+    assert _same_rotation(from_euler(*to_euler(block).T).swapaxes(0, 1), block, 1e-9)
+
+
+if __name__ == "__main__":
+    test_multiply_conjugate()
+    test_slerp()
+    test_to_matrix()
+    test_average_sign_invariance()
+    test_log_exp_maps()
+    test_broadcast_shapes()
+    print("Noyaux quaternion conformes")
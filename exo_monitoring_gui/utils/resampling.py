@@ -0,0 +1,294 @@
+'''
+Resampling of recorded trials onto a uniform time base, with gap filling.
+
+The review assumes a fixed period (np.arange(n) * SAMPLE_PERIOD_S) even when packets were
+dropped. Here the device timestamps (Sensor/Time/time) give the real instant of every
+sample: gaps are detected against the device period (median timestamp step), every
+channel of Sensor/ and Controller/ is interpolated on a regular grid (slerp for
+quaternions, linear or cubic for EMG/pMMG, sample-and-hold for labels and controller
+states) and a mask marks the reconstructed samples. Non-finite samples (NaN/inf) are
+dropped per channel and reconstructed like gaps. The grid defaults to the device
+period; a coarser one is low-passed first so that decimation does not alias. Results go
+to /resampled/<scope>/ in the same file, e.g.:
+    python utils/resampling.py trial.h5 --trial 3
+'''
+import json
+import os
+import sys
+
+import h5py
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from utils.hdf5_utils import TRIALS_GROUP, SAMPLE_PERIOD_S, RESAMPLED_GROUP
+from utils import quaternion_math as qmath
+from utils.imu_smoothing import zero_phase_low_pass
+
+# SciPy est optionnel : sans lui, l'interpolation cubique devient linéaire et
+# l'anti-repliement une moyenne glissante sur une période de sortie
+try:
+    from scipy import signal as sp_signal
+    from scipy.interpolate import CubicSpline
+except ImportError:
+    sp_signal = None
+    CubicSpline = None
+
+GAP_TOLERANCE = 1.5  # Un écart > 1.5 période de l'appareil entre deux horodatages est un trou
+ANTI_ALIAS_FRACTION = 0.8  # Coupure de l'anti-repliement, en fraction du Nyquist de la grille de sortie
+TIME_UNITS = {"s": 1.0, "ms": 1e-3, "us": 1e-6}
+HOLD_GROUPS = ("LABEL", "CONTROLLER", "IMU_QUALITY")  # Valeurs discrètes : pas d'interpolation
+QUATERNION_GROUPS = ("IMU", "IMU_FILTERED")
+
+
+def device_times(raw, time_unit="auto"):
+    """Device timestamps in seconds from the first sample; "auto" reads steps > 1 as milliseconds."""
+    t = np.asarray(raw, dtype=np.float64)
+    if time_unit == "auto":
+        steps = np.diff(t)
+        steps = steps[steps > 0]
+        time_unit = "ms" if steps.size and np.median(steps) > 1.0 else "s"
+    return (t - t[0]) * TIME_UNITS[time_unit]
+
+
+def increasing_mask(times):
+    """True for samples whose timestamp is later than every previous one (drops duplicates/out-of-order)."""
+    keep = np.ones(len(times), dtype=bool)
+    if len(times) > 1:
+        keep[1:] = times[1:] > np.maximum.accumulate(times)[:-1]
+    return keep
+
+
+def finite_mask(values):
+    """True for the samples (rows) of values whose entries are all finite (always for non-float data)."""
+    x = np.asarray(values)
+    if not np.issubdtype(x.dtype, np.inexact):
+        return np.ones(len(x), dtype=bool)
+    return np.isfinite(x.reshape(len(x), -1)).all(axis=1)
+
+
+def device_period(times):
+    """Median step between increasing device timestamps: the period the device actually sampled at."""
+    steps = np.diff(times)
+    steps = steps[steps > 0]
+    if not steps.size:
+        raise ValueError("At least two distinct timestamps are needed to estimate the device period")
+    return float(np.median(steps))
+
+
+def detect_gaps(times, period, tolerance=GAP_TOLERANCE):
+    """(start_s, missing_s) of every gap longer than tolerance * period, as two arrays."""
+    steps = np.diff(times)
+    gaps = steps > tolerance * period
+    return times[:-1][gaps], steps[gaps] - period
+
+
+def uniform_grid(times, period=SAMPLE_PERIOD_S):
+    """Regular sample instants covering [times[0], times[-1]]."""
+    return times[0] + np.arange(int(np.floor((times[-1] - times[0]) / period + 0.5)) + 1) * period
+
+
+def _bracket(times, grid):
+    """Index of the source sample before each grid instant and the fraction towards the next one."""
+    if len(times) < 2:
+        return np.zeros(len(grid), dtype=np.intp), np.zeros(len(grid))
+    idx = np.clip(np.searchsorted(times, grid, side="right") - 1, 0, len(times) - 2)
+    frac = np.clip((grid - times[idx]) / (times[idx + 1] - times[idx]), 0.0, 1.0)
+    return idx, frac
+
+
+def gap_mask(times, grid, period, tolerance=GAP_TOLERANCE):
+    """
+    True where a grid instant lies inside a gap, or before the first / after the last source
+    sample: more than half a period from any source sample.
+    """
+    outside = (grid < times[0] - 0.5 * period) | (grid > times[-1] + 0.5 * period)
+    if len(times) < 2:
+        return outside
+    idx, _ = _bracket(times, grid)
+    before, after = grid - times[idx], times[idx + 1] - grid
+    inside = ((times[idx + 1] - times[idx]) > tolerance * period) & (np.minimum(before, after) > 0.5 * period)
+    return outside | inside
+
+
+def anti_alias(values, source_period, period, order=4):
+    """
+    Zero-phase low-pass of (n,) or (n, k) values sampled every source_period, before they
+    are resampled at a coarser period. The samples are treated as evenly spaced.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    if sp_signal is not None:
+        try:
+            sos = sp_signal.butter(order, ANTI_ALIAS_FRACTION * 0.5 / period, btype="low",
+                                   fs=1.0 / source_period, output="sos")
+            return sp_signal.sosfiltfilt(sos, x, axis=0)
+        except ValueError as e:
+            # Trial trop court pour le filtrage aller-retour
+            print(f"[WARNING] Anti-alias filter falls back to a moving average: {e}")
+    # Moyenne glissante centrée sur une période de sortie (somme cumulée, bords tronqués)
+    window = max(1, int(round(period / source_period)))
+    csum = np.concatenate((np.zeros((1,) + x.shape[1:]), np.cumsum(x, axis=0)))
+    idx = np.arange(len(x))
+    lo = np.clip(idx - window // 2, 0, len(x))
+    hi = np.clip(idx - window // 2 + window, 0, len(x))
+    return (csum[hi] - csum[lo]) / (hi - lo).reshape((-1,) + (1,) * (x.ndim - 1))
+
+
+def resample_quaternions(times, quaternions, grid):
+    """Slerp (n, 4) quaternions sampled at times onto grid."""
+    q = qmath.normalize(quaternions)
+    if len(q) < 2:
+        return np.repeat(q[:1], len(grid), axis=0)
+    idx, frac = _bracket(times, grid)
+    return qmath.slerp(q[idx], q[idx + 1], frac)
+
+
+def resample_signal(times, values, grid, kind="linear"):
+    """Interpolate (n,) or (n, k) values onto grid: "linear", "cubic" or "hold" (previous sample)."""
+    x = np.asarray(values, dtype=np.float64)
+    if len(x) < 2:
+        return np.repeat(x[:1], len(grid), axis=0)
+    if kind == "hold":
+        return x[np.clip(np.searchsorted(times, grid, side="right") - 1, 0, len(x) - 1)]
+    if kind == "cubic" and CubicSpline is not None and len(x) >= 4:
+        return CubicSpline(times, x, axis=0)(np.clip(grid, times[0], times[-1]))
+    idx, frac = _bracket(times, grid)
+    frac = frac.reshape((-1,) + (1,) * (x.ndim - 1))
+    return x[idx] + frac * (x[idx + 1] - x[idx])
+
+
+def _trial_path(trial_id):
+    return f"{TRIALS_GROUP}/{trial_id}" if trial_id is not None else "/"
+
+
+def _read_channels(trial_group):
+    """{path relative to the trial: (group name in capitals, array)} of Sensor/* and Controller, and the raw times."""
+    channels = {}
+    raw_times = None
+    sensor_group = trial_group["Sensor"]
+    groups = [(f"Sensor/{name}", group) for name, group in sensor_group.items()]
+    # Consignes de l'exosquelette : groupe Controller à côté de Sensor (à la racine hors conteneur)
+    groups += [(name, group) for name, group in trial_group.items() if name.upper() == "CONTROLLER"]
+    for group_path, group in groups:
+        if not isinstance(group, h5py.Group):
+            continue
+        group_upper = group_path.split("/")[-1].upper()
+        for name, dset in group.items():
+            if not isinstance(dset, h5py.Dataset) or not dset.shape:
+                continue
+            if group_upper == "TIME":
+                raw_times = dset[()]
+            else:
+                channels[f"{group_path}/{name}"] = (group_upper, dset[()])
+    return channels, raw_times
+
+
+def resample_trial(file_path, trial_id=None, period=None, signal_kind="cubic",
+                   time_unit="auto", tolerance=GAP_TOLERANCE):
+    """
+    Resample every channel of one trial onto a uniform grid from its device timestamps.
+
+    period is the grid step in seconds; None keeps the device period. Gaps are always
+    measured against the device period.
+    Non-finite samples are dropped per channel before interpolating, as non-increasing
+    timestamps are; the grid instants they leave uncovered are marked in gap_mask too.
+    Returns {"time": (m,) s from the first sample, "gap_mask": (m,) bool, "channels":
+    {path relative to the trial group, e.g. Sensor/IMU/IMU1: array}, "gaps": [(start_s,
+    missing_s)], "dropped": count of non-increasing timestamps, "non_finite": count of
+    non-finite samples dropped over all channels, "period": grid step, "device_period":
+    median device step}.
+    """
+    with h5py.File(file_path, 'r') as f:
+        channels, raw_times = _read_channels(f[_trial_path(trial_id)])
+    if raw_times is None or len(raw_times) == 0:
+        raise ValueError(f"No device timestamps (Sensor/Time) in {file_path}")
+
+    times = device_times(raw_times, time_unit)
+    keep = increasing_mask(times)
+    kept = times[keep]
+    source_period = device_period(kept)
+    period = source_period if period is None else float(period)
+    decimate = period > source_period * 1.01
+    grid = uniform_grid(kept, period)
+    starts, missing = detect_gaps(kept, source_period, tolerance)
+    # La grille peut déborder des horodatages d'une demi-période de sortie : pas un trou
+    covered = np.clip(grid, kept[0], kept[-1])
+    gaps = gap_mask(kept, covered, source_period, tolerance)
+
+    resampled = {}
+    non_finite = 0
+    for path, (group_upper, data) in channels.items():
+        n = min(len(data), len(times))
+        if n == 0:
+            continue
+        finite = finite_mask(data[:n])
+        sel = keep[:n] & finite
+        non_finite += int((keep[:n] & ~finite).sum())
+        t, x = times[:n][sel], data[:n][sel]
+        if len(x) == 0:
+            # Aucun échantillon exploitable : canal vide plutôt qu'un trou sur tout le trial
+            resampled[path] = np.full((len(grid),) + data.shape[1:], np.nan)
+            continue
+        if not finite.all():
+            gaps |= gap_mask(t, covered, source_period, tolerance)
+        if group_upper in HOLD_GROUPS:
+            resampled[path] = resample_signal(t, x, grid, "hold")
+        elif group_upper in QUATERNION_GROUPS and x.ndim == 2 and x.shape[1] == 4:
+            if decimate:
+                x = zero_phase_low_pass(x, ANTI_ALIAS_FRACTION * 0.5 / period, 1.0 / source_period)
+            resampled[path] = resample_quaternions(t, x, grid)
+        else:
+            if decimate:
+                x = anti_alias(x, source_period, period)
+            resampled[path] = resample_signal(t, x, grid, signal_kind)
+
+    return {
+        "time": grid,
+        "gap_mask": gaps,
+        "channels": resampled,
+        "gaps": list(zip(starts.tolist(), missing.tolist())),
+        "dropped": int((~keep).sum()),
+        "non_finite": non_finite,
+        "period": period,
+        "device_period": source_period,
+    }
+
+
+def write_resampled(file_path, result, trial_id=None):
+    """Store a resample_trial result under /resampled/<scope>/ (time, gap_mask, Sensor/..., Controller/...)."""
+    scope = f"trial_{trial_id}" if trial_id is not None else "root"
+    path = f"{RESAMPLED_GROUP}/{scope}"
+    with h5py.File(file_path, 'a') as f:
+        if path in f:
+            del f[path]
+        group = f.create_group(path)
+        group.create_dataset("time", data=result["time"])
+        group.create_dataset("gap_mask", data=result["gap_mask"])
+        for channel, data in result["channels"].items():
+            group.create_dataset(channel, data=data)
+        group.attrs["period_s"] = result["period"]
+        group.attrs["device_period_s"] = result["device_period"]
+        group.attrs["gaps"] = json.dumps(result["gaps"])
+        group.attrs["dropped_samples"] = result["dropped"]
+        group.attrs["non_finite_samples"] = result["non_finite"]
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Resample a recorded trial onto a uniform time base")
+    parser.add_argument("file", help="HDF5 recording or subject container")
+    parser.add_argument("--trial", type=int, default=None, help="trial number in a subject container")
+    parser.add_argument("--period", type=float, default=None,
+                        help="output period in seconds (default: the device period)")
+    parser.add_argument("--signal-kind", choices=("linear", "cubic"), default="cubic")
+    parser.add_argument("--time-unit", choices=("auto",) + tuple(TIME_UNITS), default="auto")
+    args = parser.parse_args()
+
+    result = resample_trial(args.file, args.trial, args.period, args.signal_kind, args.time_unit)
+    out = write_resampled(args.file, result, args.trial)
+    filled = int(result["gap_mask"].sum())
+    print(f"[INFO] {len(result['time'])} samples every {result['period'] * 1000:.1f} ms "
+          f"({filled} filled in {len(result['gaps'])} gap(s), "
+          f"{result['dropped']} out-of-order timestamp(s) and {result['non_finite']} non-finite "
+          f"sample(s) dropped) written to {out}")
@@ -0,0 +1,264 @@
+import os
+import json
+import sqlite3
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+
+import h5py
+
+# Lecture de l'index des trials partagée avec la review (hdf5_utils.list_trials)
+from utils.hdf5_utils import TRIAL_INDEX_DATASET, SAMPLE_PERIOD_S, is_signal_channel, trials_from_index
+
+CATALOG_FILENAME = "subject_catalog.sqlite"
+HDF5_EXTENSIONS = (".h5", ".hdf5")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL,
+    participant_name TEXT,
+    participant_last_name TEXT,
+    creation_date TEXT,
+    attrs_json TEXT,
+    mapping_json TEXT,
+    metadata_json TEXT,
+    n_trials INTEGER,
+    total_duration REAL,
+    error TEXT,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    path TEXT NOT NULL,
+    trial INTEGER NOT NULL,
+    start_time REAL,
+    duration REAL,
+    n_samples INTEGER,
+    PRIMARY KEY (path, trial)
+);
+CREATE TABLE IF NOT EXISTS channels (
+    path TEXT NOT NULL,
+    trial INTEGER NOT NULL,
+    channel TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_channels_channel ON channels(channel);
+CREATE INDEX IF NOT EXISTS idx_channels_path ON channels(path);
+CREATE INDEX IF NOT EXISTS idx_trials_path ON trials(path);
+"""
+
+
+def default_catalog_path(data_dir):
+    """Return the catalog location used for a data directory."""
+    return os.path.join(data_dir, CATALOG_FILENAME)
+
+
+def _open_catalog(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _to_text(value):
+    """Convert an HDF5 attribute value (bytes, numpy scalar/array) to a str."""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if hasattr(value, "tolist"):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return json.dumps(value, default=str)
+    return str(value)
+
+
+def _trials_from_root_sensor(f, mtime):
+    """Describe a legacy file (single recording under /Sensor) as trial 1."""
+    sensor_group = f.get("Sensor")
+    if sensor_group is None:
+        return []
+
+    entry = {"trial": 1, "start_time": mtime, "duration": 0.0, "n_samples": 0, "channels": []}
+
+    def visitor(name, obj):
+        if not isinstance(obj, h5py.Dataset):
+            return
+        entry["channels"].append(name)
+        if is_signal_channel(name) and obj.shape:
+            entry["n_samples"] = max(entry["n_samples"], int(obj.shape[0]))
+
+    sensor_group.visititems(visitor)
+    if entry["n_samples"] == 0:
+        return []
+    entry["duration"] = entry["n_samples"] * SAMPLE_PERIOD_S
+    return [entry]
+
+
+def extract_file_record(path):
+    """Read the catalog record of one HDF5 file (runs in a worker process).
+
+    Only root attributes and the trial index are read, never the sensor data
+    itself (except dataset shapes for legacy files without an index).
+    """
+    stat = os.stat(path)
+    record = {
+        "path": path,
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "attrs": {},
+        "mapping_json": None,
+        "metadata_json": None,
+        "trials": [],
+        "error": None,
+    }
+    try:
+        with h5py.File(path, 'r') as f:
+            for key, value in f.attrs.items():
+                text = _to_text(value)
+                if key == "mapping":
+                    record["mapping_json"] = text
+                elif key == "metadata":
+                    record["metadata_json"] = text
+                else:
+                    record["attrs"][key] = text
+
+            if TRIAL_INDEX_DATASET in f:
+                record["trials"] = trials_from_index(f)
+            else:
+                record["trials"] = _trials_from_root_sensor(f, stat.st_mtime)
+    except Exception as e:
+        record["error"] = str(e)
+    return record
+
+
+def _store_record(conn, record):
+    path = record["path"]
+    attrs = record["attrs"]
+    trials = record["trials"]
+
+    conn.execute("DELETE FROM trials WHERE path = ?", (path,))
+    conn.execute("DELETE FROM channels WHERE path = ?", (path,))
+    conn.execute(
+        """INSERT OR REPLACE INTO files (path, mtime, size, participant_name, participant_last_name,
+               creation_date, attrs_json, mapping_json, metadata_json,
+               n_trials, total_duration, error, indexed_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        (
+            path,
+            record["mtime"],
+            record["size"],
+            attrs.get("participant_name"),
+            attrs.get("participant_last_name"),
+            attrs.get("creation_date"),
+            json.dumps(attrs, ensure_ascii=False),
+            record["mapping_json"],
+            record["metadata_json"],
+            len(trials),
+            sum(t["duration"] for t in trials),
+            record["error"],
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO trials (path, trial, start_time, duration, n_samples) VALUES (?, ?, ?, ?, ?)",
+        [(path, t["trial"], t["start_time"], t["duration"], t["n_samples"]) for t in trials],
+    )
+    conn.executemany(
+        "INSERT INTO channels (path, trial, channel) VALUES (?, ?, ?)",
+        [(path, t["trial"], channel) for t in trials for channel in t["channels"]],
+    )
+
+
+def _scan_hdf5_files(data_dir):
+    found = {}
+    for root, _dirs, files in os.walk(data_dir):
+        for name in files:
+            if name.lower().endswith(HDF5_EXTENSIONS):
+                path = os.path.abspath(os.path.join(root, name))
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                found[path] = (stat.st_mtime, stat.st_size)
+    return found
+
+
+def build_catalog(data_dir, db_path=None, max_workers=None, progress_callback=None):
+    """Index every HDF5 file under data_dir into the SQLite catalog.
+
+    Files whose mtime and size match the catalog are skipped, and entries for
+    files that no longer exist are removed. Changed files are read in parallel
+    with a process pool; only this process writes to the database.
+    Returns a dict with the number of scanned, updated and removed files.
+    """
+    data_dir = os.path.abspath(data_dir)
+    db_path = db_path or default_catalog_path(data_dir)
+    found = _scan_hdf5_files(data_dir)
+
+    conn = _open_catalog(db_path)
+    try:
+        known = {
+            row["path"]: (row["mtime"], row["size"])
+            for row in conn.execute("SELECT path, mtime, size FROM files")
+        }
+        prefix = data_dir + os.sep
+        removed = [p for p in known if p.startswith(prefix) and p not in found]
+        to_index = [p for p, sig in found.items() if known.get(p) != sig]
+
+        with conn:
+            for path in removed:
+                conn.execute("DELETE FROM files WHERE path = ?", (path,))
+                conn.execute("DELETE FROM trials WHERE path = ?", (path,))
+                conn.execute("DELETE FROM channels WHERE path = ?", (path,))
+
+        if to_index:
+            print(f"[INFO] Indexing {len(to_index)} file(s) in {data_dir}")
+            done = 0
+            # spawn : appelé depuis un QThread, un fork copierait l'état Qt et les verrous tenus
+            with ProcessPoolExecutor(max_workers=max_workers, mp_context=get_context("spawn")) as pool:
+                futures = [pool.submit(extract_file_record, p) for p in to_index]
+                for future in as_completed(futures):
+                    try:
+                        record = future.result()
+                    except Exception as e:
+                        print(f"[ERROR] Catalog indexing failed: {e}")
+                        continue
+                    with conn:
+                        _store_record(conn, record)
+                    done += 1
+                    if progress_callback is not None:
+                        progress_callback(done, len(to_index))
+    finally:
+        conn.close()
+
+    return {"scanned": len(found), "updated": len(to_index), "removed": len(removed)}
+
+
+def search_catalog(db_path, text="", channel=None, min_duration=None):
+    """Return the catalog entries matching a free-text filter.
+
+    text is matched against the file path and every root attribute
+    (participant_* etc.); channel restricts to files containing a channel
+    whose path contains the given string (e.g. "IMU" or "emgL1").
+    """
+    if not os.path.exists(db_path):
+        return []
+
+    query = "SELECT * FROM files WHERE 1 = 1"
+    params = []
+    for term in text.split():
+        query += " AND (path LIKE ? OR attrs_json LIKE ? OR metadata_json LIKE ?)"
+        like = f"%{term}%"
+        params.extend([like, like, like])
+    if channel:
+        query += " AND path IN (SELECT DISTINCT path FROM channels WHERE channel LIKE ?)"
+        params.append(f"%{channel}%")
+    if min_duration is not None:
+        query += " AND total_duration >= ?"
+        params.append(min_duration)
+    query += " ORDER BY participant_last_name, participant_name, path"
+
+    conn = _open_catalog(db_path)
+    try:
+        return [dict(row) for row in conn.execute(query, params)]
+    finally:
+        conn.close()
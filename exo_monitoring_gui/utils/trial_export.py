@@ -0,0 +1,204 @@
+import io
+import os
+import h5py
+import numpy as np
+
+from utils.hdf5_utils import TRIALS_GROUP, SAMPLE_PERIOD_S, open_locked
+
+# pyarrow est optionnel : seul l'export Parquet/Feather en a besoin
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DEFAULT_CHUNK_SIZE = 65536
+QUATERNION_AXES = ("w", "x", "y", "z")
+SKIPPED_GROUPS = ("TIME", "LABEL", "CONTROLLER")
+
+
+def _column_names(base_name, shape):
+    """Column names of one channel: 1 column for a 1D signal, one per axis otherwise."""
+    if len(shape) < 2 or shape[1] == 1:
+        return [base_name]
+    if shape[1] == 4:
+        return [f"{base_name}_{axis}" for axis in QUATERNION_AXES]
+    return [f"{base_name}_{i}" for i in range(shape[1])]
+
+
+def _padded_block(values, n_rows, n_cols):
+    """Return a float64 (n_rows, n_cols) block, NaN-padded if the channel is shorter."""
+    block = np.full((n_rows, n_cols), np.nan)
+    if len(values):
+        values = np.asarray(values, dtype=np.float64).reshape(len(values), -1)
+        block[:len(values)] = values[:, :n_cols]
+    return block
+
+
+def _batch(start, n_rows, channels, read):
+    """Build one {column: array} batch from a list of (key, columns, length) channels."""
+    batch = {"time_s": (start + np.arange(n_rows)) * SAMPLE_PERIOD_S}
+    for key, columns, length in channels:
+        stop = min(start + n_rows, length)
+        values = read(key, start, stop) if stop > start else []
+        block = _padded_block(values, n_rows, len(columns))
+        for i, column in enumerate(columns):
+            batch[column] = block[:, i]
+    return batch
+
+
+def iter_recording_batches(recorded_data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield column batches from the live recording buffer (DashboardAppBack.recorded_data).
+
+    Columns are time_s, EMG1..n, pMMG1..n, IMU<i>_w/x/y/z, IMU_filtered<i>_w/x/y/z and
+    IMU_quality<i> (pipeline quality code); shorter channels are NaN-padded.
+    """
+    channels = []
+    for sensor_type, sensor_lists in recorded_data.items():
+        quaternions = sensor_type.startswith("IMU") and sensor_type != "IMU_quality"
+        for idx, samples in enumerate(sensor_lists):
+            shape = (len(samples), 4) if quaternions else (len(samples),)
+            channels.append(((sensor_type, idx), _column_names(f"{sensor_type}{idx + 1}", shape), len(samples)))
+
+    total = max((length for _, _, length in channels), default=0)
+
+    def read(key, start, stop):
+        sensor_type, idx = key
+        return recorded_data[sensor_type][idx][start:stop]
+
+    for start in range(0, total, chunk_size):
+        yield _batch(start, min(chunk_size, total - start), channels, read)
+
+
+def _sensor_group_path(trial_id):
+    if trial_id is not None:
+        return f"{TRIALS_GROUP}/{trial_id}/Sensor"
+    return "Sensor"
+
+
+def iter_hdf5_batches(file_path, trial_id=None, chunk_size=DEFAULT_CHUNK_SIZE, progress_callback=None):
+    """Yield column batches from the Sensor group of an HDF5 file, reading chunk_size rows at a time.
+
+    trial_id selects /trials/<n>/Sensor in a subject container; None reads the root /Sensor.
+    Columns are named after the dataset path inside Sensor (e.g. IMU/imu1_w, IMU_filtered/imu1_w),
+    so datasets with the same name in different groups stay distinct.
+    The file is opened under hdf5_utils.file_lock for each batch only, so the review can
+    keep using it during a long export. progress_callback(done_rows, total_rows) is called
+    after each batch.
+    """
+    group_path = _sensor_group_path(trial_id)
+    channels = []
+
+    def visitor(name, obj):
+        if not isinstance(obj, h5py.Dataset) or not obj.shape:
+            return
+        parts = name.strip("/").split("/")
+        if len(parts) < 2 or parts[-2].upper() in SKIPPED_GROUPS:
+            return
+        channels.append((name, _column_names(name.strip("/"), obj.shape), obj.shape[0]))
+
+    with open_locked(file_path) as f:
+        f[group_path].visititems(visitor)
+    total = max((length for _, _, length in channels), default=0)
+
+    for start in range(0, total, chunk_size):
+        n_rows = min(chunk_size, total - start)
+        with open_locked(file_path) as f:
+            sensor_group = f[group_path]
+            batch = _batch(start, n_rows, channels, lambda key, a, b: sensor_group[key][a:b])
+        yield batch
+        if progress_callback is not None:
+            progress_callback(start + n_rows, total)
+
+
+def write_columnar(batches, out_path, fmt=None):
+    """Stream column batches to a Parquet or Feather (Arrow IPC) file.
+
+    fmt is "parquet" or "feather"; by default it is taken from the file extension.
+    Returns the number of rows written.
+    """
+    if pa is None:
+        raise ImportError("pyarrow is required for Parquet/Feather export (pip install pyarrow)")
+
+    if fmt is None:
+        ext = os.path.splitext(out_path)[1].lower()
+        fmt = "feather" if ext in (".feather", ".arrow", ".ipc") else "parquet"
+
+    writer = None
+    n_rows = 0
+    try:
+        for batch in batches:
+            record_batch = pa.RecordBatch.from_arrays(
+                [pa.array(values) for values in batch.values()],
+                names=list(batch.keys()),
+            )
+            if writer is None:
+                if fmt == "feather":
+                    writer = pa.ipc.new_file(out_path, record_batch.schema)
+                else:
+                    writer = pq.ParquetWriter(out_path, record_batch.schema)
+            writer.write_batch(record_batch)
+            n_rows += record_batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    print(f"[INFO] {n_rows} rows exported to {out_path}")
+    return n_rows
+
+
+def _csv_part_path(out_path, part):
+    """Name of a CSV part: the first part keeps out_path, the next ones get a _partNNN suffix."""
+    if part == 1:
+        return out_path
+    stem, ext = os.path.splitext(out_path)
+    return f"{stem}_part{part:03d}{ext or '.csv'}"
+
+
+def write_csv(batches, out_path, max_part_bytes=None, block_rows=4096, float_format="%.6g"):
+    """Stream column batches to CSV, formatting block_rows rows at a time with np.savetxt.
+
+    Missing samples (NaN padding) are written as empty fields. When max_part_bytes is set,
+    a new part file with its own header is started once the current part reaches that size.
+    Memory use only depends on the batch size, not on the trial length.
+    Returns the list of written files.
+    """
+    parts = []
+    fh = None
+    header = None
+    part_size = 0
+    text_buffer = io.StringIO()
+
+    def open_part():
+        nonlocal fh, part_size
+        if fh is not None:
+            fh.close()
+        path = _csv_part_path(out_path, len(parts) + 1)
+        fh = open(path, 'w', newline='', buffering=1024 * 1024)
+        fh.write(header + "\n")
+        part_size = len(header) + 1
+        parts.append(path)
+
+    try:
+        for batch in batches:
+            if header is None:
+                header = ",".join(batch.keys())
+                open_part()
+            table = np.column_stack(list(batch.values()))
+            for start in range(0, len(table), block_rows):
+                text_buffer.seek(0)
+                text_buffer.truncate()
+                np.savetxt(text_buffer, table[start:start + block_rows], delimiter=",", fmt=float_format)
+                text = text_buffer.getvalue().replace("nan", "")
+                # Le texte est ASCII : len(text) == nombre d'octets écrits
+                if max_part_bytes is not None and part_size > len(header) + 1 and part_size + len(text) > max_part_bytes:
+                    open_part()
+                fh.write(text)
+                part_size += len(text)
+    finally:
+        if fh is not None:
+            fh.close()
+
+    print(f"[INFO] CSV export written to {len(parts)} file(s): {', '.join(parts)}")
+    return parts